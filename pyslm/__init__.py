@@ -1,16 +1,18 @@
-from .ui import guiSLM, guiSLM2, guiSetup, guiSetup2, guiKeyboard, Overlay
-from .processing import parallelprocess, finalprocessing, ImpulseResponse
-from .settings import setSetup, setSetup2
-from .slm import setSLM, setSLM2
+from .processing import parallelprocess, finalprocessing, ImpulseResponse, select_channel, merge_channels
 from . import parameters_ as parameters
-from .streaming import StreamManager
-from .storage import storage
+from .engine import StreamEngine
+from .storage import storage, soundstorage
+from .ringbuffer import ringbuffer
+from .filestream import filestream
+from .diagnostics import streamstats, latencymeter
+from .history import timehistory
+from .correction import compile_correction, correctionfilter
 from .octfilter import OctFilter
 from .signals import noise, sweep
-from .weighting import weighting
+from .weighting import weighting, weightingbank, timeLetters
+from .spectral import spectralanalyzer
 from .rooms import rooms
-from .export import save
-from .run import AdvFreqAnalyzer, DataLogger
+from .export import save, convert
 
 __version__ = '0.2'  # package version
 
@@ -19,22 +21,52 @@ __all__ = ['parameters',
            'noise',
            'sweep',
            'weighting',
+           'weightingbank',
+           'timeLetters',
+           'spectralanalyzer',
            'rooms',
-           'AdvFreqAnalyzer',
-           'DataLogger',
-           'setSLM',
-           'setSLM2',
-           'guiSLM',
-           'guiSLM2',
-           'guiSetup',
-           'guiSetup2',
-           'guiKeyboard',
-           'Overlay',
            'parallelprocess',
            'finalprocessing',
            'ImpulseResponse',
-           'setSetup',
-           'setSetup2',
-           'StreamManager',
+           'select_channel',
+           'merge_channels',
+           'StreamEngine',
            'storage',
-           'save']
\ No newline at end of file
+           'soundstorage',
+           'ringbuffer',
+           'filestream',
+           'streamstats',
+           'latencymeter',
+           'timehistory',
+           'compile_correction',
+           'correctionfilter',
+           'save',
+           'convert']
+
+# The interface and the Qt adapter of the engine are only available with PyQt5
+# (pip install pyslm[gui]), headless installations use StreamEngine directly
+try:
+    import PyQt5
+    _hasQt = True
+except ImportError:
+    _hasQt = False
+
+if _hasQt:
+    from .ui import guiSLM, guiSLM2, guiSetup, guiSetup2, guiKeyboard, Overlay
+    from .settings import setSetup, setSetup2
+    from .slm import setSLM, setSLM2
+    from .streaming import StreamManager
+    from .run import AdvFreqAnalyzer, DataLogger
+    __all__ += ['AdvFreqAnalyzer',
+                'DataLogger',
+                'setSLM',
+                'setSLM2',
+                'guiSLM',
+                'guiSLM2',
+                'guiSetup',
+                'guiSetup2',
+                'guiKeyboard',
+                'Overlay',
+                'setSetup',
+                'setSetup2',
+                'StreamManager']
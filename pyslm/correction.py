@@ -0,0 +1,122 @@
+from typing import Union
+import scipy.fft as fft
+import numpy as np
+import hashlib
+
+
+# Compiled correction filters by (curves, fs, numTaps)
+_compiled = {}
+
+
+def compile_correction(curves: list, fs: int, numTaps: int = 4096) -> Union[np.ndarray, None]:
+    """
+    Description
+    -----------
+    Function that compiles spectral correction curves (e.g. of the microphone
+    and of the ADC) into the coefficients of a single minimum-phase FIR filter
+    that removes their 'coloring'. The magnitude of the filter is the inverse
+    of the sum of the curves, the minimum phase is obtained from the real
+    cepstrum. The filters are cached by the content of the curves, the
+    sampling rate and the number of taps, so a curve is compiled only once.
+
+    Parameters
+    ----------
+    curves : list
+        Correction curves with shape (points, 2): frequency [Hz] and
+        magnitude [dB]. None items are ignored.
+    fs : int
+        Sampling rate [Hz]
+    numTaps : int, optional
+        Length of the filter, its frequency resolution is fs/numTaps.
+        The default is 4096.
+
+    Returns
+    -------
+    taps : np.ndarray or None
+        Coefficients of the filter, None if there is no curve
+    """
+    curves = [np.asarray(curve, dtype='float64') for curve in curves if curve is not None]
+    if not curves:
+        return None
+    digest = hashlib.sha1()
+    for curve in curves:
+        digest.update(curve.tobytes())
+    key = (digest.hexdigest(), int(fs), int(numTaps))
+    if key not in _compiled:
+        # Dense grid so that the truncated cepstrum does not alias
+        numFFT = 8 * fft.next_fast_len(int(numTaps))
+        freqVector = np.fft.rfftfreq(numFFT, d=1/fs)
+        magnitude = np.zeros(freqVector.size)
+        for curve in curves:
+            # The curves are held constant outside their frequency range
+            magnitude -= np.interp(freqVector, curve[:, 0], curve[:, 1])
+        logMagnitude = magnitude * np.log(10) / 20
+        # Folding the real cepstrum gives the minimum phase spectrum
+        cepstrum = np.fft.irfft(logMagnitude, n=numFFT)
+        folded = np.zeros(numFFT)
+        folded[0] = cepstrum[0]
+        folded[1:numFFT//2] = 2 * cepstrum[1:numFFT//2]
+        folded[numFFT//2] = cepstrum[numFFT//2]
+        taps = np.fft.irfft(np.exp(np.fft.rfft(folded)), n=numFFT)[:numTaps]
+        _compiled[key] = taps
+    return _compiled[key]
+
+
+class correctionfilter(object):
+    """
+    Description
+    -----------
+    Applies a compiled correction filter (see `compile_correction`) by
+    overlap-save, keeping the last samples of each call, so that a signal
+    processed in consecutive blocks gives the same result as in a single
+    call, without the circular-convolution wrap at the edges of the blocks.
+
+    Parameters
+    ----------
+    taps : np.ndarray
+        Coefficients of the FIR filter
+    fs : int
+        Sampling rate [Hz]
+    dtype : str, optional
+        Precision of the filtering, 'float32' or 'float64'.
+        The default is 'float64'.
+
+    Methods
+    -------
+    filter(signal):
+        Filters a block of shape (samples,) or (samples, channels).
+    reset():
+        Clears the samples kept from the last block.
+    """
+
+    def __init__(self, taps: np.ndarray, fs: int, dtype: str = 'float64'):
+        self.dtype = np.dtype(dtype)
+        self.taps = np.asarray(taps, dtype=self.dtype)
+        self.fs = fs
+        self.numTaps = self.taps.size
+        # Spectrum of the taps by FFT size
+        self._spectra = {}
+        self.reset()
+        return
+
+    def reset(self):
+        self.history = None
+        return
+
+    def _spectrum(self, numFFT: int) -> np.ndarray:
+        if numFFT not in self._spectra:
+            self._spectra[numFFT] = fft.rfft(self.taps, n=numFFT)
+        return self._spectra[numFFT]
+
+    def filter(self, signal: np.ndarray) -> np.ndarray:
+        numSamples = signal.shape[0]
+        shape = (self.numTaps - 1,) + signal.shape[1:]
+        if self.history is None or self.history.shape != shape:
+            self.history = np.zeros(shape, dtype=self.dtype)
+        extended = np.concatenate((self.history, signal.astype(self.dtype, copy=False)), axis=0)
+        numFFT = fft.next_fast_len(extended.shape[0], real=True)
+        spectrum = self._spectrum(numFFT).reshape((-1,) + (1,) * (signal.ndim - 1))
+        filtered = fft.irfft(fft.rfft(extended, n=numFFT, axis=0) * spectrum, n=numFFT, axis=0)
+        # The first numTaps-1 samples carry the wrap of the circular convolution
+        self.history = extended[extended.shape[0] - shape[0]:]
+        return filtered[self.numTaps - 1:self.numTaps - 1 + numSamples]
@@ -0,0 +1,218 @@
+import sounddevice as sd
+import numpy as np
+import time
+
+
+class streamstats(object):
+    """
+    Description
+    -----------
+    Per-session accounting of the audio callbacks: PortAudio xruns reported
+    in the `status` flags, frames dropped because the ring buffer was full,
+    maximum depth reached by the ring and execution time of the callbacks.
+    A measurement is gap-free only if no overflow, underflow or dropped
+    frame was counted.
+
+    Parameters
+    ----------
+    blockDuration : float
+        Duration of each callback block [s], the time budget of the callback.
+
+    Attributes
+    ----------
+    inputOverflows : int
+        Blocks in which the sound card discarded input samples.
+    inputUnderflows : int
+        Blocks in which input samples were padded with zeros.
+    outputOverflows : int
+        Blocks in which output samples were discarded.
+    outputUnderflows : int
+        Blocks in which the output was not ready in time (gap in the excitation).
+    droppedFrames : int
+        Frames lost because the ring buffer was full.
+    maxQueueDepth : int
+        Maximum number of frames waiting in the ring buffer.
+    callbacks : int
+        Number of callbacks executed.
+    callbackTimeMax : float
+        Longest execution of a callback [s].
+
+    Methods
+    -------
+    wrap(callback, stopped):
+        Returns the callback timed and with its status flags accounted.
+    drop():
+        Counts a frame dropped by the ring buffer.
+    queued(depth):
+        Updates the maximum depth of the ring buffer.
+    summary():
+        Returns the counters as a dictionary.
+    """
+
+    def __init__(self, blockDuration: float):
+        self.blockDuration = blockDuration
+        self.reset()
+        return
+
+    def reset(self):
+        self.inputOverflows = 0
+        self.inputUnderflows = 0
+        self.outputOverflows = 0
+        self.outputUnderflows = 0
+        self.droppedFrames = 0
+        self.maxQueueDepth = 0
+        self.callbacks = 0
+        self.callbackTime = 0.
+        self.callbackTimeMax = 0.
+        return
+
+    def status(self, status: sd.CallbackFlags):
+        # The flags are all False in the vast majority of the blocks
+        if status:
+            self.inputOverflows += int(bool(status.input_overflow))
+            self.inputUnderflows += int(bool(status.input_underflow))
+            self.outputOverflows += int(bool(status.output_overflow))
+            self.outputUnderflows += int(bool(status.output_underflow))
+        return
+
+    def drop(self):
+        self.droppedFrames += 1
+        return
+
+    def queued(self, depth: int):
+        if depth > self.maxQueueDepth:
+            self.maxQueueDepth = depth
+        return
+
+    def wrap(self, callback, stopped=None):
+        # The status flags are always the last argument of the sounddevice callbacks.
+        # The callbacks that stop the session (or run after it) close the stream and
+        # join threads, which is not the time budget of the audio path: they are not
+        # timed if `stopped()` is True when they return
+        def timed_callback(*args):
+            start = time.perf_counter()
+            self.status(args[-1])
+            callback(*args)
+            elapsed = time.perf_counter() - start
+            if stopped is not None and stopped():
+                return
+            self.callbacks += 1
+            self.callbackTime += elapsed
+            if elapsed > self.callbackTimeMax:
+                self.callbackTimeMax = elapsed
+            return
+        return timed_callback
+
+    def summary(self) -> dict:
+        callbackTimeMean = self.callbackTime / self.callbacks if self.callbacks else 0.
+        return {'inputOverflows': self.inputOverflows,
+                'inputUnderflows': self.inputUnderflows,
+                'outputOverflows': self.outputOverflows,
+                'outputUnderflows': self.outputUnderflows,
+                'droppedFrames': self.droppedFrames,
+                'maxQueueDepth': self.maxQueueDepth,
+                'callbacks': self.callbacks,
+                'callbackTimeMean': callbackTimeMean,
+                'callbackTimeMax': self.callbackTimeMax,
+                # Fraction of the block duration spent in the slowest callback
+                'callbackLoadMax': self.callbackTimeMax / self.blockDuration,
+                'gapFree': not (self.inputOverflows or self.inputUnderflows or self.outputOverflows or
+                                self.outputUnderflows or self.droppedFrames)}
+
+
+class latencymeter(object):
+    """
+    Description
+    -----------
+    Latency of the frames along the measurement chain, from the ADC
+    timestamp given by PortAudio to the moment the results reach the
+    interface. Every timestamp is taken with time.perf_counter, which is a
+    system-wide clock shared by the processes.
+
+    Stages
+    ------
+    ring : captured -> dequeued by parallelprocess
+    processing : dequeued -> results queued by parallelprocess
+    transport : results queued -> realtime results emitted
+    total : captured -> realtime results emitted
+    display : realtime results emitted -> delivered to the interface
+    endToEnd : captured -> delivered to the interface
+
+    The last two stages are only recorded when the results are delivered
+    to an interface (StreamManager).
+
+    The latencies are accumulated in a histogram with logarithmic bins per
+    stage (1 us to 100 s, binsPerDecade bins per decade), so the memory does
+    not grow with the length of the session. The percentiles are
+    interpolated inside the bins, within about 100/binsPerDecade % of the
+    exact value, the maximum and the count are exact.
+
+    Methods
+    -------
+    add(timestamps):
+        Records the stages of one emitted frame from its timestamps dictionary.
+    delivered(timestamps):
+        Records the delivery of one frame to the interface.
+    record(stage, value):
+        Records the latency [s] of one stage.
+    percentile(stage, p):
+        Returns the p-th percentile of one stage [s].
+    summary(percentiles):
+        Returns the percentiles of each stage [s].
+    """
+    stages = ('ring', 'processing', 'transport', 'total', 'display', 'endToEnd')
+    minLatency = 1e-6
+    numDecades = 8
+    binsPerDecade = 50
+
+    def __init__(self):
+        self.reset()
+        return
+
+    def reset(self):
+        numBins = self.numDecades * self.binsPerDecade
+        self.counts = {stage: np.zeros(numBins, dtype='int64') for stage in self.stages}
+        self.maxima = {stage: -np.inf for stage in self.stages}
+        return
+
+    def record(self, stage: str, value: float):
+        # Values below minLatency (or negative, clocks of the host API) go to the first bin
+        index = int(np.floor(np.log10(max(value, self.minLatency) / self.minLatency) * self.binsPerDecade))
+        self.counts[stage][min(index, self.counts[stage].size - 1)] += 1
+        if value > self.maxima[stage]:
+            self.maxima[stage] = value
+        return
+
+    def add(self, timestamps: dict):
+        self.record('ring', timestamps['dequeued'] - timestamps['captured'])
+        self.record('processing', timestamps['queued'] - timestamps['dequeued'])
+        self.record('transport', timestamps['emitted'] - timestamps['queued'])
+        self.record('total', timestamps['emitted'] - timestamps['captured'])
+        return
+
+    def delivered(self, timestamps: dict):
+        now = time.perf_counter()
+        self.record('display', now - timestamps['emitted'])
+        self.record('endToEnd', now - timestamps['captured'])
+        return
+
+    def percentile(self, stage: str, p: float) -> float:
+        counts = self.counts[stage]
+        cumulative = np.cumsum(counts)
+        rank = p / 100 * cumulative[-1]
+        index = int(np.searchsorted(cumulative, rank))
+        # Geometric interpolation between the edges of the bin
+        below = cumulative[index] - counts[index]
+        fraction = (rank - below) / counts[index] if counts[index] else 1.
+        value = self.minLatency * 10**((index + fraction) / self.binsPerDecade)
+        return float(min(value, self.maxima[stage]))
+
+    def summary(self, percentiles: tuple = (50, 95, 99)) -> dict:
+        latency = {}
+        for stage, counts in self.counts.items():
+            count = int(counts.sum())
+            if count > 0:
+                latency[stage] = {'p%i' % p: self.percentile(stage, p) for p in percentiles}
+                latency[stage]['max'] = float(self.maxima[stage])
+                latency[stage]['count'] = count
+        return latency
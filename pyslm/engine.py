@@ -0,0 +1,1002 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Jul 24 16:52:22 2020
+
+@author: leonardojacomussi
+"""
+from typing import Union, Callable, Type
+import multiprocessing as mp
+import sounddevice as sd
+import threading as thd
+import numpy as np
+import pyslm
+import queue
+import time
+import os
+
+default_params = pyslm.parameters.load()
+
+class StreamEngine(object):
+    """
+    Description
+    -----------
+    Measurement engine without any dependency on PyQt5: it opens the audio
+    stream (or the file source), feeds the parallel processes and pulls
+    their results, reporting through plain callbacks or through iteration,
+    so that it can run on headless nodes or inside other services.
+    StreamManager is the Qt adapter of this class used by the interface.
+
+    Main parameters
+    ---------------
+    The measurement parameters (version, path, device, fs, inCh, tau,
+    template, ...), which default to the saved pyslm.parameters, plus:
+
+    realtimeCallback : Callable, optional
+        Function called with the results dictionary of each frame.
+    fullresultsCallback : Callable, optional
+        Function called with the final results when the measurement ends.
+    stopCallback : Callable, optional
+        Function called (without arguments) when a measurement is stopped,
+        before the final results are calculated.
+    blockSize : int, optional
+        Samples per callback of the audio stream, independent of the analysis
+        period, e.g. 256 or 1024 for a low latency. The default is None (one
+        block per analysis frame).
+    displayTime : float, optional
+        Period of the analysis frames and of the realtime results [s], rounded
+        to a whole number of blocks. The time weighting still follows `tau`.
+        The default is None (tau).
+    timeWeightings : tuple, optional
+        Time constants [s] computed in the same pass as `tau`, each one
+        reported per frame (e.g. LAI, LAF, LAS) with its maximum (e.g.
+        LAFmax). Only the standard constants 0.035, 0.125 and 1.0 (I, F, S)
+        are accepted, as `tau`. The default is (0.035, 0.125, 1.0).
+    multirate : bool, optional
+        If True, the band levels are calculated by the decimating octave
+        filter bank (see pyslm.OctFilter). The default is False.
+    bandBackend : str, optional
+        'iir' or 'fft', backend of the octave filter of the band levels and of
+        the room parameters (see pyslm.OctFilter). 'fft' suits fine fractions
+        (1/6 to 1/24 octave). The default is 'iir'.
+    analysisDomain : str, optional
+        'time' or 'freq'. With 'freq' the frequency analyzer takes the
+        correction, the weightings and the bands from the spectrum of each
+        frame (see pyslm.spectralanalyzer), its levels are the equivalent
+        levels of each frame: the time-weighted maxima (e.g. LAFmax) are not
+        reported, the maxima of the frame levels are (LAeqmax, LCeqmax,
+        LZeqmax).
+        The default is 'time'.
+    precision : str, optional
+        'float64' or 'float32'. With 'float32' the frames, the filters and
+        their states and the recorded signal stay in single precision, which
+        halves the memory traffic of the processing. The default is 'float64'.
+    rawEncoding : str, optional
+        Encoding of the recorded signal of the SPL and frequency analyzer
+        templates, 'float64', 'float32', 'int16' or 'int24' (scaled to the
+        full scale of the ADC, calibFactor). None stores the precision.
+        The default is None.
+    rawCompression : str, optional
+        HDF5 compression of the recorded signal, 'gzip', 'lzf' or None.
+        The default is None.
+    rawFormat : str, optional
+        File of the recorded signal of the SPL and frequency analyzer
+        templates, 'HDF5' or a sound file ('WAV', 'W64' or 'FLAC') written
+        during the measurement (see pyslm.soundstorage), which does not need
+        to be converted when the results are saved. The default is 'HDF5'.
+
+    Attributes
+    ----------
+    streamStats : pyslm.streamstats
+        Xruns, dropped frames, ring depth and callback time of the session.
+    latencyMeter : pyslm.latencymeter
+        Latency of the frames along the chain, from the ADC timestamp.
+    recorderStats : dict
+        Writes, pending buffers and stalls of the raw data recorder.
+    fullResults : dict
+        Final results of the last measurement.
+
+    Methods
+    -------
+    play():
+        Starts the measurement of the current template.
+    pause():
+        Pauses or resumes the measurement.
+    stop():
+        Stops the measurement and calculates the final results.
+    fullresults():
+        Calculates the final results and calls fullresultsCallback.
+    iterate(timeout):
+        Generator of the results of each frame, starts the measurement if
+        needed and ends when it is stopped. Iterating over the engine does
+        the same.
+    """
+
+    def __init__(self,
+        version: str = default_params['version'],
+        path: str = os.path.join(
+            default_params['pathProject'],
+            default_params['currentProject']
+            ),
+        device: list = default_params['device'],
+        fs: int = default_params['fs'],
+        inCh: list = default_params['inCh'],
+        outCh: list = default_params['outCh'],
+        tau: float = default_params['tau'],
+        fstart: float = default_params['fstart'],
+        fend: float = default_params['fend'],
+        b: int = default_params['b'],
+        fweighting: str = default_params['fweighting'],
+        duration: int = default_params['duration'],
+        excitTime: int = default_params['excitTime'],
+        scapeTime: int = default_params['scapeTime'],
+        decayTime: int = default_params['decayTime'],
+        TLevel: int = default_params['TLevel'],
+        template: str = default_params['template'],
+        method: str = default_params['method'],
+        numDecay: int = default_params['numDecay'],
+        fCalib: float = default_params['fCalib'],
+        pCalib: float = default_params['pCalib'],
+        calibFactor: float = default_params['calibFactor'],
+        micCorr: Union[np.ndarray, None] = default_params['micCorr'],
+        applyMicCorr: bool = default_params['applyMicCorr'],
+        adcCorr: Union[np.ndarray, None] = default_params['adcCorr'],
+        applyAdcCorr: bool = default_params['applyAdcCorr'],
+        saveRawData: bool = default_params['saveRawData'],
+        source: Union[str, None] = None,
+        pace: str = 'realtime',
+        numWorkers: Union[int, None] = None,
+        blockSize: Union[int, None] = None,
+        displayTime: Union[float, None] = None,
+        timeWeightings: tuple = (0.035, 0.125, 1.0),
+        multirate: bool = False,
+        bandBackend: str = 'iir',
+        analysisDomain: str = 'time',
+        precision: str = 'float64',
+        rawEncoding: Union[str, None] = None,
+        rawCompression: Union[str, None] = None,
+        rawFormat: str = 'HDF5',
+        realtimeCallback: Union[Callable, None] = None,
+        fullresultsCallback: Union[Callable, None] = None,
+        stopCallback: Union[Callable, None] = None
+        ):
+        ######## __init__ variables ########
+        self.version = version
+        if path == None:
+            self.path = os.getcwd()
+        else: 
+            self.path = path
+        self.device = device
+        self.fs = fs
+        self.inCh = inCh
+        self.outCh = outCh
+        self.tau = tau
+        self.fstart = fstart
+        self.fend = fend
+        self.b = b
+        self.fweighting = fweighting
+        self.duration = duration
+        self.excitTime = excitTime
+        self.scapeTime = scapeTime
+        self.decayTime = decayTime
+        self.TLevel = TLevel
+        self.template = template
+        self.method = method
+        self.numDecay = numDecay
+        self.fCalib = fCalib
+        self.pCalib = pCalib
+        self.calibFactor = calibFactor
+        self.micCorr = micCorr
+        self.applyMicCorr = applyMicCorr
+        self.adcCorr = adcCorr
+        self.applyAdcCorr = applyAdcCorr
+        self.saveRawData = saveRawData
+        # Audio file replayed instead of the sound card (None for the device)
+        self.source = source
+        self.pace = pace
+        # Number of processes sharing the input channels (None for one per core)
+        self.numWorkers = numWorkers
+        # Samples per PortAudio callback (None for one block per analysis frame)
+        self.blockSize = blockSize
+        # Period of the analysis and of the realtime results [s] (None for tau)
+        self.displayTime = displayTime
+        # Time constants reported together with `tau` (e.g. LAI, LAF and LAS)
+        self.timeWeightings = timeWeightings
+        # The results are named after the letter of each time constant (e.g. LAF)
+        for t in (tau,) + tuple(timeWeightings):
+            pyslm.weightingbank.time_letter(t)
+        # Decimating octave filter bank for the band levels
+        self.multirate = multirate
+        # Band levels from the IIR filters ('iir') or from the FFT ('fft')
+        self.bandBackend = bandBackend
+        # Analysis of the frequency analyzer in the time ('time') or frequency ('freq') domain
+        self.analysisDomain = analysisDomain
+        if self.analysisDomain not in ['time', 'freq']:
+            raise ValueError("Analysis domain %s not supported, please try 'time' or 'freq'." % analysisDomain)
+        # Precision of the filters and of the recorded signal ('float32' or 'float64')
+        self.precision = precision
+        # Encoding and compression of the recorded signal
+        self.rawEncoding = rawEncoding
+        self.rawCompression = rawCompression
+        self.rawFormat = rawFormat.upper()
+        if self.rawFormat not in ['HDF5', 'WAV', 'W64', 'FLAC']:
+            raise ValueError("Format %s not supported, please try 'HDF5', 'WAV', 'W64' or 'FLAC'." % rawFormat)
+        if self.rawEncoding not in [None, 'float64', 'float32', 'int16', 'int24']:
+            raise ValueError("Encoding %s not supported, please try 'float64', 'float32', 'int16' or 'int24'."
+                             % rawEncoding)
+        if self.rawFormat == 'FLAC' and self.rawEncoding in ['float64', 'float32']:
+            raise ValueError("Encoding %s not supported by FLAC files." % rawEncoding)
+        if self.rawCompression not in [None, 'gzip', 'lzf']:
+            raise ValueError("Compression %s not supported, please try 'gzip', 'lzf' or None." % rawCompression)
+        # Reporting of the results
+        self.realtimeCallback = realtimeCallback
+        self.fullresultsCallback = fullresultsCallback
+        self.stopCallback = stopCallback
+        self._subscribers = []
+        if self.source is not None:
+            self.fs = pyslm.filestream.samplerate_of(fname=self.source, default=self.fs)
+        ######## others parameters ########
+        self._set_parameters()
+        return
+
+
+    def play(self) -> Callable:
+        try:
+            if self.template in ['spl', 'frequencyAnalyzer', 'calibration']:
+                self.Record()
+            elif self.template == 'reverberationTime':
+                if self.method == 'impulse':
+                    self.Record()
+                else:
+                    self.PlayRecord()
+            elif self.template == 'stand-by':
+                self.stand_by()
+            else:
+                pass
+        except Exception as E:
+            print("StreamEngine.play(): ", E, "\n")
+        # A stream that can not be opened ends the session (once it is
+        # released, a stream that fails to start is raised by iterate)
+        if self.streamError is not None and self.isFinished.is_set():
+            raise self.streamError
+        return
+
+
+    def pause(self) -> Callable:
+        try:
+            if self.isPaused.is_set():
+                self.isPaused.clear()
+            else:
+                self.isPaused.set()
+        except Exception as E:
+            print("StreamEngine.pause(): ", E, "\n")
+        return
+
+
+    def iterate(self, timeout: Union[float, None] = None):
+        """
+        Description
+        -----------
+        Generator of the realtime results. The measurement is started if it
+        is not running yet, and the iteration ends after the stop, once the
+        final results were calculated.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time waiting for a frame [s], queue.Empty is raised if
+            it expires. The default is None (wait forever).
+
+        Yields
+        ------
+        results : dict
+            Results of each frame, the same dictionary passed to realtimeCallback
+
+        Raises
+        ------
+        Exception
+            The error of the stream if it could not be opened or started.
+        """
+        subscriber = queue.Queue()
+        self._subscribers.append(subscriber)
+        try:
+            if not self.isPlayed.is_set() and not self.isFinished.is_set():
+                self.play()
+            while True:
+                results = subscriber.get(timeout=timeout)
+                if results is None:
+                    if self.streamError is not None:
+                        raise self.streamError
+                    break
+                yield results
+        finally:
+            self._subscribers.remove(subscriber)
+        return
+
+
+    def __iter__(self):
+        return self.iterate()
+
+
+    def _realtime_data(self, results: dict) -> Callable:
+        if self.realtimeCallback is not None:
+            self.realtimeCallback(results)
+        for subscriber in list(self._subscribers):
+            subscriber.put(results)
+        return
+
+
+    def _fullresults_data(self, results: dict) -> Callable:
+        self.fullResults = results
+        if self.fullresultsCallback is not None:
+            self.fullresultsCallback(results)
+        return
+
+
+    def stop(self) -> Callable:
+        try:
+            # The callbacks, the file source and the interface may all request
+            # the stop, only the first request of the session is carried out
+            if not self.stopLock.acquire(blocking=False):
+                return
+            if self.template in ['spl', 'frequencyAnalyzer', 'reverberationTime']:
+                if self.stopCallback is not None:
+                    self.stopCallback()
+            else:
+                pass
+            if self.stream.active:
+                self.stream.close()
+            else:
+                pass
+            self.isPlayed.clear()
+            self.isPaused.clear()
+            self.isStopped.set()
+            # Waiting for termination of unfinished
+            # processes and threads
+            while(self.gettingResults.is_alive() and\
+                  any(process.is_alive() for process in self.parallelProcesses) and\
+                  self.threadStream.is_alive()):
+                time.sleep(.1)
+            # The threads and processes exit by themselves once the stop is
+            # signalled, the stop may also run in one of them (file source)
+            for thread in [self.threadStream, self.gettingResults] + list(self.parallelProcesses):
+                try:
+                    if thread is not thd.current_thread():
+                        thread.join()
+                except Exception:
+                    pass
+            # Pipeline throughput
+            elapsed = time.perf_counter() - self.startTime
+            self.throughput = {
+                'framesPerSecond': self.framesRead / self.frameSize / elapsed,
+                'realtimeFactor': self.framesRead / self.fs / elapsed
+                }
+            # Releasing the shared memory of the ring buffer
+            try:
+                self.inData.close()
+                self.inData.unlink()
+            except Exception:
+                pass
+            # Shutting down database, the accounting of the session is kept with the data
+            if self.recorderRawData is not None and self.saveRawData:
+                self.recorderRawData.attrs.update(self.streamStats.summary())
+                self.recorderRawData.close()
+                self.recorderStats = self.recorderRawData.summary()
+                # Level histories saved next to the raw data
+                if self.template in ['spl', 'frequencyAnalyzer'] and self.rawFormat == 'HDF5':
+                    self.Lglobal.save(self.recorderRawData.fname, name='Lglobal')
+                    if self.Lbands is not None:
+                        self.Lbands.save(self.recorderRawData.fname, name='Lbands')
+            # A session whose stream never started has no results
+            if self.streamError is None:
+                self.fullresults()
+            # Ending the iterations over the results
+            self.isFinished.set()
+            for subscriber in list(self._subscribers):
+                subscriber.put(None)
+        except Exception as E:
+            print("StreamEngine.stop(): ", E, "\n")
+        return
+
+
+    def stand_by(self) -> Callable:
+        try:
+            self._setstream(streamType=sd.InputStream,
+                        callback=self._standby_callback)
+        except Exception as E:
+            print("StreamEngine.stand_by(): ", E, "\n")
+        return
+
+
+    def Record(self) -> Callable:
+        try:
+            self._setstream(streamType=sd.InputStream, callback=self._input_callback)
+        except Exception as E:
+            print("StreamEngine.Record(): ", E, "\n")
+        return
+
+
+    def PlayRecord(self) -> Callable:
+        try:
+            self._setstream(streamType=sd.Stream, callback=self._stream_callback)
+        except Exception as E:
+            print("StreamEngine.PlayRecord(): ", E, "\n")
+        return
+
+
+    def _setstream(self, streamType: Type, callback: Callable) -> Callable:
+        try:
+            callback = self.streamStats.wrap(callback, stopped=self.isStopped.is_set)
+            if streamType is sd.Stream:
+                # (input, output) channels, the excitation is routed to outCh
+                channels = (self.numChannels[0], self.numOutputs)
+            else:
+                channels = self.numChannels[0]
+            if self.source is not None:
+                # Virtual input device reading the audio file
+                self.stream = pyslm.filestream(
+                    fname = self.source,
+                    samplerate = self.fs,
+                    blocksize = self.blockSize,
+                    device = self.device,
+                    channels = channels,
+                    dtype = 'float32',
+                    callback = callback,
+                    finished_callback = self.stop,
+                    pace = self.pace,
+                    isFull = self.inData.full,
+                    duplex = streamType is sd.Stream
+                    )
+            else:
+                self.stream = streamType(
+                    samplerate = self.fs,
+                    blocksize = self.blockSize,
+                    device = self.device,
+                    channels = channels,
+                    dtype = 'float32',
+                    callback = callback
+                    )
+            self.startTime = time.perf_counter()
+            self.isPaused.clear()
+            self.isStopped.clear()
+            self.isPlayed.set()
+            # One process per group of input channels, each one with its own
+            # filter states, reading every frame from the ring
+            self.parallelProcesses = [pyslm.parallelprocess(
+                inData = self.inData.reader(index),
+                isPlayed = self.isPlayed,
+                params = self.params,
+                channels = channels
+                ) for index, channels in enumerate(self.channelGroups)]
+            self.parallelProcess = self.parallelProcesses[0]
+            # Static metadata of the session, known from the processes built in this
+            # process and attached to the results instead of crossing the queues
+            self.metadata = {}
+            if hasattr(self.parallelProcess, 'bands'):
+                self.metadata = {'strBands': self.parallelProcess.strBands,
+                                 'x_axis': self.parallelProcess.x_axis,
+                                 'bands': self.parallelProcess.bands}
+            for process in self.parallelProcesses:
+                process.start()
+            self.gettingResults = thd.Thread(target=self.realtime)
+            self.gettingResults.start()
+            self.threadStream = thd.Thread(target=self.runner)
+            self.threadStream.start()
+            # self.runner()
+        except Exception as E:
+            print("StreamEngine._setstream(): ", E, "\n")
+            self._abort(E)
+        return
+
+
+    def _abort(self, error: Exception) -> Callable:
+        # The stream could not be opened: releasing the ring and the workers
+        # and ending the iterations over the results with the error
+        self.streamError = error
+        self.isPlayed.clear()
+        self.isStopped.set()
+        for process in self.parallelProcesses:
+            try:
+                process.join()
+            except Exception:
+                pass
+        try:
+            self.inData.close()
+            self.inData.unlink()
+        except Exception:
+            pass
+        self.isFinished.set()
+        for subscriber in list(self._subscribers):
+            subscriber.put(None)
+        return
+
+
+    def runner(self) -> Callable:
+        try:
+            with self.stream:
+                self.isStopped.wait()
+        except Exception as E:
+            print("StreamEngine.runner(): ", E, "\n")
+            # The stream failed to start, the session is stopped with its error
+            self.streamError = E
+            self.stop()
+        return
+
+
+    def _set_parameters(self) -> Callable:
+        try:
+            # Events
+            self.isPlayed = mp.Event()
+            self.isPaused = mp.Event()
+            self.isStopped = mp.Event()
+            self.isFinished = thd.Event()
+            self.stopLock = thd.Lock()
+            # Others variables
+            self.recorderRawData = None
+            self.fullResults = None
+            # Error of the stream that ended the session, raised by play and iterate
+            self.streamError = None
+            # Level histories of the session, one row per frame
+            self.Lglobal = pyslm.timehistory(shape=(len(self.inCh),))
+            self.Lbands = None
+            self.Lmaxima = {}
+            self.outputSignal = None
+            self.parallelProcesses = []
+            self.startTime = time.perf_counter()
+            self.throughput = {'framesPerSecond': 0., 'realtimeFactor': 0.}
+            self.recorderStats = {}
+            self.cutSamples = int(0.15*self.fs)
+            # Analysis frame, made of whole audio blocks
+            displayTime = self.tau if self.displayTime is None else self.displayTime
+            frameSize = int(displayTime * self.fs)
+            if self.blockSize is None:
+                self.blockSize = frameSize
+            self.frameSize = max(1, int(round(frameSize / self.blockSize))) * self.blockSize
+            # Xruns, dropped frames, ring depth and callback time of the session
+            self.streamStats = pyslm.streamstats(blockDuration=self.blockSize/self.fs)
+            # Latency of the frames from the ADC to the emission of the results
+            self.latencyMeter = pyslm.latencymeter()
+            self.numChannels = [len(self.inCh), len(self.outCh)]
+            # The output stream is opened up to the highest channel of outCh
+            self.numOutputs = max(self.outCh) if len(self.outCh) > 0 else 0
+            # Splitting the input channels in contiguous groups, one per worker process;
+            # the reverberation time and the calibration only use the first channel
+            if self.template in ['reverberationTime', 'calibration']:
+                numWorkers = 1
+            elif self.numWorkers is None:
+                numWorkers = os.cpu_count() or 1
+            else:
+                numWorkers = self.numWorkers
+            numWorkers = max(1, min(numWorkers, self.numChannels[0]))
+            edges = np.linspace(0, self.numChannels[0], numWorkers + 1).astype(int)
+            self.channelGroups = [(int(edges[i]), int(edges[i+1])) for i in range(numWorkers)]
+            if self.template in ['spl', 'frequencyAnalyzer']:
+                self.numSamples = int(self.duration * self.fs) + self.cutSamples
+                if self.saveRawData and self.rawFormat != 'HDF5':
+                    # Straight to the sound file, without the settling of the filters
+                    self.recorderRawData = pyslm.soundstorage(buffer_size=int(self.fs*30),
+                                                   shape=(self.numSamples, self.numChannels[0]),
+                                                   path=self.path, kind='SPL', fs=self.fs,
+                                                   dtype=self.precision, encoding=self.rawEncoding,
+                                                   calibFactor=self.calibFactor, format=self.rawFormat,
+                                                   skipSamples=self.cutSamples)
+                elif self.saveRawData:
+                    self.recorderRawData = pyslm.storage(buffer_size=int(self.fs*30),
+                                                   shape=(self.numSamples, self.numChannels[0]),
+                                                   path=self.path, kind='SPL', fs=self.fs,
+                                                   dtype=self.precision, encoding=self.rawEncoding,
+                                                   calibFactor=self.calibFactor,
+                                                   compression=self.rawCompression,
+                                                   shuffle=self.rawCompression is not None)
+                self.excitation = None
+            elif self.template == 'reverberationTime':
+                self.numSamples = int((self.excitTime + self.scapeTime +\
+                                    self.decayTime) * self.fs) #+ self.cutSamples
+                self.send_to_disk = np.empty(shape=(self.numSamples, self.numDecay),
+                                            dtype = 'float32')
+                self._set_excitation()
+            elif self.template == 'calibration':
+                self.numSamples = int(self.duration * self.fs) + self.cutSamples
+                self.excitation = None
+                self.send_to_disk = np.empty(shape=(self.numSamples+self.fs, 1), dtype = 'float32')
+            else:
+                self.numSamples = int(self.duration * self.fs) + self.cutSamples
+                self.excitation = None
+            # Shared-memory ring buffer holding about 10 seconds of audio
+            self.inData = pyslm.ringbuffer(
+                numSlots = max(8, int(np.ceil(10 * self.fs / self.blockSize))),
+                frameSize = self.blockSize,
+                numChannels = self.numChannels[0],
+                dtype = 'float32',
+                numReaders = len(self.channelGroups)
+                )
+            # Counters
+            self.countDecay = 0
+            self.framesRead = 0
+            self.countDn = self.numSamples
+            self.counters = mp.Queue(self.numSamples//2)
+            self.params = {
+                'version': self.version,
+                'device': self.device,
+                'fs': self.fs,
+                'inCh': self.inCh,
+                'outCh': self.outCh,
+                'tau': self.tau,
+                'timeWeightings': self.timeWeightings,
+                'multirate': self.multirate,
+                'bandBackend': self.bandBackend,
+                'analysisDomain': self.analysisDomain,
+                'precision': self.precision,
+                'fstart': self.fstart,
+                'fend': self.fend,
+                'b': self.b,
+                'fweighting': self.fweighting,
+                'duration': self.duration,
+                'excitTime': self.excitTime,
+                'scapeTime': self.scapeTime,
+                'decayTime': self.decayTime,
+                'template': self.template,
+                'method': self.method,
+                'numDecay': self.numDecay,
+                'fCalib': self.fCalib,
+                'pCalib': self.pCalib,
+                'numChannels': self.numChannels,
+                'numSamples': self.numSamples,
+                'frameSize': self.frameSize,
+                'blockSize': self.blockSize,
+                'applyMicCorr': self.applyMicCorr,
+                'applyAdcCorr': self.applyAdcCorr,
+                'saveRawData': self.saveRawData,
+                'calibFactor': self.calibFactor,
+                'cutSamples': self.cutSamples
+                }
+
+            # Microphone and ADC corrections compiled once into a single
+            # minimum-phase filter (cached by curve and sampling rate)
+            try:
+                self.params['correction'] = pyslm.compile_correction(
+                    curves=[self.micCorr if self.applyMicCorr and type(self.micCorr) == np.ndarray else None,
+                            self.adcCorr if self.applyAdcCorr and type(self.adcCorr) == np.ndarray else None],
+                    fs=self.fs)
+            except Exception as E:
+                print("StreamEngine._set_parameters(): ", E, "\n")
+                self.params['correction'] = None
+        except Exception as E:
+            print("StreamEngine._set_parameters(): ", E, "\n")
+        return
+
+
+    def _set_excitation(self) -> Callable:
+        try:
+            if self.method == 'sweepExponential':
+                excitation = pyslm.sweep(fstart=self.fstart,
+                                        fend=self.fend,
+                                        fs=self.fs,
+                                        duration=self.excitTime,
+                                        startMargin=0,
+                                        stopMargin=0)
+                initial_zeros = np.zeros(shape=(int(self.fs*self.scapeTime)))
+                final_zeros = np.zeros(shape=(int(self.fs*self.decayTime)))
+                self.excitation = np.concatenate((initial_zeros, excitation, final_zeros), axis=0)
+
+            elif self.method == 'pinkNoise':
+                self.excitation = pyslm.noise(kind="pink",
+                                        fs=self.fs,
+                                        duration=self.excitTime,
+                                        startMargin=self.scapeTime,
+                                        stopMargin=self.decayTime)
+
+            elif self.method == 'whiteNoise':
+                self.excitation = pyslm.noise(kind="white",
+                                        fs=self.fs,
+                                        duration=self.excitTime,
+                                        startMargin=self.scapeTime,
+                                        stopMargin=self.decayTime)
+            else: # 'impulse'
+                pass
+            if self.excitation is not None:
+                # Excitation pre-rendered on the output channels of outCh, padded with
+                # silence to whole blocks so that every callback just copies a slice
+                numRows = int(np.ceil(max(self.excitation.size, self.numSamples) /
+                                      self.blockSize) + 1) * self.blockSize
+                self.outputSignal = np.zeros(shape=(numRows, self.numOutputs), dtype='float32')
+                self.outputSignal[:self.excitation.size, np.asarray(self.outCh) - 1] =\
+                    self.excitation[:, np.newaxis]
+        except Exception as E:
+            print("StreamEngine._set_excitation(): ", E, "\n")
+        return
+
+
+    def _standby_callback(self, indata: np.ndarray, frames: int,
+                          times: type, status: sd.CallbackFlags) -> Callable:
+        try:
+            if self.isStopped.is_set():
+                self.stop()
+            elif indata.any():
+                # Copiando os dados para o buffer circular em memória compartilhada
+                self._enqueue(indata, times=times)
+            else:
+                pass
+        except Exception as E:
+            print("StreamEngine._standby_callback(): ", E, "\n")
+        return
+
+
+    def _input_callback(self, indata: np.ndarray, frames: int,
+                        times: type, status: sd.CallbackFlags) -> Callable:
+        try:
+            # Verificando se a stream está em stand-by
+            if self.isPaused.is_set():
+                pass
+            # Verificando condições de parada
+            elif self.isStopped.is_set():
+                self.stop()
+            # Parando no fim de um quadro de análise completo
+            elif self.framesRead >= self.numSamples or (self.countDn < self.frameSize and\
+                                                        self.framesRead % self.frameSize == 0):
+                self.stop()
+            else:
+                if indata.any():
+                    # Copiando os dados para o buffer circular de processamento
+                    self._enqueue(indata, self.framesRead, times=times)
+                    # Iterando quantidade de frames já armazenados
+                    self.framesRead += frames
+                    # Iterando contagem regressiva para tamanho do sinal de
+                    # medição esperado em samples
+                    self.countDn = self.numSamples - self.framesRead
+                else:
+                    pass
+        except Exception as E:
+            print("StreamEngine._input_callback(): ", E, "\n")
+        return
+
+
+    def _stream_callback(self, indata: np.ndarray, outdata: np.ndarray,
+                        frames: int, times: type, status: sd.CallbackFlags) -> Callable:
+        try:
+            # Silêncio na saída, exceto quando a excitação é reproduzida
+            outdata.fill(0)
+            # Verificando se a stream está em stand-by
+            if self.isPaused.is_set():
+                pass
+            # Verificando condições de parada
+            elif self.isStopped.is_set():
+                self.stop()
+            elif self.framesRead >= self.numSamples or (self.countDn <= self.frameSize and\
+                                                        self.framesRead % self.frameSize == 0):
+                self.countDecay += 1
+                if self.countDecay >= self.numDecay:
+                    self.stop()
+                else:
+                    self.framesRead = 0
+                    self.countDn = self.numSamples
+            else:
+                if indata.any():
+                    # Copiando os dados para o buffer circular de processamento
+                    self._enqueue(indata, self.framesRead, self.countDecay, times)
+                    # Enviando sinal de excitação para reprodução (cópia sem alocação)
+                    np.copyto(outdata, self.outputSignal[self.framesRead:self.framesRead+frames])
+                    # Iterando quantidade de frames já armazenados
+                    self.framesRead += frames
+                    # Iterando contagem regressiva para tamanho do sinal de medição esperado em samples
+                    self.countDn = self.numSamples - self.framesRead
+                else:
+                    pass
+        except Exception as E:
+            print("StreamEngine._stream_callback(): ", E, "\n")
+        return
+
+
+    def _enqueue(self, data: np.ndarray, framesRead: int = 0, countDecay: int = 0,
+                 times: type = None) -> Callable:
+        # Capture time of the first sample of the block on the time.perf_counter clock,
+        # some host APIs do not provide the ADC time (zero)
+        captureTime = time.perf_counter()
+        if times is not None and times.inputBufferAdcTime > 0:
+            captureTime -= times.currentTime - times.inputBufferAdcTime
+        try:
+            self.inData.put_nowait(data, framesRead, countDecay, captureTime)
+        except queue.Full:
+            # The processes are not keeping up, the frame is lost
+            self.streamStats.drop()
+        self.streamStats.queued(self.inData.depth())
+        return
+
+
+    def realtime(self)  -> Callable:
+        try:
+            self.isPlayed.wait()
+            # Results of the current frame delivered by each worker
+            parts = [None] * len(self.parallelProcesses)
+            # Results still queued after the stop are also pulled
+            while self.isPlayed.is_set()\
+                    or any(process.is_alive() for process in self.parallelProcesses)\
+                    or not all(process.results.empty() for process in self.parallelProcesses):
+                try:
+                    # Every worker delivers the frames in the order of the ring,
+                    # so the n-th results of all workers belong to the same frame
+                    for index, process in enumerate(self.parallelProcesses):
+                        if parts[index] is None:
+                            # Sleeping until the parallel process delivers a frame
+                            parts[index] = process.results.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                results = pyslm.merge_channels(parts)
+                results.update(self.metadata)
+                results['streamStats'] = self.streamStats.summary()
+                results['timestamps']['emitted'] = time.perf_counter()
+                self.latencyMeter.add(results['timestamps'])
+                parts = [None] * len(self.parallelProcesses)
+                if self.template == 'stand-by':
+                    self._realtime_data(results)
+                elif self.template == 'spl':
+                    # History rebuilt from the levels of each frame
+                    self.Lglobal.append(results['Lp_global'])
+                    results['Lglobal'] = self.Lglobal.values
+                    self._realtime_data(results)
+                    self.Leq_global = results['Leq_global']
+                    self.Lpeak = results['Lpeak']
+                    self.SEL = results['SEL']
+                    self.Lmaxima = {key: results[key] for key in results if key.endswith('max')}
+                    if self.saveRawData:
+                        self.recorderRawData.add(results['signal'])
+                elif self.template == 'frequencyAnalyzer':
+                    # Histories rebuilt from the levels of each frame
+                    self.Lglobal.append(results['Lp_global'])
+                    if self.Lbands is None:
+                        self.Lbands = pyslm.timehistory(shape=np.shape(results['Lp_bands']))
+                    self.Lbands.append(results['Lp_bands'])
+                    results['Lglobal'] = self.Lglobal.values
+                    self._realtime_data(results)
+                    self.Leq_bands = results['Leq_bands']
+                    self.L_max_bands = results['L_max_bands']
+                    self.L_min_bands = results['L_min_bands']
+                    self.Leq_global = results['Leq_global']
+                    self.Lpeak = results['Lpeak']
+                    self.SEL = results['SEL']
+                    self.Lmaxima = {key: results[key] for key in results if key.endswith('max')}
+                    if self.saveRawData:
+                        self.recorderRawData.add(results['signal'])
+                elif self.template == 'reverberationTime':
+                    self._realtime_data(results)
+                    signal = results['signal']
+                    framesRead = results['framesRead']
+                    countDecay = results['countDecay']
+                    self.send_to_disk[framesRead:framesRead+self.frameSize, countDecay] = signal[:,0]
+                elif self.template == 'calibration':
+                    self._realtime_data(results)
+                    signal = results['signal']
+                    framesRead = results['framesRead']
+                    self.send_to_disk[framesRead:framesRead+self.frameSize] = signal[:, :1]
+        except Exception as E:
+            print("StreamEngine.realtime(): ", E, "\n")
+        return
+
+
+    def fullresults(self) -> Callable:
+        try:
+            if self.template == 'spl':
+                process = pyslm.finalprocessing(
+                    inData = self.Lglobal.values,
+                    params = self.params,
+                    bandfilter = None,
+                    weightingfilter = None
+                    )
+                process.results['Leq_global'] = self.Leq_global
+                process.results['Lpeak'] = self.Lpeak
+                process.results['Lglobal'] = self.Lglobal.values
+                process.results['Lmax'] = self.Lglobal.values.max(axis=0)
+                process.results['Lmin'] = self.Lglobal.values.min(axis=0)
+                process.results['SEL'] = self.SEL
+                process.results.update(self.Lmaxima)
+                process.results['framesRead'] = self.framesRead
+                process.results['frameDuration'] = self.frameSize / self.fs
+                process.results['throughput'] = self.throughput
+                process.results['streamStats'] = self.streamStats.summary()
+                process.results['recorderStats'] = self.recorderStats
+                process.results['latency'] = self.latencyMeter.summary()
+                self._fullresults_data(process.results)
+            elif self.template == 'frequencyAnalyzer':
+                process = pyslm.finalprocessing(
+                    inData = self.Lglobal.values,
+                    params = self.params,
+                    bandfilter = None,
+                    weightingfilter = None
+                    )
+                process.results['Leq_bands'] = self.Leq_bands
+                process.results['L_max_bands'] = self.L_max_bands
+                process.results['L_min_bands'] = self.L_min_bands
+                process.results['Lbands'] = self.Lbands.values if self.Lbands is not None else None
+                process.results['bands'] = self.parallelProcess.bands
+                process.results['Leq_global'] = self.Leq_global
+                process.results['Lpeak'] = self.Lpeak
+                process.results['Lglobal'] = self.Lglobal.values
+                process.results['Lmax'] = self.Lglobal.values.max(axis=0)
+                process.results['Lmin'] = self.Lglobal.values.min(axis=0)
+                process.results['SEL'] = self.SEL
+                process.results.update(self.Lmaxima)
+                process.results['framesRead'] = self.framesRead
+                process.results['frameDuration'] = self.frameSize / self.fs
+                process.results['throughput'] = self.throughput
+                process.results['streamStats'] = self.streamStats.summary()
+                process.results['recorderStats'] = self.recorderStats
+                process.results['latency'] = self.latencyMeter.summary()
+                self._fullresults_data(process.results)
+            elif self.template == 'reverberationTime':
+                self.IR = pyslm.ImpulseResponse(
+                    signal = self.send_to_disk,
+                    excitTime = self.excitTime,
+                    fs = self.fs,
+                    numDecay = self.numDecay, 
+                    scapeTime = self.scapeTime,
+                    method = self.method,
+                    excitation = self.excitation
+                    )
+                if self.saveRawData:
+                    self.recorderRawData = pyslm.storage(
+                        buffer_size = int(self.fs*30),
+                        shape = (self.IR.size, 1),
+                        path = self.path, kind='TR', fs=self.fs,
+                        dtype = self.precision
+                        )
+                    self.recorderRawData.add(self.IR.reshape(self.IR.size, 1))
+                    self.recorderRawData.attrs.update(self.streamStats.summary())
+                    self.recorderRawData.close()
+                process = pyslm.finalprocessing(
+                    inData = self.IR,
+                    params = self.params,
+                    bandfilter = self.parallelProcess.bandfilter,
+                    weightingfilter = self.parallelProcess.weightingfilter
+                    )
+                process.results['bands'] = self.parallelProcess.bands
+                process.results['streamStats'] = self.streamStats.summary()
+                process.results['latency'] = self.latencyMeter.summary()
+                self._fullresults_data(process.results)
+                self.RT20 = process.results['RT20']
+                # print(self.RT20)
+            elif self.template == 'calibration':
+                self.send_to_disk = self.send_to_disk[self.cutSamples:self.framesRead,0]
+                process = pyslm.finalprocessing(inData=self.send_to_disk, params=self.params, bandfilter = None, weightingfilter = None)
+                process.results['streamStats'] = self.streamStats.summary()
+                process.results['latency'] = self.latencyMeter.summary()
+                self._fullresults_data(process.results)
+        except Exception as E:
+            print("StreamEngine.fullresults(): ", E, "\n")
+        return
+
+
+if __name__ == '__main__':
+    micData = np.loadtxt(fname='Files\\microphoneFRF.txt')
+    adcData = np.loadtxt(fname='Files\\adcFRF.txt')
+    demo = StreamEngine(
+        version = 'AdvFreqAnalyzer',
+        path = None,
+        device = [1, 3],
+        fs = 44100,
+        inCh = [1],
+        outCh = [1, 2],
+        tau = 0.125,
+        fstart = 63.0,
+        fend = 8000.0,
+        b = 1,
+        fweighting = 'Z',
+        duration = 180,
+        excitTime = 5,
+        scapeTime = 2,
+        decayTime = 5,
+        # 'calibration', 'stand-by', 'reverberationTime', 'frequencyAnalyzer', 'spl'
+        template = 'frequencyAnalyzer',
+        method = 'pinkNoise',  # 'pinkNoise', 'whiteNoise', 'sweepExponential', 'impulse'
+        numDecay = 2,
+        TLevel  =  76,
+        fCalib = 1000.0,
+        pCalib = 94.0,
+        calibFactor  =  1.0,
+        micCorr = None,
+        applyMicCorr = False,
+        adcCorr = None,
+        applyAdcCorr = False,
+        saveRawData = True
+        )
+    for results in demo:
+        print(results['Lp_global'])
+    print("\n\n\n************* End of stream *************")
\ No newline at end of file
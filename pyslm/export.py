@@ -1,28 +1,178 @@
+from typing import Union
+import threading as thd
 import soundfile as sf
 import numpy as np
 import xlsxwriter
 import pyslm
+import queue
 import h5py
 import os
 
+
+# Subtypes of the sound files for the encodings of `storage`
+_audioSubtypes = {'int16': 'PCM_16', 'int24': 'PCM_24', 'float32': 'FLOAT', 'float64': 'FLOAT'}
+
+
+def audio_subtype(encoding: Union[str, None], file_audio: str, format: Union[str, None] = None):
+    """
+    Description
+    -----------
+    Sound file subtype that keeps the resolution of the samples recorded with
+    `encoding`. Formats without floating point samples (e.g. FLAC) get PCM_24.
+
+    Parameters
+    ----------
+    encoding : str or None
+        Encoding attribute of the dataset, None for the default subtype.
+    file_audio : str
+        Sound file, its extension gives the format when `format` is None.
+    format : str, optional
+        As in soundfile.SoundFile. The default is None.
+
+    Returns
+    -------
+    subtype : str or None
+        None when the encoding is unknown (the default of soundfile).
+    """
+    subtype = _audioSubtypes.get(encoding)
+    if subtype is None:
+        return None
+    format = (format or os.path.splitext(file_audio)[1][1:]).upper()
+    if not sf.check_format(format, subtype):
+        subtype = 'PCM_24' if sf.check_format(format, 'PCM_24') else None
+    return subtype
+
+
+def convert(file_name: str, file_audio: str, fs: int, start: int = 0, stop: Union[int, None] = None,
+            blockSize: Union[int, None] = None, prefetch: bool = True, format: Union[str, None] = None,
+            subtype: Union[str, None] = None):
+    """
+    Description
+    -----------
+    Converts the samples [start, stop) of the dataset recorded by `storage`
+    into a sound file block by block, so the memory does not grow with the
+    length of the recording. With `prefetch` the next blocks are read and
+    decoded from the HDF5 file by a reader thread while the current one is
+    encoded (e.g. by the FLAC encoder).
+
+    As in `soundstorage`, the samples are written relative to the full scale
+    of the ADC (calibFactor, saved in the comment of the file). The integer
+    codes of the 'int16' and 'int24' encodings are copied without rounding
+    when the subtype has their resolution.
+
+    Parameters
+    ----------
+    file_name : str
+        HDF5 file recorded by `storage`
+    file_audio : str
+        Sound file to be written
+    fs : int
+        Sampling rate [Hz]
+    start : int, optional
+        First sample. The default is 0.
+    stop : int, optional
+        Last sample (excluded), None for the end of the recording.
+        The default is None.
+    blockSize : int, optional
+        Samples of each block, None for ten seconds. The default is None.
+    prefetch : bool, optional
+        Reads the blocks in a background thread. The default is True.
+    format, subtype : str, optional
+        As in soundfile.SoundFile. None infers the format from the extension
+        and the subtype from the encoding of the dataset (see `audio_subtype`).
+        The default is None.
+    """
+    blockSize = int(blockSize or 10*fs)
+    with h5py.File(name=file_name, mode='r') as RawData:
+        dataset = RawData['recSignal']
+        stop = dataset.shape[0] if stop is None else min(int(stop), dataset.shape[0])
+        start = min(int(start), stop)
+        blocks = range(start, stop, blockSize)
+        encoding = dataset.attrs.get('encoding')
+        encoding = encoding.decode() if isinstance(encoding, bytes) else encoding
+        calibFactor = float(dataset.attrs.get('calibFactor', 1.))
+        if subtype is None:
+            subtype = audio_subtype(encoding, file_audio, format)
+        # Integer codes stored with the resolution of the file are copied as they are
+        codes = encoding in ['int16', 'int24'] and subtype == _audioSubtypes[encoding]
+
+        def read(i: int) -> np.ndarray:
+            selection = np.s_[i:min(i + blockSize, stop)]
+            if codes and encoding == 'int16':
+                return np.asarray(dataset[selection], dtype='int16')
+            elif codes:
+                # The 24-bit PCM codes are the upper bits of 32-bit integers
+                return np.left_shift(np.asarray(dataset[selection], dtype='int32'), 8)
+            # As in pyslm.soundstorage, the full scale of the file is calibFactor
+            block = pyslm.storage.decode(dataset, selection) / calibFactor
+            if not audio.subtype.startswith(('FLOAT', 'DOUBLE')):
+                # Beyond the full scale the PCM codes would wrap around
+                np.clip(block, -1., 1., out=block)
+            return block
+        with sf.SoundFile(file_audio, 'w', samplerate=int(fs), channels=dataset.shape[1],
+                          format=format, subtype=subtype) as audio:
+            try:
+                audio.comment = 'calibFactor=%r' % calibFactor
+            except RuntimeError:
+                # W64 files do not store strings
+                pass
+            if not prefetch:
+                for i in blocks:
+                    audio.write(read(i))
+                return
+            # At most two blocks wait for the encoder, the memory stays bounded
+            decoded = queue.Queue(maxsize=2)
+            stopping = thd.Event()
+
+            def reader():
+                try:
+                    for i in blocks:
+                        if stopping.is_set():
+                            break
+                        decoded.put(read(i))
+                except Exception as E:
+                    print("export.convert(): ", E, "\n")
+                decoded.put(None)
+                return
+            thread = thd.Thread(target=reader, daemon=True)
+            thread.start()
+            try:
+                while True:
+                    block = decoded.get()
+                    if block is None:
+                        break
+                    audio.write(block)
+            finally:
+                # Releasing the reader if the encoder failed
+                stopping.set()
+                while thread.is_alive():
+                    try:
+                        decoded.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+    return
+
+
 def save(params: dict, results: dict, timestamp: dict, file_name: str):
     # Saving raw data to a .wav file
-    if params['saveRawData']:
-        RawData = h5py.File(name=file_name, mode='r')
-        audio = np.asarray(RawData.get('recSignal'))
+    if params['saveRawData'] and not h5py.is_hdf5(file_name):
+        # Already recorded into a sound file during the measurement
+        file_audio = file_name
+    elif params['saveRawData']:
         file_audio = file_name.replace(".h5", ".wav")
         if params['template'] != 'reverberationTime':
-            sf.write(file=file_audio, data=audio[int(0.15*params['fs']):results['framesRead']], samplerate=params["fs"])
+            convert(file_name, file_audio, fs=params['fs'], start=params.get('cutSamples', int(0.15*params['fs'])),
+                    stop=results['framesRead'])
         else:
-            sf.write(file=file_audio, data=audio, samplerate=params["fs"])
+            convert(file_name, file_audio, fs=params['fs'])
     else:
         file_audio = None
-    file_name = (file_name.replace("(raw data) ", "")).replace(".h5", ".xlsx")
+    file_name = os.path.splitext(file_name.replace("(raw data) ", ""))[0] + ".xlsx"
 
     if params['version'] == 'AdvFreqAnalyzer':
         if params['template'] != 'reverberationTime':
-            # Time vector
-            time = np.arange(results['Lglobal'].size) * params['tau']
+            # Time vector, one row per frame of the first channel
+            time, Lglobal = time_history(params, results)
 
         # time weighting string
         if params['tau'] == 0.035:
@@ -133,7 +283,7 @@ def save(params: dict, results: dict, timestamp: dict, file_name: str):
             sheetResults.write(30, 0, 'Time         s', formatInformationT)
             sheetResults.write_column(31,0, time)
             sheetResults.write(30, 1, 'Level dB', formatInformationT)
-            sheetResults.write_column(31,1, results['Lglobal'])
+            sheetResults.write_column(31,1, Lglobal)
             # Inline graphics
             plotLine = workbook.add_chart({'type': 'line'})
             plotLine.add_series({
@@ -319,8 +469,8 @@ def save(params: dict, results: dict, timestamp: dict, file_name: str):
                 sheetResults.insert_chart(31,2, plotOctave_D, {'x_offset': 0, 'y_offset': 0, 'x_scale': 4, 'y_scale': 1.4})
                 sheetResults.insert_chart(58,2, plotOctave_C, {'x_offset': 0, 'y_offset': 0, 'x_scale': 4, 'y_scale': 1.4})
     else: # DataLogger
-        # Time vector
-        time = np.arange(results['Lglobal'].size) * params['tau']
+        # Time vector, one row per frame of the first channel
+        time, Lglobal = time_history(params, results)
 
         # Time weighting labels
         if params['tau'] == 0.035:
@@ -371,7 +521,7 @@ def save(params: dict, results: dict, timestamp: dict, file_name: str):
         sheetResults.write(3, 0, 'Time         s', formatInformationT)
         sheetResults.write_column(4,0, time)
         sheetResults.write(3, 1, 'Level dB', formatInformationT)
-        sheetResults.write_column(4,1, results['Lglobal'])
+        sheetResults.write_column(4,1, Lglobal)
 
         # Inline graphics
         plotLine = workbook.add_chart({'type': 'line'})
@@ -404,6 +554,19 @@ def save(params: dict, results: dict, timestamp: dict, file_name: str):
     workbook.close()
     return
 
+def time_history(params: dict, results: dict):
+    # Each level of the history is a frame of frameSize samples (the display
+    # time rounded to whole blocks), Lglobal has one column per channel
+    Lglobal = np.asarray(results['Lglobal'])
+    Lglobal = Lglobal.reshape(Lglobal.shape[0], -1)[:, 0]
+    if 'frameDuration' in results:
+        frameDuration = results['frameDuration']
+    elif 'frameSize' in params:
+        frameDuration = params['frameSize'] / params['fs']
+    else:
+        frameDuration = params['tau']
+    return np.arange(Lglobal.shape[0]) * frameDuration, Lglobal
+
 def seconds2MS(seconds): 
     M, S = divmod(seconds, 60) 
     _, M = divmod(M, 60)
@@ -0,0 +1,211 @@
+from typing import Union, Callable
+import sounddevice as sd
+import soundfile as sf
+import threading as thd
+from .storage import storage
+import numpy as np
+import h5py
+import time
+import os
+
+
+class filestream(object):
+    """
+    Description
+    -----------
+    Virtual input device that replays an audio file (WAV, FLAC, ... or a
+    `storage` HDF5 file) through the same callback interface as
+    sounddevice.InputStream/sounddevice.Stream, so that the StreamManager
+    processing chain can be fed from archived recordings instead of a
+    sound card.
+
+    As from a sound card, the blocks are relative to the full scale of the
+    ADC: the HDF5 recordings, stored in the units of the signal, are divided
+    by their calibFactor attribute, so a recording replayed with the same
+    calibFactor gives the levels of the original measurement.
+
+    Parameters
+    ----------
+    fname : str
+        Path of the audio file or of the HDF5 file recorded by `storage`.
+    samplerate : int
+        Sampling rate [Hz], only used if the file does not provide one.
+    blocksize : int
+        Number of samples delivered per callback.
+    device : any
+        Ignored, kept for compatibility with sounddevice streams.
+    channels : int | tuple
+        Number of channels delivered per callback (the first ones of the file),
+        or (input, output) channels if duplex is True.
+    dtype : str
+        Data type of the delivered blocks.
+    callback : Callable
+        Same signature as the sounddevice callbacks:
+            callback(indata, frames, time, status) or
+            callback(indata, outdata, frames, time, status) if duplex is True.
+    finished_callback : Callable, optional
+        Function called when the end of the file is reached.
+    pace : str, optional
+        'realtime' to deliver the blocks at the sampling rate of the file or
+        'fast' to deliver them as fast as the consumer allows.
+        The default is 'realtime'.
+    isFull : Callable, optional
+        Function that returns True while the consumer can not take more
+        blocks, used for backpressure in the 'fast' pace.
+    duplex : bool, optional
+        If True, an output buffer is also passed to the callback (and discarded).
+        The default is False.
+    dataset : str, optional
+        Name of the dataset read from HDF5 files.
+        The default is 'recSignal'.
+
+    Attributes
+    ----------
+    framesPerSecond : float
+        Blocks delivered per second of wall-clock time.
+    realtimeFactor : float
+        Seconds of audio delivered per second of wall-clock time.
+    """
+
+    def __init__(self, fname: str, samplerate: int, blocksize: int, device=None,
+                 channels: int = 1, dtype: str = 'float32', callback: Callable = None,
+                 finished_callback: Union[Callable, None] = None, pace: str = 'realtime',
+                 isFull: Union[Callable, None] = None, duplex: bool = False,
+                 dataset: str = 'recSignal'):
+        if pace not in ['realtime', 'fast']:
+            raise ValueError("Pace %s not supported, please try 'realtime' or 'fast'." % pace)
+        self.fname = fname
+        self.samplerate = self.samplerate_of(fname=fname, dataset=dataset, default=samplerate)
+        self.blocksize = blocksize
+        self.device = device
+        if isinstance(channels, (tuple, list)):
+            self.channels, self.outputChannels = channels
+        else:
+            self.channels = self.outputChannels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.pace = pace
+        self.isFull = isFull
+        self.duplex = duplex
+        self.dataset = dataset
+        self.active = False
+        self.closed = False
+        self.framesPerSecond = 0.
+        self.realtimeFactor = 0.
+        self._stopping = thd.Event()
+        self._finished = thd.Event()
+        self._thread = None
+        return
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return
+
+    def start(self):
+        self._stopping.clear()
+        self._finished.clear()
+        self.active = True
+        self._thread = thd.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return
+
+    def stop(self):
+        self._stopping.set()
+        # No callback runs anymore once the end of the file was reached, and the
+        # finished callback itself may be waiting for the caller of this method
+        if self._thread is not None and self._thread is not thd.current_thread()\
+                and not self._finished.is_set():
+            self._thread.join()
+        self.active = False
+        return
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stop()
+        return
+
+    @staticmethod
+    def samplerate_of(fname: str, dataset: str = 'recSignal', default: Union[int, None] = None) -> int:
+        """
+        Description
+        -----------
+        Returns the sampling rate of an audio file or of a `storage` HDF5 file
+        (from the 'fs' attribute of the dataset), or `default` if it is unknown.
+        """
+        if h5py.is_hdf5(fname):
+            with h5py.File(fname, 'r') as file:
+                fs = file[dataset].attrs.get('fs', default)
+        else:
+            fs = sf.info(fname).samplerate
+        return int(fs) if fs is not None else fs
+
+    def _blocks(self):
+        if h5py.is_hdf5(self.fname):
+            with h5py.File(self.fname, 'r') as file:
+                data = file[self.dataset]
+                # The recordings are in the units of the signal, the blocks are
+                # relative to the full scale of the ADC as in the sound files
+                calibFactor = data.attrs.get('calibFactor', 1.)
+                for i in range(0, data.shape[0] - self.blocksize + 1, self.blocksize):
+                    block = storage.decode(data, np.s_[i:i+self.blocksize, :self.channels], dtype=self.dtype)
+                    block /= calibFactor
+                    yield block
+        else:
+            with sf.SoundFile(self.fname, 'r') as file:
+                for block in file.blocks(blocksize=self.blocksize, dtype=self.dtype, always_2d=True):
+                    if block.shape[0] == self.blocksize:
+                        yield block[:, :self.channels]
+
+    def _run(self):
+        status = sd.CallbackFlags()
+        times = _times()
+        outdata = np.zeros((self.blocksize, self.outputChannels), dtype=self.dtype) if self.duplex else None
+        count = 0
+        start = time.perf_counter()
+        try:
+            for indata in self._blocks():
+                if self._stopping.is_set():
+                    break
+                if indata.shape[1] < self.channels:
+                    raise ValueError("File %s has only %i channels." % (os.path.basename(self.fname),
+                                                                        indata.shape[1]))
+                if self.pace == 'realtime':
+                    delay = start + count * self.blocksize / self.samplerate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                elif self.isFull is not None:
+                    # Backpressure: waiting for the consumer to free a slot
+                    while self.isFull() and not self._stopping.is_set():
+                        time.sleep(1e-3)
+                times.currentTime = time.perf_counter()
+                times.inputBufferAdcTime = times.currentTime
+                times.outputBufferDacTime = times.currentTime
+                if self.duplex:
+                    self.callback(indata, outdata, self.blocksize, times, status)
+                else:
+                    self.callback(indata, self.blocksize, times, status)
+                count += 1
+        except Exception as E:
+            print("filestream._run(): ", E, "\n")
+        elapsed = time.perf_counter() - start
+        if elapsed > 0:
+            self.framesPerSecond = count / elapsed
+            self.realtimeFactor = count * self.blocksize / self.samplerate / elapsed
+        self.active = False
+        self._finished.set()
+        if self.finished_callback is not None and not self._stopping.is_set():
+            self.finished_callback()
+        return
+
+
+class _times(object):
+    # Mimics the `time` struct that PortAudio passes to the callbacks
+    inputBufferAdcTime = 0.
+    currentTime = 0.
+    outputBufferDacTime = 0.
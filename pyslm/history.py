@@ -0,0 +1,109 @@
+from typing import Union
+import numpy as np
+import h5py
+
+
+class timehistory(object):
+    """
+    Description
+    -----------
+    Growable buffer of levels over time (one row per frame), used instead
+    of np.append so that appending a frame does not copy the whole history.
+    The capacity doubles when the buffer is full, so the cost of `append`
+    is amortized O(1) and a 24 hours log is copied only ~20 times.
+
+    Parameters
+    ----------
+    shape : tuple, optional
+        Shape of each row, e.g. (channels,) for global levels or
+        (bands, channels) for band levels.
+        The default is ().
+    capacity : int, optional
+        Number of rows allocated at the start.
+        The default is 1024.
+    dtype : str, optional
+        Data type of the levels.
+        The default is 'float64'.
+
+    Attributes
+    ----------
+    values : np.ndarray
+        View of the rows appended so far, with shape (frames, *shape).
+
+    Methods
+    -------
+    append(row):
+        Adds one row at the end of the history.
+    extend(rows):
+        Adds several rows at the end of the history.
+    save(fname, name):
+        Writes the history as a dataset of an HDF5 file.
+    load(fname, name):
+        Reads a history written by `save`.
+    """
+
+    def __init__(self, shape: tuple = (), capacity: int = 1024, dtype: str = 'float64'):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._buffer = np.empty(shape=(max(1, int(capacity)),) + self.shape, dtype=self.dtype)
+        self.size = 0
+        return
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.values, dtype=dtype)
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._buffer[:self.size]
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[0]
+
+    def _reserve(self, size: int):
+        if size > self.capacity:
+            capacity = self.capacity
+            while capacity < size:
+                capacity *= 2
+            buffer = np.empty(shape=(capacity,) + self.shape, dtype=self.dtype)
+            buffer[:self.size] = self._buffer[:self.size]
+            self._buffer = buffer
+        return
+
+    def append(self, row: Union[np.ndarray, float]):
+        self._reserve(self.size + 1)
+        self._buffer[self.size] = row
+        self.size += 1
+        return
+
+    def extend(self, rows: np.ndarray):
+        rows = np.asarray(rows, dtype=self.dtype).reshape((-1,) + self.shape)
+        self._reserve(self.size + rows.shape[0])
+        self._buffer[self.size:self.size + rows.shape[0]] = rows
+        self.size += rows.shape[0]
+        return
+
+    def clear(self):
+        self.size = 0
+        return
+
+    def save(self, fname: str, name: str = 'Lglobal', mode: str = 'a'):
+        with h5py.File(fname, mode) as file:
+            if name in file:
+                del file[name]
+            file.create_dataset(name, data=self.values)
+        return
+
+    @staticmethod
+    def load(fname: str, name: str = 'Lglobal'):
+        with h5py.File(fname, 'r') as file:
+            data = file[name][()]
+        history = timehistory(shape=data.shape[1:], capacity=max(1, data.shape[0]), dtype=data.dtype)
+        history.extend(data)
+        return history
@@ -5,7 +5,9 @@
 @e-mail: leonardo.jacomussi@eac.ufsm.br
 """
 
+from typing import Union
 from scipy import signal as sig
+import scipy.fft as fft
 import matplotlib.pyplot as plt
 import numpy as np
 plt.style.use(['dark_background'])
@@ -40,6 +42,49 @@ class OctFilter(object):
     order : int, optional
         Order of filter. 
         The default is 4.
+    stateful : bool, optional
+        If True, `filter` keeps the state of the band filters between calls,
+        so that a signal processed in consecutive blocks gives the same result
+        as in a single call. The state is cleared by `reset`.
+        The default is False.
+    multirate : bool, optional
+        If True, the bands are filtered in a decimating bank: the signal is
+        low-pass filtered (Butterworth of order 12, the same prototype at
+        every stage) and decimated by two per octave, and each band runs at
+        the lowest rate that is at least four times its upper frequency, so
+        the cost of the low bands falls by orders of magnitude. `filter` then
+        returns a list with the signal of each band at its own rate
+        (`fsBands`), use `power` for levels.
+        The default is False.
+    backend : str, optional
+        'iir' to filter every band with its Butterworth filter, or 'fft' to
+        obtain the band energies from FFTs of the size of the block, weighted
+        by the squared magnitude response of the same filters, so that the
+        cost grows with the FFT size instead of the number of bands (useful
+        from 1/6 to 1/24 octave). The FFTs are taken over sine windows with
+        50% overlap, whose squares add up to one, so the energy of a
+        transient is kept wherever it falls in the block (see
+        `fft_spectrum`). If `stateful` the last half block is carried to the
+        next one and the FFT bands lag half a block behind the signal,
+        otherwise every block is padded with zeros. In the 'fft' backend `filter`
+        applies the magnitude responses in the frequency domain (zero phase).
+        The resolution of a block of N samples is fs/N: the bands narrower
+        than `fftMinBins` bins (the low bands of fine resolutions) can not be
+        resolved by the FFT and are filtered by their IIR filters instead,
+        keeping their state across blocks if `stateful`.
+        The default is 'iir'.
+    dtype : str, optional
+        Precision of the coefficients, of the states and of the outputs, with
+        'float32' a float32 signal is filtered in single precision.
+        At full rate the lowest bands lose about 0.1 dB in single precision,
+        the multirate mode keeps them exact.
+        The default is 'float64'.
+    reuseOutput : bool, optional
+        If True, the output array of `filter` is preallocated and reused by
+        the next call (overwriting the previous output), which saves an
+        allocation per block when the output is consumed before the next
+        call, as in `power`. Otherwise every call returns a new array.
+        The default is False.
 
     Attributes
     ----------
@@ -51,11 +96,17 @@ class OctFilter(object):
         Nominal center frequencies.
     f2: np.array
         Upper frequency.
+    fsBands: np.array
+        Sampling rate of each band (fs, or fs/2**stage in multirate mode).
 
     Methods
     -------
     filter():
         Filter data using octave filters.
+    power():
+        Mean square of the filtered data of each band.
+    reset():
+        Clears the state of the stateful filters.
     Standard():
         Returns figures with frequency response and normative parameters.
     Analyze():
@@ -91,9 +142,13 @@ class OctFilter(object):
     >>> rmsData = Filter.Analyze(filteredSignal, plot=True)
     """
 
+    # Minimum width of a band in FFT bins for the 'fft' backend
+    fftMinBins = 4
+
     def __init__(self, fstart: float = 20.0, fend: float = 20000.0,
                  b: int = 1, fs: int = 48000, G: int = 10, fr: int = 1000,
-                 order: int = 4):
+                 order: int = 4, stateful: bool = False, multirate: bool = False,
+                 backend: str = 'iir', dtype: str = 'float64', reuseOutput: bool = False):
         self.fstart = fstart
         self.fend = fend
         self.b = b
@@ -101,9 +156,39 @@ class OctFilter(object):
         self.G = G
         self.fr = fr
         self.order = order
+        self.stateful = stateful
+        self.multirate = multirate
+        self.backend = backend.lower()
+        self.dtype = np.dtype(dtype)
+        # Output of `filter`, reused while the shape of the data is the same
+        self.reuseOutput = reuseOutput
+        self._output = None
+        if self.backend not in ('iir', 'fft'):
+            raise ValueError("Backend %s is not supported, please try 'iir' or 'fft'." % backend)
+        if self.multirate and self.backend == 'fft':
+            raise ValueError("The multirate bank is only available for the 'iir' backend.")
+        # Band weights and windows of the 'fft' backend by block size
+        self._fftTables = {}
         self.Nyquist = self.fs/2
         self.__frequencies()
         self.__design()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state of the band filters (stateful filtering).
+        """
+        self.zi = None
+        # Multirate bank: state of each band, of each decimation stage and
+        # parity of the next sample kept by the decimation
+        self.ziBands = [None] * self.fm.size
+        self.ziStages = [None] * self.numStages
+        self.phase = np.zeros(self.numStages, dtype=int)
+        # Last mean square of each band of the multirate bank
+        self.bandPower = [None] * self.fm.size
+        # Samples of the 'fft' backend waiting for the next overlapped window
+        self.fftHistory = None
+        return
 
     def __frequencies(self):
         """
@@ -174,15 +259,203 @@ class OctFilter(object):
         Filter coefficients
         """
 
+        # Decimation stage of each band, a band moves down one octave while
+        # its upper frequency stays below a quarter of the lower rate
+        self.stages = np.zeros(self.fm.size, dtype=int)
+        if self.multirate:
+            for index in range(self.fm.size):
+                while self.f2[index] <= self.fs / 2**(self.stages[index] + 1) / 4:
+                    self.stages[index] += 1
+        self.numStages = int(self.stages.max()) + 1 if self.fm.size else 1
+        self.fsBands = self.fs / 2.0**self.stages
+        # Anti-aliasing filter of the decimation by two, the same coefficients
+        # serve every stage since they are normalized to the rate
+        # (maximally flat, so the bands of the lower stages keep their level)
+        self.aa_sos = sig.butter(N=12, Wn=0.45, output='sos').astype(self.dtype)
         self.sos = np.empty((0, 6))
         for index in range(self.fm.size):
+            Nyquist = self.fsBands[index] / 2
             lowCutoff = self.f1[index]
-            highCutoff = self.f2[index] if self.f2[index] < self.Nyquist else self.Nyquist-1
+            highCutoff = self.f2[index] if self.f2[index] < Nyquist else Nyquist-1
             sos = sig.butter(N=self.order, Wn=np.array([lowCutoff, highCutoff]),
-                             btype='bp', output='sos', fs=self.fs)
+                             btype='bp', output='sos', fs=self.fsBands[index])
             self.sos = np.append(self.sos, sos, axis=0)
+        self.sos = self.sos.astype(self.dtype)
         return self.sos
 
+    def __sosfilt(self, sos: np.ndarray, data: np.ndarray, zi: np.ndarray):
+        # Filtering along the time axis from a previous state, created at rest
+        # when missing or when the number of channels changes
+        shape = (sos.shape[0], 2) + data.shape[1:]
+        if zi is None or zi.shape != shape:
+            zi = np.zeros(shape, dtype=self.dtype)
+        if data.shape[0] == 0:
+            # Short blocks may leave no sample at the lowest rates
+            return np.empty(data.shape), zi
+        return sig.sosfilt(sos, data, axis=0, zi=zi)
+
+    def fft_resolved(self, numSamples: int) -> np.ndarray:
+        """
+        Bands at least `fftMinBins` FFT bins wide for blocks of `numSamples`
+        samples (boolean mask), the others are filtered by their IIR filters
+        in the 'fft' backend.
+        """
+        return (self.f2 - self.f1) >= self.fftMinBins * self.fs / numSamples
+
+    def iir_power(self, data: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """
+        Mean square of the bands `indices` filtered by their IIR filters at
+        full rate, keeping their state across calls if `stateful`.
+
+        Returns
+        -------
+        meanSquare : np.ndarray
+            Mean square of each band, with shape (len(indices),) or
+            (len(indices), channels).
+        """
+        if self.multirate:
+            raise ValueError("The IIR power of single bands is only available for the full rate bank.")
+        meanSquare = np.empty((len(indices),) + data.shape[1:], dtype=self.dtype)
+        for n, index in enumerate(indices):
+            if not self.stateful:
+                self.ziBands[index] = None
+            filtered, self.ziBands[index] = self.__sosfilt(
+                self.sos[(self.order * index):(self.order * index + self.order), :], data, self.ziBands[index])
+            meanSquare[n] = np.mean(filtered**2, axis=0)
+        return meanSquare
+
+    def fft_tables(self, numSamples: int):
+        """
+        Tables of the 'fft' backend for FFTs of `numSamples` samples,
+        calculated once per size (also used by pyslm.spectralanalyzer).
+
+        Returns
+        -------
+        magnitude : np.ndarray
+            Magnitude response of each band at the FFT bins (bands, bins).
+        weights : np.ndarray
+            Squared magnitude with the one-sided scale, so that
+            weights @ |rfft(segment*window)|**2 is the energy (sum of squares)
+            of each band in the windowed segment.
+        window : np.ndarray
+            Sine window, w[n]**2 + w[n + numSamples/2]**2 = 1 for an even
+            `numSamples`.
+        """
+        if self.multirate:
+            raise ValueError("The FFT tables are only available for the full rate bank.")
+        if numSamples not in self._fftTables:
+            freq = np.fft.rfftfreq(numSamples, d=1/self.fs)
+            magnitude = np.empty((self.fm.size, freq.size))
+            for index in range(self.fm.size):
+                _, h = sig.sosfreqz(self.sos[(self.order * index):(self.order * index + self.order), :],
+                                    worN=freq, fs=self.fs)
+                magnitude[index] = np.abs(h)
+            window = np.sin(np.pi * (np.arange(numSamples) + 0.5) / numSamples)
+            # One-sided spectrum (DC and Nyquist counted once) and Parseval
+            scale = np.full(freq.size, 2.0)
+            scale[0] = 1.0
+            if numSamples % 2 == 0:
+                scale[-1] = 1.0
+            weights = magnitude**2 * scale / numSamples
+            self._fftTables[numSamples] = (magnitude.astype(self.dtype), weights.astype(self.dtype),
+                                           window.astype(self.dtype))
+        return self._fftTables[numSamples]
+
+    def fft_spectrum(self, data: np.ndarray, history: Union[np.ndarray, None] = None):
+        """
+        Energy spectrum of a block over sine windows of the size of the block
+        with 50% overlap. The squares of overlapping windows add up to one,
+        so the sum of the spectra keeps the energy of the signal (see
+        `fft_tables`) wherever a transient falls, unlike a single window.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            Block of samples, with shape (samples,) or (samples, channels).
+        history : np.ndarray, optional
+            Samples left by the previous block, the windows then continue
+            across the blocks (start with zeros of half a block). If None,
+            the block is padded with zeros and analysed on its own.
+            The default is None.
+
+        Returns
+        -------
+        spectrum : np.ndarray
+            Sum of |rfft(segment*window)|**2 of the segments, with shape
+            (bins,) or (bins, channels).
+        history : np.ndarray
+            Samples not fully windowed yet, for the next block.
+        """
+        numSamples = data.shape[0]
+        _, _, window = self.fft_tables(numSamples)
+        hop = max(numSamples // 2, 1)
+        if history is None:
+            pending = np.concatenate([np.zeros((hop,) + data.shape[1:], dtype=data.dtype), data,
+                                      np.zeros((hop + (-numSamples) % hop,) + data.shape[1:], dtype=data.dtype)])
+        else:
+            pending = np.concatenate([history, data])
+        # (segments, [channels], samples)
+        segments = np.lib.stride_tricks.sliding_window_view(pending, numSamples, axis=0)[::hop]
+        spectrum = np.sum(np.abs(fft.rfft(segments * window, axis=-1))**2, axis=0)
+        return np.moveaxis(spectrum, -1, 0), pending[segments.shape[0] * hop:].copy()
+
+    def __fft_filter(self, data: np.ndarray) -> np.ndarray:
+        magnitude, _, _ = self.fft_tables(data.shape[0])
+        spectrum = fft.rfft(data, axis=0)
+        # (bins, bands, [channels])
+        bandSpectrum = spectrum[:, np.newaxis] * magnitude.T.reshape(magnitude.T.shape + (1,) * (data.ndim - 1))
+        filteredSignal = fft.irfft(bandSpectrum, n=data.shape[0], axis=0)
+        # Bands that the FFT can not resolve
+        for index in np.flatnonzero(~self.fft_resolved(data.shape[0])):
+            if not self.stateful:
+                self.ziBands[index] = None
+            filteredSignal[:, index], self.ziBands[index] = self.__sosfilt(
+                self.sos[(self.order * index):(self.order * index + self.order), :], data, self.ziBands[index])
+        return filteredSignal
+
+    def __fft_power(self, data: np.ndarray) -> np.ndarray:
+        _, weights, _ = self.fft_tables(data.shape[0])
+        if not self.stateful:
+            spectrum, _ = self.fft_spectrum(data)
+        else:
+            if self.fftHistory is None or self.fftHistory.shape[1:] != data.shape[1:]:
+                self.fftHistory = np.zeros((data.shape[0] // 2,) + data.shape[1:], dtype=data.dtype)
+            spectrum, self.fftHistory = self.fft_spectrum(data, self.fftHistory)
+        meanSquare = np.tensordot(weights, spectrum, axes=(1, 0)) / data.shape[0]
+        # Bands that the FFT can not resolve
+        narrow = np.flatnonzero(~self.fft_resolved(data.shape[0]))
+        if narrow.size > 0:
+            meanSquare[narrow] = self.iir_power(data, narrow)
+        return meanSquare
+
+    def __output(self, shape: tuple) -> np.ndarray:
+        # Preallocated output of `filter`, reallocated only when the shape changes
+        if not self.reuseOutput:
+            return np.empty(shape, dtype=self.dtype)
+        if self._output is None or self._output.shape != shape:
+            self._output = np.empty(shape, dtype=self.dtype)
+        return self._output
+
+    def __multirate_filter(self, data: np.ndarray) -> list:
+        if not self.stateful:
+            self.reset()
+        filteredSignal = [None] * self.fm.size
+        stageSignal = data
+        for stage in range(self.numStages):
+            if stage > 0:
+                # Anti-aliasing and decimation by two, keeping the parity of
+                # the samples across calls
+                stageSignal, self.ziStages[stage] = self.__sosfilt(
+                    self.aa_sos, stageSignal, self.ziStages[stage])
+                numSamples = stageSignal.shape[0]
+                stageSignal = stageSignal[self.phase[stage]::2]
+                self.phase[stage] = (self.phase[stage] - numSamples) % 2
+            for index in np.flatnonzero(self.stages == stage):
+                filteredSignal[index], self.ziBands[index] = self.__sosfilt(
+                    self.sos[(self.order * index):(self.order * index + self.order), :],
+                    stageSignal, self.ziBands[index])
+        return filteredSignal
+
     def filter(self, data: np.ndarray):
         """
         Filter data using octave filters.
@@ -190,32 +463,111 @@ class OctFilter(object):
         Parameters
         ----------
         data : np.ndarray
-            Data that should be filtered.
+            Data that should be filtered, with shape (samples,) or
+            (samples, channels).
 
         Returns
         -------
-        filteredSignal : np.ndarray
-            Filtered data.
+        filteredSignal : np.ndarray or list
+            Filtered data, with shape (samples, bands) or
+            (samples, bands, channels). In multirate mode, list with the
+            filtered data of each band at its own rate, with shape
+            (samples,) or (samples, channels).
 
         """
 
         # Construct signal
-        if data.ndim == 1:
-            filteredSignal = np.empty([data.size, self.fm.size])
+        if self.backend == 'fft':
+            filteredSignal = self.__fft_filter(data)
+        elif self.multirate:
+            filteredSignal = self.__multirate_filter(data)
+        elif self.stateful:
+            # State of every band: (bands, sections, 2, [channels]), created at rest
+            shape = (self.fm.size, self.order, 2) + data.shape[1:]
+            if self.zi is None or self.zi.shape != shape:
+                self.zi = np.zeros(shape, dtype=self.dtype)
+            filteredSignal = self.__output((data.shape[0], self.fm.size) + data.shape[1:])
+            for bandIndex in range(self.fm.size):
+                filteredSignal[:, bandIndex], self.zi[bandIndex] =\
+                    sig.sosfilt(self.sos[(self.order * bandIndex):
+                                         (self.order * bandIndex +
+                                          self.order), :], data, axis=0,
+                                zi=self.zi[bandIndex])
+        elif data.ndim == 1:
+            filteredSignal = self.__output((data.size, self.fm.size))
             for index in range(self.fm.size):
                 filteredSignal[:, index] = sig.sosfilt(self.sos[(self.order *
                                                                  index):(self.order * index + self.order), :], data)
         elif data.ndim == 2:
-            filteredSignal = np.empty([np.size(data, axis=0),
-                                       int(self.fm.size), np.size(data, axis=1)])
-            for dataIndex in range(np.size(data, axis=1)):
-                for bandIndex in range(self.fm.size):
-                    filteredSignal[:, bandIndex, dataIndex] =\
-                        sig.sosfilt(self.sos[(self.order * bandIndex):
-                                             (self.order * bandIndex +
-                                              self.order), :], data[:, dataIndex])
+            # All channels of a band are filtered in a single call
+            filteredSignal = self.__output((np.size(data, axis=0),
+                                            int(self.fm.size), np.size(data, axis=1)))
+            for bandIndex in range(self.fm.size):
+                filteredSignal[:, bandIndex, :] =\
+                    sig.sosfilt(self.sos[(self.order * bandIndex):
+                                         (self.order * bandIndex +
+                                          self.order), :], data, axis=0)
         return filteredSignal
 
+    def power(self, data: np.ndarray) -> np.ndarray:
+        """
+        Mean square of the filtered data of each band, in the full rate and
+        multirate modes and in the 'fft' backend. In the multirate mode a
+        block shorter than the decimation of a band may leave it without
+        samples, the band then keeps the mean square of the previous block.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            Data that should be filtered, with shape (samples,) or
+            (samples, channels).
+
+        Returns
+        -------
+        meanSquare : np.ndarray
+            Mean square of each band, with shape (bands,) or (bands, channels).
+        """
+        if self.backend == 'fft':
+            return self.__fft_power(data)
+        filteredSignal = self.filter(data=data)
+        if self.multirate:
+            for index, band in enumerate(filteredSignal):
+                if band.shape[0] > 0:
+                    self.bandPower[index] = np.mean(band**2, axis=0)
+                elif self.bandPower[index] is None:
+                    self.bandPower[index] = np.zeros(band.shape[1:], dtype=self.dtype)
+            return np.stack(self.bandPower)
+        return np.mean(filteredSignal**2, axis=0)
+
+    def response(self, index: int, numPoints: int = None):
+        """
+        Frequency response of one band, including the anti-aliasing filters
+        of the previous stages in multirate mode.
+
+        Parameters
+        ----------
+        index : int
+            Index of the band.
+        numPoints : int, optional
+            Number of frequencies, up to the Nyquist frequency of the band.
+            The default is None (fs).
+
+        Returns
+        -------
+        freq : np.ndarray
+            Frequencies [Hz].
+        h : np.ndarray
+            Complex frequency response.
+        """
+        numPoints = int(self.fs) if numPoints is None else numPoints
+        freq = np.linspace(0, self.fsBands[index] / 2, numPoints, endpoint=False)
+        _, h = sig.sosfreqz(self.sos[(self.order * index):(self.order * index + self.order), :],
+                            worN=freq, fs=self.fsBands[index])
+        for stage in range(self.stages[index]):
+            _, hStage = sig.sosfreqz(self.aa_sos, worN=freq, fs=self.fs / 2**stage)
+            h = h * hStage
+        return freq, h
+
     def Standard(self, std: str = 'iec', Class: int = 1, type: str = 'one'):
         """
         Function that generates figures containing the responses of the filters
@@ -309,15 +661,12 @@ class OctFilter(object):
                         "Performance follow IEC 61620-1:2014."
                     plt.figure(name, figsize=(13, 8))
                     for index in range(self.fm.size):
-                        w, h = sig.sosfreqz(self.sos[(self.order * index):
-                                                     (self.order * index + self.order), :],
-                                            worN=self.fs)
+                        freqResponse, h = self.response(index)
                         plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][Class]["min"], 'w--')
                         plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][Class]["max"], 'w--')
-                        plt.semilogx((self.fs * 0.5 / np.pi) *
-                                     w, 20 * np.log10(abs(h)))
+                        plt.semilogx(freqResponse, 20 * np.log10(abs(h)))
                     plt.title("Acceptance limits - IEC 61260-1:2014 - 1/"+str(self.b)+" octave bands\n"
                               + "Performance for Class "+str(Class))
                     plt.xlabel("Frequency Hz")
@@ -347,9 +696,7 @@ class OctFilter(object):
                         name = 'Filter response in 1/{} octave for the {} Hz band.'\
                             .format(self.b, int(self.fnom[index]))
                         plt.figure(name, figsize=(13, 8))
-                        w, h = sig.sosfreqz(self.sos[(self.order * index):
-                                                     (self.order * index + self.order), :],
-                                            worN=self.fs)
+                        freqResponse, h = self.response(index)
                         p1, = plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][1]["min"], 'b--')
                         p2, = plt.semilogx(
@@ -358,7 +705,7 @@ class OctFilter(object):
                             freq*self.fm[index], acceptanceLimits[std][2]["min"], 'g--')
                         p4, = plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][2]["max"], 'g--')
-                        p5, = plt.semilogx((self.fs * 0.5 / np.pi) * w, 20 *
+                        p5, = plt.semilogx(freqResponse, 20 *
                                            np.log10(abs(h)), 'k')
                         plt.title("Acceptance limits - IEC 61260-1:2014 - 1/"+str(self.b)+" octave bands\n"
                                   + "Performance for Class 1 and 2")
@@ -410,15 +757,12 @@ class OctFilter(object):
                         "Performance follow ANSI S1.11: 2004 (R2009)."
                     plt.figure(name, figsize=(13, 8))
                     for index in range(self.fm.size):
-                        w, h = sig.sosfreqz(self.sos[(self.order * index):
-                                                     (self.order * index + self.order), :],
-                                            worN=self.fs)
+                        freqResponse, h = self.response(index)
                         plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][Class]["min"], 'w--')
                         plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][Class]["max"], 'w--')
-                        plt.semilogx((self.fs * 0.5 / np.pi) *
-                                     w, 20 * np.log10(abs(h)))
+                        plt.semilogx(freqResponse, 20 * np.log10(abs(h)))
                     plt.title("Acceptance limits - ANSI S1.11:2004(R2009) - 1/"+str(self.b)+" octave bands\n"
                               + "Performance for Class "+str(Class))
                     plt.xlabel("Frequency Hz")
@@ -448,9 +792,7 @@ class OctFilter(object):
                         name = 'Filter response in 1/{} octave for the {} Hz band.'\
                             .format(self.b, int(self.fnom[index]))
                         plt.figure(name, figsize=(13, 8))
-                        w, h = sig.sosfreqz(self.sos[(self.order * index):
-                                                     (self.order * index + self.order), :],
-                                            worN=self.fs)
+                        freqResponse, h = self.response(index)
                         p1, = plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][0]["min"], 'r--')
                         p2, = plt.semilogx(
@@ -463,7 +805,7 @@ class OctFilter(object):
                             freq*self.fm[index], acceptanceLimits[std][2]["min"], 'g--')
                         p6, = plt.semilogx(
                             freq*self.fm[index], acceptanceLimits[std][2]["max"], 'g--')
-                        p7, = plt.semilogx((self.fs * 0.5 / np.pi) * w, 20 *
+                        p7, = plt.semilogx(freqResponse, 20 *
                                            np.log10(abs(h)), 'k')
                         plt.title("Acceptance limits - ANSI S1.11:2004(R2009) - 1/"+str(self.b)+" octave bands\n"
                                   + "Performance for Class 0, 1 and 2")
@@ -1,12 +1,15 @@
 from scipy import interpolate as interp
 from typing import Union, Callable
+from .weighting import timeLetters
 import multiprocessing as mp
 import numpy as np
+import queue
 import pyslm
+import time
 
 
 class parallelprocess(mp.Process):
-    def __init__(self, inData, isPlayed, params):
+    def __init__(self, inData, isPlayed, params, channels: Union[tuple, None] = None):
         # Inheriting the class multiprocessing.Process()
         mp.Process.__init__(self)
         # Other initializations for event flags
@@ -14,51 +17,78 @@ class parallelprocess(mp.Process):
         self.inData = inData
         self.isPlayed = isPlayed
         self.results = mp.Queue(self.params['numSamples']//2)
+        # Maximum time blocked waiting for a frame before checking the flags again
+        self.timeout = 0.1
+        # Range (start, stop) of the input channels processed by this worker,
+        # results carry the channel on the last axis
+        if channels is None:
+            channels = (0, self.params['numChannels'][0])
+        self.channels = slice(*channels)
+        self.numChannels = channels[1] - channels[0]
+        # Analysis frame accumulated from the audio blocks of the ring
+        self.frameSize = self.params['frameSize']
+        self.frame = np.zeros(shape=(self.frameSize, self.numChannels), dtype='float32')
+        # Precision of the processing ('float32' keeps the frames in single precision)
+        self.dtype = np.dtype(self.params['precision'])
+        self.filled = 0
+        self.frameInfo = (0, 0)
         # Checking software version parameters
         if self.params['version'] == 'AdvFreqAnalyzer':
             # Configuring filters
             self._set_band_filter()
             # Set parameters
-            self.leq_bands_sliding = np.zeros(shape=self.bandfilter.fnom.shape)
-            self.Leq_bands = np.empty(shape=self.bandfilter.fnom.shape)
-            self.L_max_bands = np.ones(shape=self.bandfilter.fnom.shape) * -10e3
-            self.L_min_bands = np.ones(shape=self.bandfilter.fnom.shape) * 10e3
+            shape = (self.bandfilter.fnom.size, self.numChannels)
+            self.leq_bands_sliding = np.zeros(shape=shape)
+            self.Leq_bands = np.empty(shape=shape)
+            self.L_max_bands = np.ones(shape=shape) * -10e3
+            self.L_min_bands = np.ones(shape=shape) * 10e3
         # Set parameters
         self.time_interval = 1
-        self.leq_global_sliding = 0
-        self.lAeq_global_sliding = 0
-        self.sel_global_sliding = self.params['tau']
-        self.Leq_global = 0
-        self.Lglobal = np.array([])
-        self.Lpeak = 0
-        # Set filters
-        self.weightingfilter = pyslm.weighting(
+        self.leq_global_sliding = np.zeros(shape=self.numChannels)
+        self.lAeq_global_sliding = np.zeros(shape=self.numChannels)
+        self.sel_global_sliding = self.frameSize / self.params['fs']
+        self.Leq_global = np.zeros(shape=self.numChannels)
+        self.Lpeak = np.zeros(shape=self.numChannels)
+        # Set filters, keeping their state from one frame to the next
+        # A, C and Z weightings run once per frame and are shared by the
+        # levels, the C-weighted peak and the A-weighted exposure
+        self.weightingbank = pyslm.weightingbank(
             fs=self.params['fs'],
             tau=self.params['tau'],
-            kind=self.params['fweighting']
-            )
-        self.weightingPeak = pyslm.weighting(
-            fs=self.params['fs'],
-            tau=self.params['tau'],
-            kind='C'
-            )
-        self.weightingSEL = pyslm.weighting(
-            fs=self.params['fs'],
-            tau=self.params['tau'],
-            kind='A'
+            kinds=('A', 'C', 'Z'),
+            taus=self.params['timeWeightings'],
+            dtype=self.params['precision']
             )
+        # Maximum time weighted levels of the measurement (LAFmax, LASmax, ...)
+        self.Lmaxima = {}
+        self.fweighting = self.params['fweighting'].upper()
+        self.weightingfilter = self.weightingbank.filters[self.fweighting]
         # Other variables
         self.FC = float()
         self.idMax = None
         self.refPressure = 2e-05
-        if self.params['applyMicCorr'] or self.params['applyAdcCorr']:
-            if params['micCorr'] is not None or params['micCorr'] is not None:
-                self.corr = True
-            else:
-                self.corr = False
+        # Compiled spectral correction, applied with state from frame to frame
+        if self.params['correction'] is not None:
+            self.corr = True
+            self.correction = pyslm.correctionfilter(taps=self.params['correction'], fs=self.params['fs'],
+                                                     dtype=self.params['precision'])
         else:
             self.corr = False
-            pass
+        # Frequency-domain analysis of the bands, see pyslm.spectralanalyzer
+        self.spectral = None
+        if self.params['analysisDomain'] == 'freq' and self.params['version'] == 'AdvFreqAnalyzer'\
+                and self.params['template'] in ['stand-by', 'frequencyAnalyzer']:
+            # The tables come from the bands at full rate, also with a multirate bank
+            self.spectral = pyslm.spectralanalyzer(
+                bandfilter=self.bandfilter if not self.bandfilter.multirate else pyslm.OctFilter(
+                    fstart=self.params['fstart'], fend=self.params['fend'], b=self.params['b'],
+                    fs=self.params['fs'], stateful=True, dtype=self.params['precision']),
+                frameSize=self.frameSize,
+                fweighting=self.fweighting,
+                kinds=('A', 'C', 'Z'),
+                correction=self.params['correction'],
+                dtype=self.params['precision']
+                )
         # The multiprocessing class needs a run () method
         if self.params['template'] == 'stand-by':
             if self.params['version'] == 'AdvFreqAnalyzer':
@@ -77,6 +107,9 @@ class parallelprocess(mp.Process):
             self.run = self.calibration
         else:
             pass
+        # The frequency-domain analysis replaces the run method of its templates
+        if self.spectral is not None:
+            self.run = self.spectralAnalyzer
     
 
     def stand_by(self) -> Callable:
@@ -114,45 +147,33 @@ class parallelprocess(mp.Process):
             Sound pressure level by bands
         """
         try:
-            while not self.isPlayed.is_set():
-                continue
-            while self.isPlayed.is_set():
-                if not self.inData.empty():
-                    rawData = self.inData.get_nowait()
-                    # Applying calibration factor
-                    rawData = rawData * self.params['calibFactor']
-                    # Getting global and band levels
-                    signal = rawData[:, 0]
-                    # 1) Apply spectral correction if correction files exist
-                    if self.corr:
-                        signal = self._apply_correction(signal=signal, domain='time')
-                    # 2) Applying frequency weighting filter
-                    signal_freq_weighting = self.weightingfilter.frequency(
-                        signal=signal)
-                    # 3) Applying octave band filter
-                    filteredSignal = self.bandfilter.filter(data=signal_freq_weighting)
-                    # 4) Calculating sound pressure level by bands
-                    Lp_bands = np.round(10 * \
-                        np.log10(rms(a=filteredSignal**2, #signal_time_weighting,
-                                        axis=0)**2/self.refPressure**2), 2)
-                    # 5) Applying time weighting filter
-                    signal_time_weighting = self.weightingfilter.time(
-                        signal=signal_freq_weighting**2, reshape=False)
-                    # 6) Calculating overall sound pressure level
-                    Lp_global = np.round(10 * np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
-                    # Queuing results
-                    self.results.put_nowait({'Lp_global': Lp_global,
-                                             'Lp_bands': Lp_bands,
-                                             'strBands': self.strBands,
-                                             'x_axis': self.x_axis,
-                                             'bands': self.bands})
-                else:
-                    if self.isPlayed.is_set():
-                        continue
-                    else:
-                        break
-            else:
-                pass
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame
+                frame = self._next_frame()
+                if frame is None:
+                    continue
+                rawData, _, _ = frame
+                # Getting global and band levels of all channels (frames, channels)
+                signal = rawData
+                # 1) Apply spectral correction if correction files exist
+                if self.corr:
+                    signal = self._apply_correction(signal=signal, domain='time')
+                # 2) Applying frequency weighting filter
+                signal_freq_weighting = self.weightingfilter.frequency(
+                    signal=signal)
+                # 3) and 4) Applying octave band filter and calculating sound
+                # pressure level by bands
+                Lp_bands = np.round(10*np.log10(self.bandfilter.power(data=signal_freq_weighting)/self.refPressure**2), 2)
+                # 5) Applying time weighting filter
+                signal_time_weighting = self.weightingfilter.time(
+                    signal=signal_freq_weighting**2, reshape=False)
+                # 6) Calculating overall sound pressure level
+                Lp_global = np.round(10 * np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
+                # Queuing results
+                # Queuing only the values of this frame, the bands are attached by the engine
+                self._put({'Lp_global': Lp_global,
+                           'Lp_bands': Lp_bands})
         except Exception as E:
             print("parallelprocess.run(): ", E, "\n")
         return
@@ -189,35 +210,28 @@ class parallelprocess(mp.Process):
             Sound pressure level by bands
         """
         try:
-            while not self.isPlayed.is_set():
-                continue
-            while self.isPlayed.is_set():
-                if not self.inData.empty():
-                    rawData = self.inData.get_nowait()
-                    # Applying calibration factor
-                    rawData = rawData * self.params['calibFactor']
-                    # Getting global and band levels
-                    signal = rawData[:, 0]
-                    # 1) Apply spectral correction if correction files exist
-                    if self.corr:
-                        signal = self._apply_correction(signal=signal, domain='time')
-                    # 2) Applying frequency weighting filter
-                    signal_freq_weighting = self.weightingfilter.frequency(
-                        signal=signal)
-                    # 3) Applying time weighting filter
-                    signal_time_weighting = self.weightingfilter.time(
-                        signal=signal_freq_weighting**2, reshape=False)
-                    # 4) Calculating overall sound pressure level
-                    Lp_global = np.round(10 * np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
-                    # Queuing results
-                    self.results.put_nowait({'Lp_global': Lp_global})
-                else:
-                    if self.isPlayed.is_set():
-                        continue
-                    else:
-                        break
-            else:
-                pass
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame
+                frame = self._next_frame()
+                if frame is None:
+                    continue
+                rawData, _, _ = frame
+                # Getting global and band levels of all channels (frames, channels)
+                signal = rawData
+                # 1) Apply spectral correction if correction files exist
+                if self.corr:
+                    signal = self._apply_correction(signal=signal, domain='time')
+                # 2) Applying frequency weighting filter
+                signal_freq_weighting = self.weightingfilter.frequency(
+                    signal=signal)
+                # 3) Applying time weighting filter
+                signal_time_weighting = self.weightingfilter.time(
+                    signal=signal_freq_weighting**2, reshape=False)
+                # 4) Calculating overall sound pressure level
+                Lp_global = np.round(10 * np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
+                # Queuing results
+                self._put({'Lp_global': Lp_global})
         except Exception as E:
             print("parallelprocess.run(): ", E, "\n")
         return
@@ -256,63 +270,47 @@ class parallelprocess(mp.Process):
             Global sound pressure level of the measured signal
         """
         try:
-            while not self.isPlayed.is_set():
-                continue
-            while self.isPlayed.is_set():
-                if not self.inData.empty():
-                    rawData, _ = self.inData.get_nowait()
-                    # Applying calibration factor
-                    rawData = rawData * self.params['calibFactor']
-                    # Getting global and band levels
-                    signal = rawData[:, 0]
-                    # 1) Apply spectral correction if correction files exist
-                    if self.corr:
-                        signal = self._apply_correction(signal=signal, domain='time')
-                    # 2) Applying frequency weighting filter
-                    signal_freq_weighting = self.weightingfilter.frequency(
-                        signal=signal)
-                    # 3) Applying time weighting filter
-                    signal_time_weighting = self.weightingfilter.time(
-                        signal=signal_freq_weighting**2, reshape=False)
-                    # 4) Calculating overall sound pressure level
-                    Lp_global = np.round(10*np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
-                    self.Lglobal = np.append(self.Lglobal, Lp_global)
-                    # 5) Peak sound level
-                    if self.time_interval > 1:
-                        C_weighting_Peak = self.weightingPeak.frequency(signal=signal)
-                        C_Peak = np.max(np.abs(C_weighting_Peak))
-                        Lpeak = np.round(10*np.log10(C_Peak**2/self.refPressure**2), 2)
-                        if Lpeak > self.Lpeak:
-                            self.Lpeak = Lpeak
-                        else:
-                            pass
-                    else:
-                        pass
-                    # 6) Calculating equivalent continuous sound level
-                    self.leq_global_sliding += 10**(Lp_global/10)
-                    self.Leq_global = np.round(10*np.log10(1/self.time_interval * self.leq_global_sliding), 2)
-                    # 7) Sound Exposure Level A-weighted
-                    signal_freq_weighting_SEL = self.weightingSEL.frequency(signal=signal)
-                    signal_time_weighting_SEL = self.weightingSEL.time(signal=signal_freq_weighting_SEL**2, reshape=False)
-                    self.lAeq_global_sliding += rms(a=signal_time_weighting_SEL, axis=0)**2/self.refPressure**2
-                    LAeq_global = np.round(10*np.log10(1/self.time_interval * self.lAeq_global_sliding), 2)
-                    SEL = np.round(LAeq_global + 10*np.log10(self.sel_global_sliding), 2)
-                    self.sel_global_sliding += self.params['tau']
-                    self.time_interval += 1
-                    # Queuing results
-                    self.results.put_nowait({'Lp_global': Lp_global,
-                                             'Leq_global': self.Leq_global,
-                                             'Lpeak': self.Lpeak,
-                                             'Lglobal': self.Lglobal,
-                                             'SEL': SEL,
-                                             'signal': rawData})
-                else:
-                    if self.isPlayed.is_set():
-                        continue
-                    else:
-                        break
-            else:
-                pass
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame
+                frame = self._next_frame()
+                if frame is None:
+                    continue
+                rawData, _, _ = frame
+                # Getting global and band levels of all channels (frames, channels)
+                signal = rawData
+                # 1) Apply spectral correction if correction files exist
+                if self.corr:
+                    signal = self._apply_correction(signal=signal, domain='time')
+                # 2) Applying the A, C and Z frequency weightings in one pass
+                weighted = self.weightingbank.frequency(signal=signal)
+                # 3) Applying time weighting filter to all weightings at once
+                timeWeighted = self.weightingbank.time(weighted=weighted)
+                # 4) Calculating overall sound pressure levels (LAF, LCF, LZF, ...)
+                levels = self.weightingbank.levels(timeWeighted=timeWeighted)
+                Lp_global = levels['L' + self.fweighting + self.weightingbank.letter]
+                # 5) Peak and maximum sound levels, from the same signals of the bank
+                LCpeak = self._peak(weighted=weighted)
+                self._maxima(timeWeighted=timeWeighted)
+                # 6) Calculating equivalent continuous sound level
+                self.leq_global_sliding += 10**(Lp_global/10)
+                self.Leq_global = np.round(10*np.log10(1/self.time_interval * self.leq_global_sliding), 2)
+                # 7) Sound Exposure Level, from the A-weighted signal of the bank
+                SEL = self._exposure(meanSquare=np.mean(timeWeighted['LA' + self.weightingbank.letter], axis=0))
+                self.time_interval += 1
+                # Queuing results
+                # Queuing only the values of this frame, the history is kept by the engine
+                results = {'Lp_global': Lp_global,
+                           'Leq_global': self.Leq_global,
+                           'Lpeak': self.Lpeak,
+                           'SEL': SEL,
+                           'LCpeak': LCpeak,
+                           'LAE': SEL}
+                results.update(levels)
+                results.update(self.Lmaxima)
+                if self.params['saveRawData']:
+                    results['signal'] = rawData
+                self._put(results)
         except Exception as E:
             print("parallelprocess.run(): ", E, "\n")
         return
@@ -357,82 +355,152 @@ class parallelprocess(mp.Process):
             Sound pressure level by bands
         """
         try:
-            while not self.isPlayed.is_set():
-                continue
-            while self.isPlayed.is_set():
-                if not self.inData.empty():
-                    rawData, _ = self.inData.get_nowait()
-                    # Applying calibration factor
-                    rawData = rawData * self.params['calibFactor']
-                    # Getting global and band levels
-                    signal = rawData[:, 0]
-                    # 1) Apply spectral correction if correction files exist
-                    if self.corr:
-                        signal = self._apply_correction(signal=signal, domain='time')
-                    # 2) Applying frequency weighting filter
-                    signal_freq_weighting = self.weightingfilter.frequency(
-                        signal=signal)
-                    # 3) Applying octave band filter
-                    filteredSignal = self.bandfilter.filter(data=signal_freq_weighting)
-                    # 4) Calculating sound pressure level by bands
-                    Lp_bands = np.round(10*np.log10(rms(a=filteredSignal**2,  axis=0)**2/self.refPressure**2), 2)
-                    for i in range(self.bands.size):
-                        if Lp_bands[i] > self.L_max_bands[i]:
-                            self.L_max_bands[i] = Lp_bands[i]
-                        if Lp_bands[i] < self.L_min_bands[i]:
-                            self.L_min_bands[i] = Lp_bands[i]
-                    # 5) Applying time weighting filter
-                    signal_time_weighting = self.weightingfilter.time(
-                        signal=signal_freq_weighting**2, reshape=False)
-                    # 6) Calculating overall sound pressure level
-                    Lp_global = np.round(10*np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
-                    self.Lglobal = np.append(self.Lglobal, Lp_global)
-                    # 7) Peak sound level
-                    if self.time_interval > 1:
-                        C_weighting_Peak = self.weightingPeak.frequency(signal=signal)
-                        C_Peak = np.max(np.abs(C_weighting_Peak))
-                        Lpeak = np.round(10*np.log10(C_Peak**2/self.refPressure**2), 2)
-                        if Lpeak > self.Lpeak:
-                            self.Lpeak = Lpeak
-                        else:
-                            pass
-                    else:
-                        pass
-                    # 8) Calculating equivalent continuous sound level
-                    self.leq_bands_sliding += 10**(Lp_bands/10)
-                    self.leq_global_sliding += 10**(Lp_global/10)
-                    self.Leq_bands = np.round(10*np.log10(1/self.time_interval * self.leq_bands_sliding), 2)
-                    self.Leq_global = np.round(10*np.log10(1/self.time_interval * self.leq_global_sliding), 2)
-                    # 9) Sound Exposure Level
-                    # 7) Sound Exposure Level A-weighted
-                    signal_freq_weighting_SEL = self.weightingSEL.frequency(signal=signal)
-                    signal_time_weighting_SEL = self.weightingSEL.time(signal=signal_freq_weighting_SEL**2, reshape=False)
-                    self.lAeq_global_sliding += rms(a=signal_time_weighting_SEL, axis=0)**2/self.refPressure**2
-                    LAeq_global = np.round(10*np.log10(1/self.time_interval * self.lAeq_global_sliding), 2)
-                    SEL = np.round(LAeq_global + 10*np.log10(self.sel_global_sliding), 2)
-                    self.sel_global_sliding += self.params['tau']
-                    self.time_interval += 1
-                    # Queuing results
-                    self.results.put_nowait({'Lp_global': Lp_global,
-                                             'Lp_bands': Lp_bands,
-                                             'L_max_bands': self.L_max_bands,
-                                             'L_min_bands': self.L_min_bands,
-                                             'Leq_bands': self.Leq_bands,
-                                             'Leq_global': self.Leq_global,
-                                             'Lpeak': self.Lpeak,
-                                             'Lglobal': self.Lglobal,
-                                             'SEL': SEL,
-                                             'signal': rawData,
-                                             'strBands': self.strBands,
-                                             'x_axis': self.x_axis,
-                                             'bands': self.bands})
-                else:
-                    if self.isPlayed.is_set():
-                        continue
-                    else:
-                        break
-            else:
-                pass
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame
+                frame = self._next_frame()
+                if frame is None:
+                    continue
+                rawData, _, _ = frame
+                # Getting global and band levels of all channels (frames, channels)
+                signal = rawData
+                # 1) Apply spectral correction if correction files exist
+                if self.corr:
+                    signal = self._apply_correction(signal=signal, domain='time')
+                # 2) Applying the A, C and Z frequency weightings in one pass
+                weighted = self.weightingbank.frequency(signal=signal)
+                # 3) and 4) Applying octave band filter and calculating sound
+                # pressure level by bands
+                Lp_bands = np.round(10*np.log10(self.bandfilter.power(data=weighted[self.fweighting])/self.refPressure**2), 2)
+                self.L_max_bands = np.maximum(self.L_max_bands, Lp_bands)
+                self.L_min_bands = np.minimum(self.L_min_bands, Lp_bands)
+                # 5) Applying time weighting filter to all weightings at once
+                timeWeighted = self.weightingbank.time(weighted=weighted)
+                # 6) Calculating overall sound pressure levels (LAF, LCF, LZF, ...)
+                levels = self.weightingbank.levels(timeWeighted=timeWeighted)
+                Lp_global = levels['L' + self.fweighting + self.weightingbank.letter]
+                # 7) Peak and maximum sound levels, from the same signals of the bank
+                LCpeak = self._peak(weighted=weighted)
+                self._maxima(timeWeighted=timeWeighted)
+                # 8) Calculating equivalent continuous sound level
+                self.leq_bands_sliding += 10**(Lp_bands/10)
+                self.leq_global_sliding += 10**(Lp_global/10)
+                self.Leq_bands = np.round(10*np.log10(1/self.time_interval * self.leq_bands_sliding), 2)
+                self.Leq_global = np.round(10*np.log10(1/self.time_interval * self.leq_global_sliding), 2)
+                # 9) Sound Exposure Level, from the A-weighted signal of the bank
+                SEL = self._exposure(meanSquare=np.mean(timeWeighted['LA' + self.weightingbank.letter], axis=0))
+                self.time_interval += 1
+                # Queuing results
+                # Queuing only the values of this frame, the history and the
+                # bands are kept by the engine
+                results = {'Lp_global': Lp_global,
+                           'Lp_bands': Lp_bands,
+                           'L_max_bands': self.L_max_bands,
+                           'L_min_bands': self.L_min_bands,
+                           'Leq_bands': self.Leq_bands,
+                           'Leq_global': self.Leq_global,
+                           'Lpeak': self.Lpeak,
+                           'SEL': SEL,
+                           'LCpeak': LCpeak,
+                           'LAE': SEL}
+                results.update(levels)
+                results.update(self.Lmaxima)
+                if self.params['saveRawData']:
+                    results['signal'] = rawData
+                self._put(results)
+        except Exception as E:
+            print("parallelprocess.run(): ", E, "\n")
+        return
+
+
+    def spectralAnalyzer(self) -> Callable:
+        """
+        Description
+        -----------
+        Frequency analyzer (and its stand-by) in the frequency domain: the
+        spectral correction, the frequency weightings and the bands are all
+        applied to the energy spectrum of the frame (overlapped FFTs, see
+        pyslm.spectralanalyzer).
+
+        Processing steps
+        ----------------
+            (1) Energy spectrum of the frame
+
+            (2) Spectral correction, A, C and Z weightings and band energies
+                from the precomputed tables
+
+            (3) Sound level by frequency bands and global sound levels
+                (equivalent levels of the frame, without time weighting)
+
+            (4) Peak sound level, from the C weighting filter (uncorrected)
+
+            (5) Equivalent continuous sound level and sound exposure level
+
+        There is no time weighting in this domain, so the time-weighted
+        maxima (e.g. LAFmax, LASmax) are not reported. The maxima of the
+        equivalent levels of the frames are reported instead (LAeqmax,
+        LCeqmax, LZeqmax).
+
+        Returns
+        -------
+        Lp_global : float
+            Global sound pressure level of the measured signal
+        Lp_bands : np.ndarray
+            Sound pressure level by bands
+        """
+        try:
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame
+                frame = self._next_frame()
+                if frame is None:
+                    continue
+                signal, _, _ = frame
+                # 1) and 2) Mean squares of the weightings and of the bands
+                meanSquare, bandMeanSquare = self.spectral.analyze(signal=signal)
+                # 3) Calculating sound pressure levels
+                Lp_bands = np.round(10*np.log10(bandMeanSquare/self.refPressure**2), 2)
+                levels = {'L' + kind + 'eq': np.round(10*np.log10(meanSquare[kind]/self.refPressure**2), 2)
+                          for kind in meanSquare}
+                Lp_global = levels['L' + self.fweighting + 'eq']
+                if self.params['template'] == 'stand-by':
+                    self._put({'Lp_global': Lp_global,
+                               'Lp_bands': Lp_bands})
+                    continue
+                self.L_max_bands = np.maximum(self.L_max_bands, Lp_bands)
+                self.L_min_bands = np.minimum(self.L_min_bands, Lp_bands)
+                # 4) Peak sound level
+                LCpeak = self._peak(weighted={'C': self.weightingbank.filters['C'].frequency(signal=signal)})
+                # Maxima of the equivalent levels of the frames (e.g. LAeqmax)
+                if self.time_interval > 1:
+                    for kind in self.spectral.kinds:
+                        name = 'L' + kind + 'eqmax'
+                        Lmax = levels['L' + kind + 'eq']
+                        self.Lmaxima[name] = np.maximum(self.Lmaxima.get(name, Lmax), Lmax)
+                # 5) Calculating equivalent continuous sound level and
+                # Sound Exposure Level
+                self.leq_bands_sliding += 10**(Lp_bands/10)
+                self.leq_global_sliding += 10**(Lp_global/10)
+                self.Leq_bands = np.round(10*np.log10(1/self.time_interval * self.leq_bands_sliding), 2)
+                self.Leq_global = np.round(10*np.log10(1/self.time_interval * self.leq_global_sliding), 2)
+                SEL = self._exposure(meanSquare=meanSquare['A'])
+                self.time_interval += 1
+                # Queuing results
+                results = {'Lp_global': Lp_global,
+                           'Lp_bands': Lp_bands,
+                           'L_max_bands': self.L_max_bands,
+                           'L_min_bands': self.L_min_bands,
+                           'Leq_bands': self.Leq_bands,
+                           'Leq_global': self.Leq_global,
+                           'Lpeak': self.Lpeak,
+                           'SEL': SEL,
+                           'LCpeak': LCpeak,
+                           'LAE': SEL}
+                results.update(levels)
+                results.update(self.Lmaxima)
+                if self.params['saveRawData']:
+                    results['signal'] = signal
+                self._put(results)
         except Exception as E:
             print("parallelprocess.run(): ", E, "\n")
         return
@@ -473,48 +541,36 @@ class parallelprocess(mp.Process):
             Sound pressure level by bands
         """
         try:
-            while not self.isPlayed.is_set():
-                continue
-            while self.isPlayed.is_set():
-                if not self.inData.empty():
-                    rawData, framesRead, countDecay = self.inData.get_nowait()
-                    # Applying calibration factor
-                    rawData = rawData * self.params['calibFactor']
-                    # Getting global and band levels
-                    signal = rawData[:, 0]
-                    # 1) Apply spectral correction if correction files exist
-                    if self.corr:
-                        signal = self._apply_correction(signal=signal, domain='time')
-                    # 2) Applying frequency weighting filter
-                    signal_freq_weighting = self.weightingfilter.frequency(
-                        signal=signal)
-                    # 3) Applying octave band filter
-                    filteredSignal = self.bandfilter.filter(data=signal_freq_weighting)
-                    # 4) Calculating sound pressure level by bands
-                    Lp_bands = np.round(10 * \
-                        np.log10(rms(a=filteredSignal**2, #signal_time_weighting,
-                                        axis=0)**2/self.refPressure**2), 2)
-                    # 5) Applying time weighting filter
-                    signal_time_weighting = self.weightingfilter.time(
-                        signal=signal_freq_weighting**2, reshape=False)
-                    # 6) Calculating overall sound pressure level
-                    Lp_global = np.round(10 * np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
-                    # Queuing results
-                    self.results.put_nowait({'Lp_global': Lp_global,
-                                             'Lp_bands': Lp_bands,
-                                             'strBands': self.strBands,
-                                             'x_axis': self.x_axis,
-                                             'signal': rawData,
-                                             'framesRead': framesRead,
-                                             'countDecay': countDecay,
-                                             'bands': self.bands})
-                else:
-                    if self.isPlayed.is_set():
-                        continue
-                    else:
-                        break
-            else:
-                pass
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame
+                frame = self._next_frame()
+                if frame is None:
+                    continue
+                rawData, framesRead, countDecay = frame
+                # Getting global and band levels of all channels (frames, channels)
+                signal = rawData
+                # 1) Apply spectral correction if correction files exist
+                if self.corr:
+                    signal = self._apply_correction(signal=signal, domain='time')
+                # 2) Applying frequency weighting filter
+                signal_freq_weighting = self.weightingfilter.frequency(
+                    signal=signal)
+                # 3) and 4) Applying octave band filter and calculating sound
+                # pressure level by bands
+                Lp_bands = np.round(10*np.log10(self.bandfilter.power(data=signal_freq_weighting)/self.refPressure**2), 2)
+                # 5) Applying time weighting filter
+                signal_time_weighting = self.weightingfilter.time(
+                    signal=signal_freq_weighting**2, reshape=False)
+                # 6) Calculating overall sound pressure level
+                Lp_global = np.round(10 * np.log10(rms(a=signal_time_weighting, axis=0)**2/self.refPressure**2), 2)
+                # Queuing results
+                # Queuing only the values of this frame, the bands are attached by the engine
+                self._put({'Lp_global': Lp_global,
+                           'Lp_bands': Lp_bands,
+                           'signal': rawData,
+                           'framesRead': framesRead,
+                           'countDecay': countDecay})
         except Exception as E:
             print("parallelprocess.run(): ", E, "\n")
         return
@@ -540,68 +596,140 @@ class parallelprocess(mp.Process):
             Frequency vector [Hz]
         """
         try:
-            while not self.isPlayed.is_set():
-                continue
-            while self.isPlayed.is_set():
-                if not self.inData.empty():
-                    self._inData, framesRead = self.inData.get_nowait()
-                    # Getting global and band levels
-                    signal = self._inData[:, 0]
-                    # 1) Apply spectral correction if correction files exist
-                    if self.corr:
-                        freqSignal = self._apply_correction(
-                            signal=signal, domain='freq')
-                    else:
-                        freqSignal = np.fft.rfft(signal, axis=0, norm=None)
-                    numSamples = len(signal)
-                    freqSignal /= 2**0.5
-                    freqSignal /= len(freqSignal)
-                    freqVector = np.linspace(0, (numSamples - 1) *
-                                            self.params['fs'] /
-                                            (2*numSamples),
-                                            (int(numSamples/2)+1)
-                                            if numSamples % 2 == 0
-                                            else int((numSamples+1)/2))
-                    a = np.where(freqVector >= self.params['fCalib'] - 50)[0][0]
-                    b = np.where(freqVector <= self.params['fCalib'] + 50)[0][-1]
-                    sensitivity = np.abs(freqSignal[a:b]).max()
-                    if 20 * np.log10(sensitivity/self.refPressure) > 104:
-                        FC = 10/sensitivity
-                    else:
-                        FC = 1/sensitivity
-                    with np.errstate(divide='ignore'):
-                        SPL = 20 * np.log10(np.abs(freqSignal)/self.refPressure)
-                        sensitivity = np.round(sensitivity, 2)
-                        correction = np.round(np.abs(10*np.log10(sensitivity)) -
-                                            np.abs(10*np.log10(1/self.params['calibFactor'])), 2)
-                        idMax = np.where(SPL == SPL[a:b].max())[0][0]
-                        SPLmax = np.round(SPL[idMax], 2)
-                        freqmax = np.round(freqVector[idMax], 2)
-                    # Queuing results
-                    results = {}
-                    if self.params['version'] == 'AdvFreqAnalyzer':
-                        results['SPL'] = SPL
-                        results['freqVector'] = freqVector
-                    results['SPLmax'] = SPLmax
-                    results['freqmax'] = freqmax
-                    results['sensitivity'] = sensitivity*1000
-                    results['correction'] = correction
-                    results['FC'] = FC
-                    results['signal'] = self._inData
-                    results['framesRead'] = framesRead
-                    self.results.put_nowait(results)
+            # Frames left in the ring after the stop are still processed
+            while self.isPlayed.is_set() or not self.inData.empty():
+                # Waiting for the blocks of a complete analysis frame (without calibration factor)
+                frame = self._next_frame(calibFactor=1.)
+                if frame is None:
+                    continue
+                self._inData, framesRead, _ = frame
+                # Getting global and band levels
+                signal = self._inData[:, 0]
+                # 1) Apply spectral correction if correction files exist
+                if self.corr:
+                    freqSignal = self._apply_correction(
+                        signal=signal, domain='freq')
                 else:
-                    if self.isPlayed.is_set():
-                        continue
-                    else:
-                        break
-            else:
-                pass
+                    freqSignal = np.fft.rfft(signal, axis=0, norm=None)
+                numSamples = len(signal)
+                freqSignal /= 2**0.5
+                freqSignal /= len(freqSignal)
+                freqVector = np.linspace(0, (numSamples - 1) *
+                                        self.params['fs'] /
+                                        (2*numSamples),
+                                        (int(numSamples/2)+1)
+                                        if numSamples % 2 == 0
+                                        else int((numSamples+1)/2))
+                a = np.where(freqVector >= self.params['fCalib'] - 50)[0][0]
+                b = np.where(freqVector <= self.params['fCalib'] + 50)[0][-1]
+                sensitivity = np.abs(freqSignal[a:b]).max()
+                if 20 * np.log10(sensitivity/self.refPressure) > 104:
+                    FC = 10/sensitivity
+                else:
+                    FC = 1/sensitivity
+                with np.errstate(divide='ignore'):
+                    SPL = 20 * np.log10(np.abs(freqSignal)/self.refPressure)
+                    sensitivity = np.round(sensitivity, 2)
+                    correction = np.round(np.abs(10*np.log10(sensitivity)) -
+                                        np.abs(10*np.log10(1/self.params['calibFactor'])), 2)
+                    idMax = np.where(SPL == SPL[a:b].max())[0][0]
+                    SPLmax = np.round(SPL[idMax], 2)
+                    freqmax = np.round(freqVector[idMax], 2)
+                # Queuing results
+                results = {}
+                if self.params['version'] == 'AdvFreqAnalyzer':
+                    results['SPL'] = SPL
+                    results['freqVector'] = freqVector
+                results['SPLmax'] = SPLmax
+                results['freqmax'] = freqmax
+                results['sensitivity'] = sensitivity*1000
+                results['correction'] = correction
+                results['FC'] = FC
+                results['signal'] = self._inData
+                results['framesRead'] = framesRead
+                self._put(results)
         except Exception as E:
             print("parallelprocess.run(): ", E, "\n")
         return
 
 
+    def _next_frame(self, calibFactor: Union[float, None] = None):
+        """
+        Description
+        -----------
+        Function that copies the next audio block of the ring into the
+        analysis frame, so that the frames keep their length whatever the
+        block size of the stream is.
+
+        Parameters
+        ----------
+        calibFactor : float, optional
+            Factor applied to the complete frame, the default is None
+            (the calibration factor of the measurement)
+
+        Returns
+        -------
+        frame : tuple | None
+            (rawData, framesRead, countDecay) of a complete frame, with the
+            counters of its first block, or None while the frame is incomplete
+        """
+        try:
+            block, framesRead, countDecay = self.inData.get(timeout=self.timeout)
+        except queue.Empty:
+            return None
+        if self.filled == 0 or countDecay != self.frameInfo[1]:
+            # First block of the frame, an incomplete frame is discarded when a new decay starts
+            self.filled = 0
+            self.frameInfo = (framesRead, countDecay)
+        size = min(block.shape[0], self.frameSize - self.filled)
+        self.frame[self.filled:self.filled+size] = block[:size, self.channels]
+        self.filled += size
+        captureTime = self.inData.stamp()
+        self.inData.release()
+        if self.filled < self.frameSize:
+            return None
+        self.filled = 0
+        # Capture time of the last block and dequeue time of the frame, for the latency accounting
+        self.frameStamps = (captureTime, time.perf_counter())
+        if calibFactor is None:
+            calibFactor = self.params['calibFactor']
+        # Applying calibration factor (new array, the frame buffer is reused)
+        return np.multiply(self.frame, calibFactor, dtype=self.dtype), self.frameInfo[0], self.frameInfo[1]
+
+
+    def _peak(self, weighted: dict) -> np.ndarray:
+        # C-weighted peak of the frame, the maximum is kept from the second
+        # frame on since the first one still carries the start-up transient
+        LCpeak = self.weightingbank.peak(weighted=weighted, kind='C')
+        if self.time_interval > 1:
+            self.Lpeak = np.maximum(self.Lpeak, LCpeak)
+        return LCpeak
+
+    def _maxima(self, timeWeighted: dict):
+        # Maximum time weighted levels, also kept from the second frame on
+        if self.time_interval > 1:
+            for name, Lmax in self.weightingbank.maxima(timeWeighted=timeWeighted).items():
+                self.Lmaxima[name] = np.maximum(self.Lmaxima.get(name, Lmax), Lmax)
+        return
+
+    def _exposure(self, meanSquare: np.ndarray) -> np.ndarray:
+        # A-weighted sound exposure level up to the end of this frame, from
+        # the A-weighted mean square of the frame
+        self.lAeq_global_sliding += meanSquare/self.refPressure**2
+        LAeq_global = np.round(10*np.log10(1/self.time_interval * self.lAeq_global_sliding), 2)
+        SEL = np.round(LAeq_global + 10*np.log10(self.sel_global_sliding), 2)
+        self.sel_global_sliding += self.frameSize / self.params['fs']
+        return SEL
+
+    def _put(self, results: dict) -> Callable:
+        # Queuing the results with the timestamps of the frame
+        results['timestamps'] = {'captured': self.frameStamps[0],
+                                 'dequeued': self.frameStamps[1],
+                                 'queued': time.perf_counter()}
+        self.results.put_nowait(results)
+        return
+
+
     def _set_band_filter(self) -> Callable:
         """
         Description
@@ -619,7 +747,12 @@ class parallelprocess(mp.Process):
                 fstart=self.params['fstart'],
                 fend=self.params['fend'],
                 b=self.params['b'],
-                fs=self.params['fs']
+                fs=self.params['fs'],
+                stateful=True,
+                multirate=self.params['multirate'],
+                backend=self.params['bandBackend'],
+                dtype=self.params['precision'],
+                reuseOutput=True
                 )
             # Nominal frequencies used on the "x" axis of the plots
             self.bands = self.bandfilter.fnom
@@ -667,39 +800,15 @@ class parallelprocess(mp.Process):
             Audio signal with correction applied
         """
         try:
-            with np.errstate(divide='ignore'):
-                freqSignal = np.fft.rfft(signal, axis=0, norm=None)
-                MagfreqSignal = 20 * \
-                    np.log10(np.abs(freqSignal))
-                correctedMagfreqSignal = MagfreqSignal
-                # Loading data from microphone
-                if self.params['micCorr'] is not None and self.params['applyMicCorr']:
-                    # Apply magnitude correction
-                    correctedMagfreqSignal -= self.params['micCorr']
-
-                # Carregando dados do ADC
-                if self.params['adcCorr'] is not None and self.params['applyAdcCorr']:
-                    # Apply magnitude correction
-                    correctedMagfreqSignal -= self.params['adcCorr']
-                # Return to complex amplitude vector with magnitude and phase
-                correctedfreqSignal = 10**(correctedMagfreqSignal /
-                                        20)
-                r = correctedfreqSignal
-                teta = np.angle(freqSignal)
-                correctedfreqSignal = r*(np.cos(teta) + np.sin(teta)*1j)
-
-                if domain.lower() == 'time':
-                    # Get the inverse Fourier transform (ifft)
-                    correctedSignal = np.fft.irfft(a=correctedfreqSignal)
-                elif domain.lower() == 'freq':
-                    correctedSignal = correctedfreqSignal
-                else:
-                    AttributeError(
-                        "Unsupported domain, please try domain = 'freq'" +
-                        " if the `signal` parameter is the signal power spectrum," +
-                        " or try domain = 'time' if the` signal` parameter is the signal" +
-                        " measured in the time domain."
-                        )
+            # Minimum-phase filter of the corrections, see pyslm.compile_correction
+            correctedSignal = self.correction.filter(signal=signal)
+            if domain.lower() == 'freq':
+                correctedSignal = np.fft.rfft(correctedSignal, axis=0, norm=None)
+            elif domain.lower() != 'time':
+                raise AttributeError(
+                    "Unsupported domain, please try domain = 'freq'" +
+                    " to get the spectrum of the corrected signal," +
+                    " or try domain = 'time' to get the corrected signal.")
         except Exception as E:
             print("parallelprocess._apply_correction(): ", E, "\n")
         return correctedSignal
@@ -745,9 +854,9 @@ class finalprocessing(object):
         """
         try:
             Leq = self.inData
-            L10 = np.round(np.percentile(Leq, 90), 2)
-            L50 = np.round(np.percentile(Leq, 50), 2)
-            L90 = np.round(np.percentile(Leq, 10), 2)
+            L10 = np.round(np.percentile(Leq, 90, axis=0), 2)
+            L50 = np.round(np.percentile(Leq, 50, axis=0), 2)
+            L90 = np.round(np.percentile(Leq, 10, axis=0), 2)
 
 
             StatisticalLevels = {'L10': L10,
@@ -790,7 +899,8 @@ class finalprocessing(object):
                                 bypassLundeby=bypassLundeby,
                                 plotLundebyResults=plotLundebyResults,
                                 suppressWarnings=suppressWarnings,
-                                IREndManualCut=IREndManualCut)
+                                IREndManualCut=IREndManualCut,
+                                backend=self.params['bandBackend'])
         except Exception as E:
             print("finalprocessing.reverberationTime(): ", E, "\n")
         return roomsParams.results
@@ -944,6 +1054,73 @@ def rms(a: np.ndarray, axis: int) -> np.ndarray:
     return root_mean_square
 
 
+def select_channel(results: dict, index: int = 0) -> dict:
+    """
+    Description
+    -----------
+    Function that returns a copy of a results dictionary containing only the
+    levels of one input channel, for the interfaces that display a single
+    microphone.
+
+    Parameters
+    ----------
+    results : dict
+        Results of parallelprocess or StreamManager.fullresults, with the
+        channel on the last axis of the levels
+    index : int
+        Index of the channel in `inCh`
+
+    Returns
+    -------
+    channelResults : dict
+        Results of the selected channel
+    """
+    channelResults = dict(results)
+    for key in channelKeys:
+        if key in channelResults and np.ndim(channelResults[key]) > 0:
+            channelResults[key] = channelResults[key][..., index]
+    return channelResults
+
+
+def merge_channels(parts: list) -> dict:
+    """
+    Description
+    -----------
+    Function that joins the results of the same frame computed by several
+    parallelprocess workers, each one over a group of input channels, into
+    a single results dictionary.
+
+    Parameters
+    ----------
+    parts : list
+        Results of each worker, in the order of their channel groups
+
+    Returns
+    -------
+    mergedResults : dict
+        Results of all channels
+    """
+    mergedResults = dict(parts[0])
+    if len(parts) > 1:
+        for key in channelKeys + ('signal',):
+            if key in mergedResults and np.ndim(mergedResults[key]) > 0:
+                mergedResults[key] = np.concatenate([part[key] for part in parts], axis=-1)
+        if 'timestamps' in mergedResults:
+            # The frame is ready only when the slowest worker is done with it
+            mergedResults['timestamps'] = {key: max(part['timestamps'][key] for part in parts)
+                                           for key in mergedResults['timestamps']}
+    return mergedResults
+
+
+# Results whose last axis is the input channel
+channelKeys = ('Lp_global', 'Lp_bands', 'L_max_bands', 'L_min_bands', 'Leq_bands',
+               'Leq_global', 'Lpeak', 'Lglobal', 'SEL', 'Lmax', 'Lmin',
+               'L10', 'L50', 'L90', 'LCpeak', 'LAE', 'LAeq', 'LCeq', 'LZeq',
+               'LAeqmax', 'LCeqmax', 'LZeqmax') + \
+              tuple('L' + kind + letter + suffix for kind in 'ACZ' for letter in timeLetters.values()
+                    for suffix in ('', 'max'))
+
+
 def apply_correction(signal: np.ndarray, fs: int, micCorr: Union[None, np.ndarray],
                      adcCorr: Union[None, np.ndarray], applyMicCorr: bool, applyAdcCorr: bool) -> np.ndarray:
     """
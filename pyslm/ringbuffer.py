@@ -0,0 +1,200 @@
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import numpy as np
+import queue
+import copy
+
+
+class ringbuffer(object):
+    """
+    Description
+    -----------
+    Lock-free single-producer/multi-consumer ring buffer of audio frames
+    placed on shared memory (multiprocessing.shared_memory).
+
+    The producer (the StreamManager callbacks, running on the PortAudio
+    thread) copies each block straight into a slot of the shared memory
+    and advances the head index. The consumer (parallelprocess) reads the
+    slot by index and advances the tail index when it is done with it, so
+    no frame is ever pickled or sent through a pipe. Only the producer
+    writes the head and each consumer writes only its own tail, so no lock
+    is needed between them. Every consumer sees every frame, and a slot is
+    reused only after all of them released it. A semaphore per consumer
+    counts the published frames so that the consumer can sleep in `get()`
+    until the head moves, instead of polling the ring.
+
+    Parameters
+    ----------
+    numSlots : int
+        Number of frames that the ring can hold.
+    frameSize : int
+        Maximum number of samples per frame.
+    numChannels : int
+        Number of audio channels per frame.
+    dtype : str, optional
+        Data type of the samples.
+        The default is 'float32'.
+    numReaders : int, optional
+        Number of consumers reading the ring.
+        The default is 1.
+
+    Methods
+    -------
+    reader(index):
+        Returns a handle of the ring for the consumer `index`.
+    depth():
+        Number of frames not yet released by every consumer.
+    put_nowait(data, framesRead, countDecay, timestamp):
+        Copy a frame into the next free slot, raises queue.Full if the ring is full.
+        `timestamp` is the capture time of the frame (time.perf_counter clock).
+    get(timeout):
+        Returns a view of the oldest frame and its counters, blocking up to
+        `timeout` seconds for a new frame, raises queue.Empty if none arrives.
+        The slot stays reserved until `release()` is called.
+    get_nowait():
+        Same as `get()` without blocking.
+    stamp():
+        Capture time of the frame returned by the last `get()`.
+    release():
+        Hands the slot returned by the last `get()` back to the producer.
+    close():
+        Detach from the shared memory.
+    unlink():
+        Destroy the shared memory block (only once, by the owner).
+    """
+
+    def __init__(self, numSlots: int, frameSize: int, numChannels: int, dtype: str = 'float32',
+                 numReaders: int = 1):
+        self.numSlots = int(numSlots)
+        self.frameSize = int(frameSize)
+        self.numChannels = int(numChannels)
+        self.dtype = np.dtype(dtype).str
+        self.numReaders = int(numReaders)
+        self.readerIndex = 0
+        self._shm = shared_memory.SharedMemory(create=True, size=self._nbytes())
+        self._available = [mp.Semaphore(0) for _ in range(self.numReaders)]
+        self._owner = True
+        self._attach()
+        self._counters[:] = 0
+        return
+
+    def __getstate__(self):
+        # Only the name of the shared memory block crosses the process boundary
+        return {'name': self._shm.name,
+                'numSlots': self.numSlots,
+                'frameSize': self.frameSize,
+                'numChannels': self.numChannels,
+                'dtype': self.dtype,
+                'numReaders': self.numReaders,
+                'readerIndex': self.readerIndex,
+                'available': self._available}
+
+    def __setstate__(self, state):
+        self.numSlots = state['numSlots']
+        self.frameSize = state['frameSize']
+        self.numChannels = state['numChannels']
+        self.dtype = state['dtype']
+        self.numReaders = state['numReaders']
+        self.readerIndex = state['readerIndex']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._available = state['available']
+        self._owner = False
+        self._attach()
+        return
+
+    def _nbytes(self) -> int:
+        # head + one tail per reader + (frames, framesRead, countDecay, timestamp) per slot + samples
+        return 8 * (1 + self.numReaders + 4 * self.numSlots) +\
+            self.numSlots * self.frameSize * self.numChannels * np.dtype(self.dtype).itemsize
+
+    def _attach(self):
+        offset = 0
+        self._counters = np.ndarray(shape=(1 + self.numReaders,), dtype=np.int64, buffer=self._shm.buf, offset=offset)
+        offset += self._counters.nbytes
+        self._meta = np.ndarray(shape=(self.numSlots, 4), dtype=np.int64, buffer=self._shm.buf, offset=offset)
+        offset += self._meta.nbytes
+        self._data = np.ndarray(shape=(self.numSlots, self.frameSize, self.numChannels),
+                                dtype=self.dtype, buffer=self._shm.buf, offset=offset)
+        return
+
+    def reader(self, index: int):
+        if not 0 <= index < self.numReaders:
+            raise ValueError("Reader %i not available, the ring has %i readers." % (index, self.numReaders))
+        handle = copy.copy(self)
+        handle.readerIndex = index
+        handle._owner = False
+        return handle
+
+    def qsize(self) -> int:
+        # Frames not yet released by this reader
+        return int(self._counters[0] - self._counters[1 + self.readerIndex])
+
+    def empty(self) -> bool:
+        return self.qsize() <= 0
+
+    def depth(self) -> int:
+        # Frames not yet released by the slowest reader, which holds the oldest slot
+        return int(self._counters[0] - self._counters[1:].min())
+
+    def full(self) -> bool:
+        return self.depth() >= self.numSlots
+
+    def put_nowait(self, data: np.ndarray, framesRead: int = 0, countDecay: int = 0, timestamp: float = 0.):
+        head = int(self._counters[0])
+        if head - int(self._counters[1:].min()) >= self.numSlots:
+            raise queue.Full
+        idx = head % self.numSlots
+        frames = data.shape[0]
+        self._data[idx, :frames] = data
+        self._meta[idx, 0] = frames
+        self._meta[idx, 1] = framesRead
+        self._meta[idx, 2] = countDecay
+        # Timestamp in nanoseconds, so that all the counters share the int64 block
+        self._meta[idx, 3] = int(timestamp * 1e9)
+        # Publishing the slot only after its samples have been written
+        self._counters[0] = head + 1
+        for available in self._available:
+            available.release()
+        return
+
+    def get(self, timeout: float = None):
+        if not self._available[self.readerIndex].acquire(block=True, timeout=timeout):
+            raise queue.Empty
+        return self._read()
+
+    def get_nowait(self):
+        if not self._available[self.readerIndex].acquire(block=False):
+            raise queue.Empty
+        return self._read()
+
+    def _read(self):
+        idx = int(self._counters[1 + self.readerIndex]) % self.numSlots
+        frames, framesRead, countDecay, _ = self._meta[idx]
+        return self._data[idx, :frames], int(framesRead), int(countDecay)
+
+    def stamp(self) -> float:
+        idx = int(self._counters[1 + self.readerIndex]) % self.numSlots
+        return float(self._meta[idx, 3] * 1e-9)
+
+    def release(self):
+        self._counters[1 + self.readerIndex] += 1
+        return
+
+    def close(self):
+        self._counters = self._meta = self._data = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A consumer still holds a view of a slot, the mapping
+            # is released when that view is garbage collected
+            pass
+        return
+
+    def unlink(self):
+        if self._owner:
+            self._owner = False
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        return
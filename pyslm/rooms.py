@@ -55,6 +55,9 @@ class rooms(object):
         Final cut-off time in seconds for the impulsive response in the background noise level,
         if not defined the `_crop_IR` method will be used automatically.
         Default is None
+    backend : str, optional
+        Backend of the octave band filter, 'iir' or 'fft' (see OctFilter).
+        Default is 'iir'
 
     Attributes:
     -----------
@@ -166,7 +169,7 @@ class rooms(object):
     def __init__(self, IR: np.ndarray, fs: int, fstart: float = 100.0,
                  fend: float = 10000.0, b: int = 1, bypassLundeby: bool = False,
                  plotLundebyResults: bool = False, suppressWarnings: bool = False,
-                 IREndManualCut=None):
+                 IREndManualCut=None, backend: str = 'iir'):
         self._fs = fs
         numSamples = IR.size
         timeVector = np.arange(0, numSamples/fs, 1/fs)
@@ -175,7 +178,7 @@ class rooms(object):
         self._timeLength = self._numSamples/fs
         b, fstart, fend = self._ajust_frequency(
             b, fstart, fend, suppressWarnings)
-        self._filter = pyslm.OctFilter(fstart=fstart, fend=fend, fs=fs, b=b)
+        self._filter = pyslm.OctFilter(fstart=fstart, fend=fend, fs=fs, b=b, backend=backend)
         self._hSignal = self._filter.filter(data=IR)
         self.bands = self._filter.fnom
         listEDC = self._cumulative_integration(bypassLundeby,
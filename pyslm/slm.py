@@ -104,6 +104,8 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
     @QtCore.pyqtSlot(dict)
     def update_standby(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             Lp_global = results['Lp_global']
             Lp_bands = results['Lp_bands']
             strBands = results['strBands']
@@ -193,6 +195,8 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
     @QtCore.pyqtSlot(dict)
     def update_frequencyAnalyzer(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             Lp_global = results['Lp_global']
             Lp_bands = results['Lp_bands']
             strBands = results['strBands']
@@ -216,6 +220,8 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
     @QtCore.pyqtSlot(dict)
     def full_frequencyAnalyzer(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             self.results = results
             if self.parameters['tau'] == 0.035:
                 tweighting = 'I'
@@ -306,7 +312,8 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
                 applyAdcCorr = self.parameters['applyAdcCorr'],
                 saveRawData = self.parameters['saveRawData']
                 )
-            self.tauConter = self.manager.tau
+            # Duration of each realtime result
+            self.tauConter = self.manager.frameSize / self.manager.fs
             self.manager.play()
             now = datetime.datetime.now()
             self.timeStamp['play'] = now.strftime("%d/%m/%Y - %H:%M:%S")
@@ -322,11 +329,13 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
     @QtCore.pyqtSlot(dict)
     def update_reverberationTime(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             Lp_global = results['Lp_global']
             Lp_bands = results['Lp_bands']
             strBands = results['strBands']
             x_axis = results['x_axis']
-            self.tauConter += self.manager.tau
+            self.tauConter += self.manager.frameSize / self.manager.fs
             countdown = int((self.manager.numSamples * self.manager.numDecay)/self.manager.fs - self.tauConter)
             if countdown > 0:
                 self.lbl_Durationinfo.setText(self.seconds2HMS(countdown))
@@ -483,14 +492,16 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
     def btnSave_Action(self) -> Callable:
         try:
             self.btnSave.setIcon(QtGui.QIcon(os.path.join(path_icons, "Save_click.ico")))
+            # The raw data may have been recorded straight into a sound file
+            fileName = self.manager.recorderRawData.fname if self.parameters['saveRawData'] else self.file_name
             pyslm.save(
                 params = self.parameters,
                 results = self.results,
                 timestamp = self.timeStamp,
-                file_name = self.file_name
+                file_name = fileName
                 )
-            if self.parameters['saveRawData']:
-                os.remove(self.file_name)
+            if self.parameters['saveRawData'] and fileName.endswith('.h5'):
+                os.remove(fileName)
             self._setStringsGUI()
             self.set_standby()
         except Exception as E:
@@ -587,8 +598,6 @@ class setSLM(QtWidgets.QMainWindow, pyslm.guiSLM):
             self.stop_strem()
             self.isOpenWindow = False
             self.gettingDataTime.join()
-            self.gettingDataTime._stop()
-            self.gettingDataTime._delete()
             self.close()
         except Exception as E:
             print("setSLM.btnQuit_Action(): ", E, "\n")
@@ -761,6 +770,8 @@ class setSLM2(QtWidgets.QMainWindow, pyslm.guiSLM2):
     @QtCore.pyqtSlot(dict)
     def update_standby(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             Lp_global = results['Lp_global']
             self.value_Leq.setText(str(Lp_global))
         except Exception as E:
@@ -829,6 +840,8 @@ class setSLM2(QtWidgets.QMainWindow, pyslm.guiSLM2):
     @QtCore.pyqtSlot(dict)
     def update_spl(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             Lp_global = results['Lp_global']
             countdown = int(self.manager.duration - self.manager.framesRead/self.manager.fs)
             if countdown > 0:
@@ -842,6 +855,8 @@ class setSLM2(QtWidgets.QMainWindow, pyslm.guiSLM2):
     @QtCore.pyqtSlot(dict)
     def full_spl(self, results: dict) -> Callable:
         try:
+            # The interface displays the first input channel
+            results = pyslm.select_channel(results, 0)
             self.results = results
             if self.parameters['tau'] == 0.035:
                 tweighting = 'I'
@@ -933,9 +948,11 @@ class setSLM2(QtWidgets.QMainWindow, pyslm.guiSLM2):
     def btnSave_Action(self) -> Callable:
         try:
             self.btnSave.setIcon(QtGui.QIcon(os.path.join(path_icons, "Save_click.ico")))
-            pyslm.save(params=self.parameters, results=self.results, timestamp=self.timeStamp, file_name=self.file_name)
-            if self.parameters['saveRawData']:
-                os.remove(self.file_name)
+            # The raw data may have been recorded straight into a sound file
+            fileName = self.manager.recorderRawData.fname if self.parameters['saveRawData'] else self.file_name
+            pyslm.save(params=self.parameters, results=self.results, timestamp=self.timeStamp, file_name=fileName)
+            if self.parameters['saveRawData'] and fileName.endswith('.h5'):
+                os.remove(fileName)
             self._setStringsGUI()
             self.set_standby()
         except Exception as E:
@@ -0,0 +1,150 @@
+from typing import Union
+import scipy.signal as sign
+import numpy as np
+import hashlib
+import pyslm
+
+
+# Tables of the spectral analysis by (fs, frameSize, bands, weighting, correction)
+_tables = {}
+
+
+class spectralanalyzer(object):
+    """
+    Description
+    -----------
+    Frequency-domain analysis of a frame from its energy spectrum: the
+    spectral correction, the A, C and Z frequency weightings and the
+    fractional-octave bands are applied as precomputed tables to the
+    spectrum of the frame, instead of a correction filter, weighting filters
+    and one IIR filter per band. The tables are cached per sampling rate,
+    frame size, bands, weighting and correction.
+
+    The spectrum is taken over sine windows of the frame size with 50%
+    overlap (see OctFilter.fft_spectrum), so the energy of a transient is
+    kept wherever it falls in the frame. If the band filter is `stateful`
+    the last half frame is carried to the next one and the levels lag half
+    a frame behind the signal, otherwise each frame is padded with zeros.
+
+    The levels are the equivalent levels of each frame (no time weighting),
+    the band weights are the squared magnitude responses of the IIR bands
+    (see the 'fft' backend of pyslm.OctFilter). The bands that the FFT of a
+    frame can not resolve (see OctFilter.fft_resolved) are filtered by their
+    IIR filters, weighted by the gain of the weighting and of the correction
+    at their center frequency.
+
+    Parameters
+    ----------
+    bandfilter : pyslm.OctFilter
+        Full rate octave filter that defines the bands
+    frameSize : int
+        Samples of each analysed frame
+    fweighting : str, optional
+        Frequency weighting of the bands, 'A', 'C' or 'Z'.
+        The default is 'A'.
+    kinds : tuple, optional
+        Frequency weightings of the global levels.
+        The default is ('A', 'C', 'Z').
+    correction : np.ndarray, optional
+        Taps of the compiled spectral correction (see pyslm.compile_correction).
+        The default is None.
+    dtype : str, optional
+        Precision of the tables and of the FFT, 'float32' or 'float64'.
+        The default is 'float64'.
+
+    Methods
+    -------
+    analyze(signal):
+        Mean squares of the global weightings and of the bands of a frame.
+    reset():
+        Clears the samples carried to the next frame.
+    """
+
+    def __init__(self, bandfilter: pyslm.OctFilter, frameSize: int, fweighting: str = 'A',
+                 kinds: tuple = ('A', 'C', 'Z'), correction: Union[np.ndarray, None] = None,
+                 dtype: str = 'float64'):
+        self.bandfilter = bandfilter
+        self.frameSize = int(frameSize)
+        self.fs = bandfilter.fs
+        self.fweighting = fweighting.upper()
+        self.kinds = tuple(kind.upper() for kind in kinds)
+        self.dtype = np.dtype(dtype)
+        correctionKey = hashlib.sha1(np.asarray(correction).tobytes()).hexdigest()\
+            if correction is not None else None
+        key = (self.fs, self.frameSize, bandfilter.fstart, bandfilter.fend, bandfilter.b,
+               bandfilter.order, self.fweighting, self.kinds, correctionKey, self.dtype.str)
+        if key not in _tables:
+            _tables[key] = self._tables(correction=correction)
+        self.globalWeights, self.bandWeights, self.narrow, self.narrowGain = _tables[key]
+        self.reset()
+        return
+
+    def reset(self):
+        """
+        Clears the samples carried to the next frame.
+        """
+        self.history = None
+        return
+
+    def _tables(self, correction: Union[np.ndarray, None]):
+        _, bandWeights, _ = self.bandfilter.fft_tables(self.frameSize)
+        freqVector = np.fft.rfftfreq(self.frameSize, d=1/self.fs)
+        # Squared magnitude of the correction and of each weighting at the bins
+        if correction is not None:
+            gain = np.abs(np.fft.rfft(correction, n=max(self.frameSize, len(correction))))
+            gainFreq = np.fft.rfftfreq(max(self.frameSize, len(correction)), d=1/self.fs)
+            correctionGain = np.interp(freqVector, gainFreq, gain)**2
+        else:
+            correctionGain = np.ones(freqVector.size)
+        weightingGain = {}
+        for kind in set(self.kinds + (self.fweighting,)):
+            weighting = pyslm.weighting(fs=self.fs, kind=kind)
+            if weighting.freq_b is None:
+                weightingGain[kind] = np.ones(freqVector.size)
+            else:
+                _, h = sign.freqz(weighting.freq_b, weighting.freq_a, worN=freqVector, fs=self.fs)
+                weightingGain[kind] = np.abs(h)**2
+        # The one-sided scale of the band weights is shared by the global
+        # levels, which are the sum of all bins
+        scale = np.full(freqVector.size, 2.0)
+        scale[0] = 1.0
+        if self.frameSize % 2 == 0:
+            scale[-1] = 1.0
+        scale /= self.frameSize
+        globalWeights = np.stack([scale * weightingGain[kind] * correctionGain for kind in self.kinds])
+        bandWeights = bandWeights * weightingGain[self.fweighting] * correctionGain
+        # Bands left to the IIR filters
+        narrow = np.flatnonzero(~self.bandfilter.fft_resolved(self.frameSize))
+        narrowGain = np.interp(self.bandfilter.fm[narrow], freqVector, weightingGain[self.fweighting] * correctionGain)
+        bandWeights[narrow] = 0
+        return globalWeights.astype(self.dtype), bandWeights.astype(self.dtype), narrow, narrowGain.astype(self.dtype)
+
+    def analyze(self, signal: np.ndarray):
+        """
+        Mean squares of a frame from its energy spectrum.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            Sound pressure [Pa], with shape (frameSize,) or (frameSize, channels)
+
+        Returns
+        -------
+        meanSquare : dict
+            Mean square of each global weighting, e.g. {'A': ..., 'C': ..., 'Z': ...}
+        bandMeanSquare : np.ndarray
+            Mean square of each band, with shape (bands,) or (bands, channels)
+        """
+        if not self.bandfilter.stateful:
+            spectrum, _ = self.bandfilter.fft_spectrum(signal)
+        else:
+            if self.history is None or self.history.shape[1:] != signal.shape[1:]:
+                self.history = np.zeros((signal.shape[0] // 2,) + signal.shape[1:], dtype=signal.dtype)
+            spectrum, self.history = self.bandfilter.fft_spectrum(signal, self.history)
+        spectrum /= signal.shape[0]
+        globalMeanSquare = np.tensordot(self.globalWeights, spectrum, axes=(1, 0))
+        bandMeanSquare = np.tensordot(self.bandWeights, spectrum, axes=(1, 0))
+        if self.narrow.size > 0:
+            bandMeanSquare[self.narrow] = self.bandfilter.iir_power(signal, self.narrow) *\
+                self.narrowGain.reshape((-1,) + (1,) * (signal.ndim - 1))
+        return dict(zip(self.kinds, globalMeanSquare)), bandMeanSquare
@@ -1,6 +1,10 @@
+import threading as thd
+import soundfile as sf
 import numpy as np
 import platform
 import datetime
+import queue
+import time
 import h5py
 import os
 
@@ -12,8 +16,100 @@ Reference:
 """
 
 
+# Stored type and largest code of the integer encodings
+_integerEncodings = {'int16': ('int16', 2**15 - 1), 'int24': ('int32', 2**23 - 1)}
+# Extension of the sound file formats and subtype of each encoding
+_soundFormats = {'WAV': '.wav', 'W64': '.w64', 'FLAC': '.flac'}
+_soundSubtypes = {'float64': 'DOUBLE', 'float32': 'FLOAT', 'int16': 'PCM_16', 'int24': 'PCM_24'}
+
+
 class storage(object):
-    def __init__(self, buffer_size: int, shape: tuple, path: str, kind: str = 'SPL'):
+    """
+    Description
+    -----------
+    Recorder of the raw signal into an HDF5 file. The frames are copied into a
+    preallocated numpy staging buffer, which is written to a chunked and
+    resizable dataset when full, so the number of samples does not need to be
+    known in advance. At `close` the dataset is trimmed to the written samples.
+
+    By default the full buffers are written by a background thread, so the
+    thread that adds the frames never waits for the disk. At most `queueSize`
+    buffers wait for the writer; beyond that `add` blocks until one is written
+    (backpressure), which is accounted in `summary`.
+
+    The samples can be stored as 'float64', 'float32' or as integers of 16 or
+    24 bits ('int16', 'int24') scaled to the full scale of the ADC, whose
+    value in the units of the signal (e.g. Pa) is `calibFactor`. The 24 bits
+    are packed by the HDF5 scale-offset filter. The encoding, the scale of one
+    code and the calibration factor are saved as attributes of the dataset,
+    and `decode` returns the samples in the units of the signal. The HDF5
+    compression filters (gzip, lzf and shuffle) can be added to any encoding.
+
+    Parameters
+    ----------
+    buffer_size : int
+        Samples of the staging buffer (written to disk when full)
+    shape : tuple
+        (samples, channels) expected for the recording, samples may be None
+        for open-ended sessions. The dataset grows beyond it if needed.
+    path : str
+        Folder of the file
+    kind : str, optional
+        'SPL' or 'TR', used in the name of the file. The default is 'SPL'.
+    fs : int, optional
+        Sampling rate [Hz], saved as an attribute. The default is None.
+    dtype : str, optional
+        Precision of the staging buffer (and of the dataset if no encoding is
+        given). The default is 'float'.
+    chunkBytes : int, optional
+        Approximate size of each HDF5 chunk [bytes]. The default is 2**20.
+    threaded : bool, optional
+        Writes the buffers in a background thread. The default is True.
+    queueSize : int, optional
+        Maximum number of full buffers waiting for the writer thread.
+        The default is 4.
+    encoding : str, optional
+        'float64', 'float32', 'int16' or 'int24', None to store the dtype.
+        The default is None.
+    calibFactor : float, optional
+        Value of the full scale of the ADC in the units of the signal, used by
+        the integer encodings. Samples beyond it are clipped.
+        The default is 1.0.
+    compression : str, optional
+        'gzip', 'lzf' or None. The default is None.
+    compressionLevel : int, optional
+        Level of the gzip compression, from 0 to 9. The default is 4.
+    shuffle : bool, optional
+        Applies the HDF5 byte shuffle before the compression.
+        The default is False.
+
+    Attributes
+    ----------
+    attrs : h5py.AttributeManager
+        Attributes of the recorded dataset.
+
+    Methods
+    -------
+    add(frameData):
+        Copies a block of shape (samples,) or (samples, channels).
+    flush():
+        Sends the staging buffer to the disk (to the writer thread).
+    close():
+        Waits for the pending writes, trims the dataset and closes the file.
+    summary():
+        Returns the writer accounting as a dictionary.
+    decode(dataset, selection):
+        Reads samples of a recorded dataset in the units of the signal.
+    benchmark(path, ...):
+        Throughput and size of each encoding and compression.
+    """
+
+    extension = '.h5'
+
+    def __init__(self, buffer_size: int, shape: tuple, path: str, kind: str = 'SPL', fs: int = None,
+                 dtype: str = 'float', chunkBytes: int = 2**20, threaded: bool = True,
+                 queueSize: int = 4, encoding: str = None, calibFactor: float = 1.0,
+                 compression: str = None, compressionLevel: int = 4, shuffle: bool = False):
         today = datetime.datetime.now()
         today = today.strftime("%d-%m-%Y")
         if platform.system().lower() == 'windows':
@@ -28,34 +124,240 @@ class storage(object):
             os.mkdir(path)
         self.fname = path + bar + name_date + '001.xlsx'
         _, self.fname = self.counter(self.fname)
-        self.dataBase = h5py.File(self.fname, 'w')
-        self.data = self.dataBase.create_dataset(
-            "recSignal", shape=shape, dtype='float')
+        self.dtype = np.dtype(dtype)
+        self.encoding = encoding
+        self.calibFactor = calibFactor
+        self.numChannels = int(shape[1]) if len(shape) > 1 else 1
+        self._open(int(shape[0] or 0), fs, chunkBytes, compression, compressionLevel, shuffle)
         # Definir o buffer e índice da próxima linha disponível
-        self.buffer_size = buffer_size
-        self.buffer = {"signal": []}
+        self.buffer_size = max(1, int(buffer_size))
+        self.buffer = np.empty((self.buffer_size, self.numChannels), dtype=self.dtype)
+        self.bufferIdx = 0
         self.idx = 0
+        # Writer accounting
+        self.buffersWritten = 0
+        self.maxPending = 0
+        self.stalls = 0
+        self.stallTime = 0.
+        self.clippedSamples = 0
+        self.writeTime = 0.
+        self.writeTimeMax = 0.
+        self.threaded = threaded
+        if self.threaded:
+            # Full buffers waiting for the writer and buffers ready to be reused,
+            # the buffers are allocated on demand up to queueSize + 1
+            self.queueSize = max(1, int(queueSize))
+            self.numBuffers = 1
+            self.pending = queue.Queue()
+            self.free = queue.Queue()
+            self.writer = thd.Thread(target=self._writer, daemon=True)
+            self.writer.start()
+
+    def _open(self, numSamples: int, fs: int, chunkBytes: int, compression: str,
+              compressionLevel: int, shuffle: bool):
+        if self.encoding is None:
+            self.encoding = self.dtype.name
+        if self.encoding in _integerEncodings:
+            storedType, self.maxCode = _integerEncodings[self.encoding]
+            self.scale = self.calibFactor / self.maxCode
+        elif self.encoding in ['float64', 'float32']:
+            storedType, self.maxCode = self.encoding, None
+            self.scale = None
+        else:
+            raise ValueError("Encoding %s not supported, please try 'float64', 'float32', 'int16' or 'int24'."
+                             % self.encoding)
+        if compression not in [None, 'gzip', 'lzf']:
+            raise ValueError("Compression %s not supported, please try 'gzip', 'lzf' or None." % compression)
+        self.storedType = np.dtype(storedType)
+        # Chunks of whole rows of about chunkBytes, appended as the data arrives
+        chunkRows = max(1, int(chunkBytes) // (self.storedType.itemsize * self.numChannels))
+        if numSamples > 0:
+            # Chunks of equal size covering the expected samples, so the last
+            # chunk is not mostly empty (unfiltered chunks are allocated whole)
+            chunkRows = -(-numSamples // -(-numSamples // chunkRows))
+        self.dataBase = h5py.File(self.fname, 'w')
+        self.data = self.dataBase.create_dataset(
+            "recSignal", shape=(numSamples, self.numChannels), maxshape=(None, self.numChannels),
+            chunks=(chunkRows, self.numChannels), dtype=self.storedType,
+            compression=compression, compression_opts=compressionLevel if compression == 'gzip' else None,
+            shuffle=shuffle, scaleoffset=24 if self.encoding == 'int24' else None)
+        self.attrs = self.data.attrs
+        self.attrs['encoding'] = self.encoding
+        self.attrs['calibFactor'] = self.calibFactor
+        if self.scale is not None:
+            self.attrs['scale'] = self.scale
+        if fs is not None:
+            # Sampling rate, used to replay the file through pyslm.filestream
+            self.attrs['fs'] = fs
+        return
 
     def add(self, frameData):
-        self.buffer["signal"].extend(frameData)
-        if len(self.buffer["signal"]) >= self.buffer_size:
-            self.flush()
+        frameData = np.asarray(frameData).reshape(-1, self.numChannels)
+        start = 0
+        while start < frameData.shape[0]:
+            stop = start + min(self.buffer_size - self.bufferIdx, frameData.shape[0] - start)
+            self.buffer[self.bufferIdx:self.bufferIdx + stop - start] = frameData[start:stop]
+            self.bufferIdx += stop - start
+            start = stop
+            if self.bufferIdx >= self.buffer_size:
+                self.flush()
         return
 
     def flush(self):
         """Reseta o buffer e escreve os dados no disco."""
-        i = self.idx + len(self.buffer["signal"])
-        self.data[self.idx:i] = self.buffer["signal"]
-        self.idx = i
-        self.buffer = {"signal": []}
+        if self.bufferIdx == 0:
+            return
+        if not self.threaded:
+            self._write(self.buffer, self.bufferIdx)
+            self.bufferIdx = 0
+            return
+        self.pending.put((self.buffer, self.bufferIdx))
+        self.maxPending = max(self.maxPending, self.pending.qsize())
+        self.bufferIdx = 0
+        try:
+            self.buffer = self.free.get_nowait()
+        except queue.Empty:
+            if self.numBuffers <= self.queueSize:
+                self.buffer = np.empty((self.buffer_size, self.numChannels), dtype=self.dtype)
+                self.numBuffers += 1
+            else:
+                # Backpressure: waiting for the writer to release a buffer
+                start = time.perf_counter()
+                self.buffer = self.free.get()
+                self.stalls += 1
+                self.stallTime += time.perf_counter() - start
+        return
+
+    def _write(self, buffer: np.ndarray, rows: int):
+        start = time.perf_counter()
+        self._append(self._encode(buffer[:rows]))
+        self.idx += rows
+        elapsed = time.perf_counter() - start
+        self.buffersWritten += 1
+        self.writeTime += elapsed
+        self.writeTimeMax = max(self.writeTimeMax, elapsed)
+        return
+
+    def _append(self, samples: np.ndarray):
+        i = self.idx + samples.shape[0]
+        if i > self.data.shape[0]:
+            self.data.resize(i, axis=0)
+        self.data[self.idx:i] = samples
+        return
+
+    def _encode(self, samples: np.ndarray) -> np.ndarray:
+        if self.scale is None:
+            return samples
+        codes = np.rint(samples / self.scale)
+        clipped = np.abs(codes) > self.maxCode
+        if clipped.any():
+            self.clippedSamples += int(np.count_nonzero(clipped))
+            np.clip(codes, -self.maxCode, self.maxCode, out=codes)
+        return codes.astype(self.storedType)
+
+    def _writer(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            buffer, rows = item
+            try:
+                self._write(buffer, rows)
+            except Exception as E:
+                print("storage._writer(): ", E, "\n")
+            # The buffer is released even if the write failed, so add never deadlocks
+            self.free.put(buffer)
         return
 
     def close(self):
-        if len(self.buffer["signal"]) > 0:
-            self.flush()
+        self.flush()
+        if self.threaded:
+            # Waiting for the pending writes
+            self.pending.put(None)
+            self.writer.join()
+        self._finalize()
+        return
+
+    def _finalize(self):
+        # Samples expected but never received are not kept
+        if self.data.shape[0] != self.idx:
+            self.data.resize(self.idx, axis=0)
+        # The accounting of the writer is kept with the data
+        self.attrs.update(self.summary())
         self.dataBase.close()
         return
 
+    def summary(self) -> dict:
+        return {'buffersWritten': self.buffersWritten,
+                'samplesWritten': self.idx,
+                'pendingBuffers': self.pending.qsize() if self.threaded else 0,
+                'maxPendingBuffers': self.maxPending,
+                'writerStalls': self.stalls,
+                'writerStallTime': self.stallTime,
+                'writeTimeMean': self.writeTime / self.buffersWritten if self.buffersWritten else 0.,
+                'writeTimeMax': self.writeTimeMax,
+                'clippedSamples': self.clippedSamples}
+
+    @staticmethod
+    def decode(dataset: h5py.Dataset, selection: tuple = np.s_[:], dtype: str = 'float64') -> np.ndarray:
+        """
+        Description
+        -----------
+        Reads the samples `selection` of a dataset recorded by `storage` in the
+        units of the signal, whatever its encoding.
+        """
+        data = np.asarray(dataset[selection], dtype=dtype)
+        scale = dataset.attrs.get('scale', None)
+        if scale is not None:
+            data *= scale
+        return data
+
+    @staticmethod
+    def benchmark(path: str, fs: int = 48000, duration: float = 10., numChannels: int = 1,
+                  encodings: tuple = ('float64', 'float32', 'int24', 'int16'),
+                  compressions: tuple = (None, 'lzf', 'gzip'), shuffle: bool = True) -> dict:
+        """
+        Description
+        -----------
+        Writes `duration` seconds of noise quantized by a 24-bit ADC with each
+        encoding and compression, and returns for each one the throughput of
+        the writer (realtimeFactor, seconds of signal per second), the size of
+        the file, the compression ratio (size of the float64 file without
+        compression over the size of the file) and the largest decoding
+        error. The files are removed after the measurement.
+        """
+        calibFactor = 20.
+        signal = np.random.default_rng(0).standard_normal((int(fs*duration), numChannels)) * 0.05
+        signal = np.rint(np.clip(signal, -1, 1) * (2**23 - 1)) / (2**23 - 1) * calibFactor
+        results = {}
+        # The baseline is measured first, so the sizes of the files compare with
+        # the same overhead of the HDF5 metadata and of the last chunk
+        setups = [('float64', None)] + [(encoding, compression) for encoding in encodings
+                                        for compression in compressions]
+        for encoding, compression in setups:
+            if '%s/%s' % (encoding, compression) in results:
+                continue
+            recorder = storage(buffer_size=int(fs*5), shape=signal.shape, path=path, fs=fs,
+                               threaded=False, encoding=encoding, calibFactor=calibFactor,
+                               compression=compression, shuffle=shuffle and compression is not None)
+            start = time.perf_counter()
+            for i in range(0, signal.shape[0], 4096):
+                recorder.add(signal[i:i+4096])
+            recorder.close()
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(recorder.fname)
+            with h5py.File(recorder.fname, 'r') as file:
+                error = np.max(np.abs(storage.decode(file['recSignal']) - signal))
+            os.remove(recorder.fname)
+            baseline = results['float64/None']['bytes'] if results else size
+            results['%s/%s' % (encoding, compression)] = {'realtimeFactor': duration / elapsed,
+                                                           'bytes': size,
+                                                           'ratio': baseline / size,
+                                                           'maxError': error}
+        if ('float64', None) not in setups[1:]:
+            del results['float64/None']
+        return results
+
     def counter(self, fname: str):
         if os.path.isfile(fname):
             new_name = fname
@@ -69,7 +371,100 @@ class storage(object):
         new_name = new_name.replace('.xlsx', '')
         name = new_name[:-3]
         count = int(new_name[-3:])
-        return str(count), "%s(raw data) %03i.h5"%(name, count)
+        return str(count), "%s(raw data) %03i%s"%(name, count, self.extension)
+
+
+class soundstorage(storage):
+    """
+    Description
+    -----------
+    Recorder of the raw signal straight into a sound file (WAV, W64 or FLAC)
+    through soundfile.SoundFile, with the same staging buffers and writer
+    thread as `storage`. The file is ready when the measurement ends, without
+    the conversion of the HDF5 file and without holding the recording in
+    memory.
+
+    As in any sound file, the samples are relative to the full scale of the
+    ADC: the signal is divided by `calibFactor`, which is saved in the comment
+    of the file ('calibFactor=...', except in W64 files that have no strings),
+    and the PCM encodings are clipped to it. The PCM codes are rounded as in
+    the integer encodings of `storage`, so both recorders (and `convert`)
+    give the same codes.
+    The attributes of the recording are kept in memory in `attrs`.
+
+    Parameters
+    ----------
+    buffer_size, shape, path, kind, dtype, threaded, queueSize :
+        As in `storage`.
+    fs : int
+        Sampling rate [Hz]
+    encoding : str, optional
+        'float64', 'float32', 'int16' or 'int24', None to store the dtype
+        ('int24' for FLAC, which only stores integers). The default is None.
+    calibFactor : float, optional
+        Value of the full scale of the ADC in the units of the signal.
+        The default is 1.0.
+    format : str, optional
+        'WAV', 'W64' (for recordings beyond 4 GB) or 'FLAC'.
+        The default is 'WAV'.
+    skipSamples : int, optional
+        Samples discarded at the start of the recording (e.g. the settling of
+        the filters). The default is 0.
+    """
+
+    def __init__(self, buffer_size: int, shape: tuple, path: str, kind: str = 'SPL', fs: int = None,
+                 dtype: str = 'float', threaded: bool = True, queueSize: int = 4, encoding: str = None,
+                 calibFactor: float = 1.0, format: str = 'WAV', skipSamples: int = 0):
+        if format.upper() not in _soundFormats:
+            raise ValueError("Format %s not supported, please try 'WAV', 'W64' or 'FLAC'." % format)
+        if fs is None:
+            raise ValueError("The sampling rate is required by the sound files.")
+        self.format = format.upper()
+        self.extension = _soundFormats[self.format]
+        self.skipSamples = int(skipSamples)
+        super().__init__(buffer_size, shape, path, kind=kind, fs=fs, dtype=dtype, threaded=threaded,
+                         queueSize=queueSize, encoding=encoding, calibFactor=calibFactor)
+        return
+
+    def _open(self, numSamples: int, fs: int, chunkBytes: int, compression: str,
+              compressionLevel: int, shuffle: bool):
+        if self.encoding is None:
+            self.encoding = 'int24' if self.format == 'FLAC' else self.dtype.name
+        subtype = _soundSubtypes.get(self.encoding, None)
+        if subtype is None or not sf.check_format(self.format, subtype):
+            raise ValueError("Encoding %s not supported by %s files." % (self.encoding, self.format))
+        self.pcm = self.encoding in _integerEncodings
+        if self.pcm:
+            storedType, self.maxCode = _integerEncodings[self.encoding]
+            self.storedType = np.dtype(storedType)
+            self.scale = self.calibFactor / self.maxCode
+        self.file = sf.SoundFile(self.fname, 'w', samplerate=int(fs), channels=self.numChannels,
+                                 format=self.format, subtype=subtype)
+        try:
+            # The strings are written with the header, before the samples
+            self.file.comment = 'calibFactor=%r' % self.calibFactor
+        except RuntimeError:
+            # W64 files do not store strings
+            pass
+        self.attrs = {'fs': fs, 'encoding': self.encoding, 'calibFactor': self.calibFactor}
+        return
+
+    def _encode(self, samples: np.ndarray) -> np.ndarray:
+        if not self.pcm:
+            return samples / self.calibFactor
+        # Integer codes clipped to the full scale, the 24-bit PCM codes are
+        # the upper bits of 32-bit integers
+        codes = super()._encode(samples)
+        return np.left_shift(codes, 8) if self.encoding == 'int24' else codes
+
+    def _append(self, samples: np.ndarray):
+        skip = min(max(self.skipSamples - self.idx, 0), samples.shape[0])
+        self.file.write(samples[skip:])
+        return
+
+    def _finalize(self):
+        self.file.close()
+        return
 
 
 # %%
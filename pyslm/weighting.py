@@ -6,6 +6,7 @@
 """
 
 from scipy.stats import linregress
+from typing import Union
 import matplotlib.pyplot as plt
 import scipy.signal as sign
 import numpy as np
@@ -32,17 +33,52 @@ class weighting(object):
     kind : str
         Frequency weighting 'A', 'C' or 'Z'.
         Default is 'A'.
+    stateful : bool
+        If True, `frequency` and `time` (with reshape=False) keep the state
+        of the filters between calls, so that a signal processed in
+        consecutive blocks gives the same result as in a single call.
+        The state is cleared by `reset`.
+        Default is False.
+    dtype : str
+        Precision of the second-order sections and of their states, with
+        'float32' a float32 signal is filtered in single precision.
+        Default is 'float64'.
     """
 
     def __init__(self, fs: int = 48000, tau: float = 0.125,
-                 pRef: float = 2e-05, kind: str = 'A'):
+                 pRef: float = 2e-05, kind: str = 'A', stateful: bool = False,
+                 dtype: str = 'float64'):
         self.fs = fs
         self.tau = tau
         self.pRef = pRef
         self.kind = kind.upper()
-        self.time_sos = self.__time_filter_design(tau=self.tau, fs=self.fs)
+        self.stateful = stateful
+        self.dtype = np.dtype(dtype)
+        self.time_sos = self.__time_filter_design(tau=self.tau, fs=self.fs).astype(self.dtype)
         self.freq_b, self.freq_a = self.__freq_filter_design(
             fs=self.fs, kind=self.kind)
+        # Second-order sections of the frequency weighting for the stateful filtering
+        self.freq_sos = sign.tf2sos(self.freq_b, self.freq_a).astype(self.dtype)\
+            if self.freq_b is not None else None
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state of the stateful filters (e.g. at the start
+        of a new measurement).
+        """
+        self.zi = {'freq': None, 'time': None}
+        return
+
+    def _stateful_filter(self, key: str, sos: np.ndarray, signal: np.ndarray):
+        # Filtering along the time axis from the final state of the last call,
+        # the state is created at rest when the shape of the signal changes
+        shape = (sos.shape[0], 2) + signal.shape[1:]
+        zi = self.zi[key]
+        if zi is None or zi.shape != shape:
+            zi = np.zeros(shape, dtype=self.dtype)
+        filteredSignal, self.zi[key] = sign.sosfilt(sos, signal, axis=0, zi=zi)
+        return filteredSignal
 
     def __time_filter_design(self, tau: float, fs: int):
         """
@@ -134,8 +170,11 @@ class weighting(object):
             b = int(numSamples/a)
             signal = signal.reshape(b, a)
             filteredSignal = sign.sosfilt(sos, signal)
+        elif self.stateful:
+            filteredSignal = self._stateful_filter('time', self.time_sos, signal)
         else:
-            filteredSignal = sign.sosfilt(self.time_sos, signal)
+            # Filtering along the time axis, i.e. (samples,) or (samples, channels)
+            filteredSignal = sign.sosfilt(self.time_sos, signal, axis=0)
             # sos = self.time_sos if sos == None else sos
         return filteredSignal
 
@@ -200,7 +239,7 @@ class weighting(object):
         Parameters
         ----------
         signal : np.ndarray
-            Sound pressure [Pa]
+            Sound pressure [Pa], with shape (samples,) or (samples, channels)
 
         b, a : ndarray, optional
             Filter coefficients for a digital weighting filter.
@@ -223,7 +262,10 @@ class weighting(object):
                 b, a = self.freq_b, self.freq_a
             else:
                 pass
-            filteredSignal = sign.lfilter(b=b, a=a, x=signal)
+            if self.stateful and b is self.freq_b:
+                filteredSignal = self._stateful_filter('freq', self.freq_sos, signal)
+            else:
+                filteredSignal = sign.lfilter(b=b, a=a, x=signal, axis=0)
         elif self.kind.upper() == 'Z':
             filteredSignal = signal
         else:
@@ -475,6 +517,160 @@ class weighting(object):
         return
 
 
+# Letters of the standard time weightings (IEC 61672-1), also used to name the results
+timeLetters = {0.035: 'I', 0.125: 'F', 1.0: 'S'}
+
+
+class weightingbank(object):
+    """
+    Description
+    -----------
+    Frequency weightings A, C and Z of the same signal computed in a single
+    pass per frame: the A and C filters run once and their outputs are shared
+    by every descriptor that needs them (time-weighted levels, C-weighted
+    peak and A-weighted exposure), Z is the signal itself. The squared
+    signals of all weightings are stacked and each time constant (Impulse,
+    Fast, Slow) is applied to the whole stack in one stateful filter call,
+    so reporting LAF, LAS and LAI together costs little more than one of them.
+
+    Parameters
+    ----------
+    fs : int
+        Sampling rate [Hz]
+    tau : float
+        Main time constant [s] (0.035, 0.125 or 1.000)
+    pRef : float
+        Reference sound pressure [Pa]
+        Default is 2.0e-05 (20uPa)
+    kinds : tuple, optional
+        Frequency weightings computed by the bank.
+        Default is ('A', 'C', 'Z').
+    taus : tuple, optional
+        Time constants computed by the bank [s], `tau` is always included.
+        Only the standard constants 0.035, 0.125 and 1.0 (I, F, S) are
+        accepted, since the results are named after their letters.
+        Default is None (only `tau`).
+    dtype : str, optional
+        Precision of the filters (see `weighting`).
+        Default is 'float64'.
+
+    Attributes
+    ----------
+    filters : dict
+        Stateful `weighting` object of each kind
+    letter : str
+        Letter of the main time weighting, 'I', 'F' or 'S'
+    letters : dict
+        Letter of each time constant
+
+    Methods
+    -------
+    frequency(signal):
+        Frequency weighted signals of all kinds
+    time(weighted):
+        Time weighted squares of all kinds and time constants,
+        e.g. {'LAF': ..., 'LAS': ..., 'LCF': ...}
+    levels(timeWeighted):
+        Time weighted levels over the frame, e.g. {'LAF': ..., 'LAS': ...}
+    maxima(timeWeighted):
+        Maximum time weighted levels of the frame, e.g. {'LAFmax': ...}
+    peak(weighted, kind):
+        Peak level of one weighting (e.g. LCpeak)
+    """
+
+    def __init__(self, fs: int = 48000, tau: float = 0.125,
+                 pRef: float = 2e-05, kinds: tuple = ('A', 'C', 'Z'),
+                 taus: Union[tuple, None] = None, dtype: str = 'float64'):
+        self.fs = fs
+        self.tau = tau
+        self.pRef = pRef
+        self.kinds = tuple(kind.upper() for kind in kinds)
+        self.taus = (tau,) + tuple(t for t in (taus or ()) if t != tau)
+        self.letters = {t: weightingbank.time_letter(t) for t in self.taus}
+        self.filters = {kind: weighting(fs=fs, tau=tau, pRef=pRef, kind=kind, stateful=True, dtype=dtype)
+                        for kind in self.kinds}
+        # Time weighting of each time constant, shared by the stacked
+        # squared signals of all kinds (scipy applies one set of coefficients
+        # per call, so the time constants can not share a single call)
+        self.timefilters = {t: weighting(fs=fs, tau=t, pRef=pRef, kind='Z', stateful=True, dtype=dtype)
+                            for t in self.taus}
+        self.letter = self.letters[tau]
+        return
+
+    @staticmethod
+    def time_letter(tau: float) -> str:
+        # Letter of the standard time weightings
+        if float(tau) not in timeLetters:
+            raise ValueError("Time constant %g s is not supported, please try 0.035 (I), 0.125 (F) or 1.0 (S)."
+                             % tau)
+        return timeLetters[float(tau)]
+
+    def reset(self):
+        for filt in list(self.filters.values()) + list(self.timefilters.values()):
+            filt.reset()
+        return
+
+    def frequency(self, signal: np.ndarray) -> dict:
+        """
+        Frequency weighted signals of all kinds, each filter runs once.
+
+        Parameters
+        ----------
+        signal : np.ndarray
+            Sound pressure [Pa], with shape (samples,) or (samples, channels)
+
+        Returns
+        -------
+        weighted : dict
+            Sound pressure weighted by each kind, e.g. {'A': ..., 'C': ..., 'Z': ...}
+        """
+        return {kind: self.filters[kind].frequency(signal=signal) for kind in self.kinds}
+
+    def time(self, weighted: dict) -> dict:
+        """
+        Time weighted squares of all kinds, one filter call per time constant.
+
+        Parameters
+        ----------
+        weighted : dict
+            Output of `frequency`
+
+        Returns
+        -------
+        timeWeighted : dict
+            Sound pressure square time weighted, named after the frequency
+            and time weightings (e.g. 'LAF', 'LAS', 'LCF')
+        """
+        # (samples, ..., kinds)
+        squared = np.stack([weighted[kind]**2 for kind in self.kinds], axis=-1)
+        timeWeighted = {}
+        for t, timefilter in self.timefilters.items():
+            filtered = timefilter.time(signal=squared, reshape=False)
+            for i, kind in enumerate(self.kinds):
+                timeWeighted['L' + kind + self.letters[t]] = filtered[..., i]
+        return timeWeighted
+
+    def levels(self, timeWeighted: dict) -> dict:
+        """
+        Time weighted levels over the frame (e.g. LAF, LAS, LCF).
+        """
+        return {name: np.round(10*np.log10(np.mean(square, axis=0)/self.pRef**2), 2)
+                for name, square in timeWeighted.items()}
+
+    def maxima(self, timeWeighted: dict) -> dict:
+        """
+        Maximum time weighted levels of the frame (e.g. LAFmax, LASmax).
+        """
+        return {name + 'max': np.round(10*np.log10(np.max(square, axis=0)/self.pRef**2), 2)
+                for name, square in timeWeighted.items()}
+
+    def peak(self, weighted: dict, kind: str = 'C') -> np.ndarray:
+        """
+        Peak level of one weighting over the frame (e.g. LCpeak).
+        """
+        return np.round(10*np.log10(np.max(np.abs(weighted[kind]), axis=0)**2/self.pRef**2), 2)
+
+
 # %%
 if __name__ == "__main__":
     # Sampling rate
@@ -0,0 +1,46 @@
+import numpy as np
+import pyslm
+
+fs = 48000
+# Smooth response of a microphone [Hz, dB], rising at high frequencies
+curve = np.array([[20, -1.0], [100, 0.0], [1000, 0.0], [5000, 1.5], [10000, 3.0], [20000, 6.0]])
+
+
+def test_magnitude_is_the_inverse_of_the_curves():
+    taps = pyslm.compile_correction([curve, None], fs=fs, numTaps=4096)
+    freq = np.fft.rfftfreq(8 * taps.size, d=1/fs)
+    magnitude = 20*np.log10(np.abs(np.fft.rfft(taps, n=8 * taps.size)))
+    band = (freq >= 50) & (freq <= 16000)
+    np.testing.assert_allclose(magnitude[band], -np.interp(freq[band], curve[:, 0], curve[:, 1]), atol=0.1)
+
+
+def test_no_curves():
+    assert pyslm.compile_correction([None], fs=fs) is None
+
+
+def test_minimum_phase():
+    taps = pyslm.compile_correction([curve], fs=fs, numTaps=4096)
+    # Linear phase filter with the same magnitude
+    magnitude = np.abs(np.fft.rfft(taps))
+    linear = np.roll(np.fft.irfft(magnitude, n=taps.size), taps.size // 2)
+    # The minimum phase filter has the fastest energy build-up of all the
+    # filters with its magnitude
+    energy, linearEnergy = np.cumsum(taps**2), np.cumsum(linear**2)
+    assert np.all(energy >= linearEnergy - 1e-9 * energy[-1])
+    assert energy[16] > 0.99 * energy[-1]
+    # and its zeros inside the unit circle
+    short = pyslm.compile_correction([curve], fs=fs, numTaps=64)
+    assert np.all(np.abs(np.roots(short)) < 1)
+
+
+def test_blocks_are_continuous():
+    taps = pyslm.compile_correction([curve], fs=fs, numTaps=1024)
+    signal = np.random.default_rng(5).standard_normal((20000, 2))
+    expected = np.stack([np.convolve(signal[:, channel], taps)[:signal.shape[0]] for channel in range(2)],
+                        axis=1)
+    correction = pyslm.correctionfilter(taps, fs=fs)
+    edges = [0, 100, 1100, 1101, 9000, 20000]
+    filtered = np.concatenate([correction.filter(signal[edges[i]:edges[i+1]]) for i in range(len(edges) - 1)])
+    np.testing.assert_allclose(filtered, expected, rtol=0, atol=1e-9)
+    correction.reset()
+    np.testing.assert_allclose(correction.filter(signal), expected, rtol=0, atol=1e-9)
@@ -0,0 +1,103 @@
+from multiprocessing import shared_memory
+import numpy as np
+import soundfile as sf
+import pytest
+import pyslm
+import pyslm.engine
+
+fs = 48000
+
+
+def engine(tmp_path, **kwargs):
+    params = dict(version='AdvFreqAnalyzer', path=str(tmp_path), device=[0, 1], fs=fs, inCh=[1], outCh=[1],
+                  tau=0.125, fstart=250., fend=4000., b=1, fweighting='A', duration=1, template='spl',
+                  saveRawData=False, numWorkers=1)
+    params.update(kwargs)
+    return pyslm.StreamEngine(**params)
+
+
+class FailingStream(object):
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("Error opening InputStream: Invalid device")
+
+
+def test_stream_failure_ends_the_iteration(tmp_path, monkeypatch):
+    monkeypatch.setattr(pyslm.engine.sd, 'InputStream', FailingStream)
+    session = engine(tmp_path)
+    name = session.inData._shm.name
+    with pytest.raises(RuntimeError, match='Invalid device'):
+        for _ in session:
+            pass
+    assert session.isFinished.is_set()
+    # The shared memory of the ring was released
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+class UnstartableStream(object):
+    active = False
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        raise RuntimeError("Error starting stream: Device unavailable")
+
+    def __exit__(self, *args):
+        return
+
+
+def test_stream_start_failure_ends_the_iteration(tmp_path, monkeypatch):
+    monkeypatch.setattr(pyslm.engine.sd, 'InputStream', UnstartableStream)
+    session = engine(tmp_path)
+    name = session.inData._shm.name
+    with pytest.raises(RuntimeError, match='Device unavailable'):
+        for _ in session.iterate(timeout=30):
+            pass
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+@pytest.mark.parametrize('options', [{'rawEncoding': 'int8'}, {'rawFormat': 'MP3'},
+                                     {'rawFormat': 'FLAC', 'rawEncoding': 'float32'},
+                                     {'rawCompression': 'zstd'}, {'analysisDomain': 'wavelet'},
+                                     {'timeWeightings': (0.125, 0.5)}])
+def test_invalid_options(tmp_path, options):
+    with pytest.raises(ValueError):
+        engine(tmp_path, saveRawData=True, **options)
+
+
+def burst_file(tmp_path, start=0.2, duration=0.01, level=94.):
+    # Burst of a 1 kHz tone starting at `start` [s] over a background noise
+    # at about 20 dB (silent blocks are not queued by the engine), relative
+    # to the full scale of 20 Pa
+    t = np.arange(5 * fs) / fs
+    signal = np.sqrt(2) * 2e-5 * 10**(level/20) * np.sin(2 * np.pi * 1000 * t)
+    signal[(t < start) | (t >= start + duration)] = 0
+    signal += 2e-4 * np.random.default_rng(0).standard_normal(t.size)
+    fname = str(tmp_path / 'burst.wav')
+    sf.write(fname, signal / 20, fs, subtype='FLOAT')
+    return fname
+
+
+def analyze(tmp_path, fname, **kwargs):
+    session = engine(tmp_path, inCh=[1], template='frequencyAnalyzer', duration=4, source=fname, pace='fast',
+                     calibFactor=20., **kwargs)
+    for _ in session:
+        pass
+    return session.fullResults
+
+
+def test_frequency_domain_maxima_are_not_time_weighted(tmp_path):
+    fname = burst_file(tmp_path)
+    results = analyze(tmp_path, fname, analysisDomain='freq')
+    assert not any(key in results for key in ['LAFmax', 'LASmax', 'LAImax'])
+    assert set(['LAeqmax', 'LCeqmax', 'LZeqmax']) <= set(results)
+
+
+def test_frequency_domain_keeps_the_energy_of_a_burst(tmp_path):
+    # Burst across the edge of the second and third frames, which a single
+    # window per frame reduced by about 27 dB
+    fname = burst_file(tmp_path, start=0.245)
+    levels = [analyze(tmp_path / domain, fname, analysisDomain=domain)['Leq_global'] for domain in ['time', 'freq']]
+    np.testing.assert_allclose(levels[1], levels[0], atol=0.3)
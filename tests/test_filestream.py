@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import soundfile as sf
+import threading as thd
+import pyslm
+
+fs = 48000
+
+
+def replay(fname, blocksize=1000, channels=2, duplex=False):
+    blocks = []
+    finished = thd.Event()
+    if duplex:
+        def callback(indata, outdata, frames, time, status):
+            assert outdata.shape == (frames, 1)
+            blocks.append(indata.copy())
+    else:
+        def callback(indata, frames, time, status):
+            assert frames == blocksize
+            blocks.append(indata.copy())
+    stream = pyslm.filestream(fname, samplerate=None, blocksize=blocksize, channels=(channels, 1) if duplex
+                              else channels, dtype='float64', callback=callback, finished_callback=finished.set,
+                              pace='fast', duplex=duplex)
+    with stream:
+        assert finished.wait(timeout=10)
+    return np.concatenate(blocks), stream
+
+
+@pytest.fixture
+def data():
+    return np.random.default_rng(8).standard_normal((10500, 3)) * 0.1
+
+
+@pytest.mark.parametrize('duplex', [False, True])
+def test_replay_of_a_sound_file(tmp_path, data, duplex):
+    fname = str(tmp_path / 'signal.wav')
+    sf.write(fname, data, fs, subtype='DOUBLE')
+    replayed, stream = replay(fname, duplex=duplex)
+    assert stream.samplerate == fs
+    # Only whole blocks of the first channels are delivered
+    np.testing.assert_array_equal(replayed, data[:10000, :2])
+    assert stream.realtimeFactor > 0
+
+
+def test_replay_of_a_recording(tmp_path, data):
+    recorder = pyslm.storage(buffer_size=4096, shape=(None, 3), path=str(tmp_path), fs=fs, encoding='int24',
+                             calibFactor=20.)
+    recorder.add(data * 20.)
+    recorder.close()
+    replayed, stream = replay(recorder.fname, channels=3)
+    assert stream.samplerate == fs
+    # Relative to the full scale, as the sound files
+    np.testing.assert_allclose(replayed, data[:10000], rtol=0, atol=0.5 / (2**23 - 1))
+
+
+def test_replay_stops_early(tmp_path, data):
+    fname = str(tmp_path / 'signal.wav')
+    sf.write(fname, data, fs)
+    delivered = []
+    stream = pyslm.filestream(fname, samplerate=None, blocksize=100, channels=1, callback=lambda *args:
+                              delivered.append(1), pace='realtime')
+    stream.start()
+    stream.stop()
+    assert not stream.active
+    assert len(delivered) < 105
+
+
+def test_missing_channels(tmp_path, data):
+    fname = str(tmp_path / 'signal.wav')
+    sf.write(fname, data, fs)
+    replayed = []
+    finished = thd.Event()
+    with pyslm.filestream(fname, samplerate=None, blocksize=1000, channels=4, callback=lambda *args:
+                          replayed.append(1), finished_callback=finished.set, pace='fast'):
+        assert finished.wait(timeout=10)
+    assert not replayed
+
+
+def replay_tone(tmp_path, source, saveRawData=False):
+    engine = pyslm.StreamEngine(version='AdvFreqAnalyzer', path=str(tmp_path), device=[0, 1], fs=fs, inCh=[1, 2],
+                                outCh=[1], tau=0.125, fstart=250., fend=4000., b=1, fweighting='A', duration=4,
+                                template='frequencyAnalyzer', saveRawData=saveRawData, source=source, pace='fast',
+                                numWorkers=2, calibFactor=20.)
+    frames = list(engine)
+    assert len(frames) > 0
+    return engine
+
+
+def test_engine_replays_a_calibrated_tone(tmp_path):
+    # 94 dB at 1 kHz in the first channel and 74 dB in the second one,
+    # stored relative to the full scale of 20 Pa
+    t = np.arange(6 * fs) / fs
+    tone = np.sqrt(2) * np.sin(2 * np.pi * 1000 * t)
+    fname = str(tmp_path / 'tone.wav')
+    sf.write(fname, np.stack([tone, 0.1 * tone], axis=1) / 20, fs, subtype='FLOAT')
+    engine = replay_tone(tmp_path, fname, saveRawData=True)
+    # The recording of the session replayed with the same calibration
+    # gives the same levels
+    for results in [engine.fullResults, replay_tone(tmp_path / 'replay', engine.recorderRawData.fname).fullResults]:
+        assert results['framesRead'] >= 4 * fs
+        band = list(results['bands']).index(1000)
+        np.testing.assert_allclose(results['Leq_bands'][band], [94., 74.], atol=0.1)
+        np.testing.assert_allclose(results['LAFmax'], [94., 74.], atol=0.1)
+        np.testing.assert_allclose(results['Lpeak'], [97., 77.], atol=0.1)
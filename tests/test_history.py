@@ -0,0 +1,32 @@
+import numpy as np
+import pyslm
+
+
+def test_growth_keeps_the_rows():
+    history = pyslm.timehistory(shape=(2,), capacity=2)
+    rows = np.arange(2 * 1000, dtype='float64').reshape(-1, 2)
+    for row in rows:
+        history.append(row)
+    assert len(history) == 1000
+    # The capacity doubles, so it is the next power of two
+    assert history.capacity == 1024
+    np.testing.assert_array_equal(history.values, rows)
+
+
+def test_extend_beyond_capacity():
+    history = pyslm.timehistory(shape=(3, 2), capacity=4)
+    rows = np.random.default_rng(0).standard_normal((10, 3, 2))
+    history.append(rows[0])
+    history.extend(rows[1:])
+    assert history.capacity >= 10
+    np.testing.assert_array_equal(np.asarray(history), rows)
+    np.testing.assert_array_equal(history[-1], rows[-1])
+
+
+def test_save_and_load(tmp_path):
+    history = pyslm.timehistory(shape=(2,))
+    history.extend(np.arange(6.).reshape(3, 2))
+    fname = str(tmp_path / 'history.h5')
+    history.save(fname, name='Lglobal')
+    loaded = pyslm.timehistory.load(fname, name='Lglobal')
+    np.testing.assert_array_equal(loaded.values, history.values)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import pyslm
+
+fs = 48000
+# IEC 61260-1:2014 class 1 acceptance limits of the relative attenuation,
+# as gains [dB] at the normalized frequencies G**breakpoints (octave bands)
+breakpoints = np.array([-4, -3, -2, -1, -1/2, -3/8, -1/4, -1/8, 0, 1/8, 1/4, 3/8, 1/2, 1, 2, 3, 4])
+upper = np.array([-70, -60, -40.5, -16.6, -1.2, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, 0.4, -1.2, -16.6, -40.5, -60, -70])
+lower = np.array([-np.inf] * 4 + [-5.3, -1.4, -0.7, -0.5, -0.4, -0.5, -0.7, -1.4, -5.3] + [-np.inf] * 4)
+
+
+def normalized_frequencies(b):
+    G = 10**(3/10)
+    if b == 1:
+        return G**breakpoints
+    high = 1 + ((G**(1/(2*b)) - 1) / (G**(1/2) - 1)) * (G**breakpoints[8:] - 1)
+    return np.concatenate((1/high[:0:-1], high))
+
+
+@pytest.mark.parametrize('b', [1, 3])
+@pytest.mark.parametrize('multirate', [False, True])
+def test_bands_within_iec_class_1(b, multirate):
+    bank = pyslm.OctFilter(fstart=31.5, fend=16000, b=b, fs=fs, stateful=True, multirate=multirate)
+    t = np.arange(fs) / fs
+    for band in range(bank.fm.size):
+        freq = normalized_frequencies(b) * bank.fm[band]
+        keep = freq < 0.45 * fs
+        # One tone per channel, the first half second lets the filters settle
+        tones = np.sin(2 * np.pi * np.outer(t, freq[keep]))
+        bank.reset()
+        bank.power(tones[:fs//2])
+        gain = 10*np.log10(bank.power(tones[fs//2:])[band] / 0.5)
+        assert np.all(gain <= upper[keep]), (bank.fnom[band], freq[keep], gain)
+        assert np.all(gain >= lower[keep]), (bank.fnom[band], freq[keep], gain)
+
+
+def test_multirate_blocks_equal_one_shot():
+    data = np.random.default_rng(2).standard_normal((fs, 2))
+    oneShot = pyslm.OctFilter(fstart=31.5, fend=16000, b=3, fs=fs, multirate=True).filter(data)
+    bank = pyslm.OctFilter(fstart=31.5, fend=16000, b=3, fs=fs, stateful=True, multirate=True)
+    # Odd block sizes, so the decimation keeps the parity across calls
+    edges = [0, 4801, 4802, 20001, fs]
+    blockWise = [bank.filter(data[edges[i]:edges[i+1]]) for i in range(len(edges) - 1)]
+    for band in range(bank.fm.size):
+        np.testing.assert_allclose(np.concatenate([block[band] for block in blockWise]), oneShot[band],
+                                   rtol=0, atol=1e-10)
+    # One second of signal at the rate of each band
+    assert [band.shape[0] for band in oneShot] == [int(np.ceil(rate)) for rate in bank.fsBands]
+
+
+def test_multirate_levels_match_full_rate():
+    data = np.random.default_rng(3).standard_normal(2 * fs)
+    fullRate = pyslm.OctFilter(fstart=31.5, fend=16000, b=3, fs=fs).power(data)
+    multirate = pyslm.OctFilter(fstart=31.5, fend=16000, b=3, fs=fs, multirate=True).power(data)
+    np.testing.assert_allclose(10*np.log10(multirate), 10*np.log10(fullRate), atol=0.5)
+
+
+def test_short_frames():
+    # Frames of 10 ms leave the deepest stages without samples in most frames
+    data = np.random.default_rng(9).standard_normal((2 * fs, 2))
+    bank = pyslm.OctFilter(fstart=20, fend=16000, b=3, fs=fs, stateful=True, multirate=True)
+    assert fs / bank.fsBands.min() > 480
+    with np.errstate(all='raise'):
+        frames = np.stack([bank.power(data[i:i+480]) for i in range(0, data.shape[0], 480)])
+    assert np.all(np.isfinite(frames))
+    fullRate = pyslm.OctFilter(fstart=20, fend=16000, b=3, fs=fs).power(data)
+    np.testing.assert_allclose(10*np.log10(frames.mean(axis=0)), 10*np.log10(fullRate), atol=1.)
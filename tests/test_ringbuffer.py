@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import queue
+import pyslm
+
+
+@pytest.fixture
+def ring():
+    ring = pyslm.ringbuffer(numSlots=4, frameSize=8, numChannels=2, dtype='float32', numReaders=2)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def frame(value, frames=8):
+    return np.full((frames, 2), value, dtype='float32')
+
+
+def test_every_reader_sees_every_frame(ring):
+    readers = [ring.reader(0), ring.reader(1)]
+    for i in range(3):
+        ring.put_nowait(frame(i), framesRead=i, countDecay=10*i)
+    for reader in readers:
+        for i in range(3):
+            data, framesRead, countDecay = reader.get(timeout=1)
+            assert np.all(data == i)
+            assert (framesRead, countDecay) == (i, 10*i)
+            reader.release()
+        with pytest.raises(queue.Empty):
+            reader.get_nowait()
+
+
+def test_slot_reused_only_after_all_readers_release(ring):
+    fast, slow = ring.reader(0), ring.reader(1)
+    for i in range(4):
+        ring.put_nowait(frame(i))
+    assert ring.full()
+    for _ in range(4):
+        fast.get_nowait()
+        fast.release()
+    # The slow reader still holds the oldest slot
+    assert ring.depth() == 4
+    with pytest.raises(queue.Full):
+        ring.put_nowait(frame(4))
+    data, _, _ = slow.get_nowait()
+    assert np.all(data == 0)
+    slow.release()
+    assert ring.depth() == 3
+    ring.put_nowait(frame(4))
+    assert ring.full()
+
+
+def test_wraparound(ring):
+    readers = [ring.reader(0), ring.reader(1)]
+    # Several turns of the ring, with frames shorter than the slots
+    for i in range(3 * ring.numSlots + 1):
+        ring.put_nowait(frame(i, frames=1 + i % 8), timestamp=i * 1e-3)
+        for reader in readers:
+            data, _, _ = reader.get(timeout=1)
+            assert data.shape == (1 + i % 8, 2)
+            assert np.all(data == i)
+            assert reader.stamp() == pytest.approx(i * 1e-3)
+            reader.release()
+    assert ring.depth() == 0
+
+
+def test_invalid_reader(ring):
+    with pytest.raises(ValueError):
+        ring.reader(2)
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+import soundfile as sf
+import pyslm
+
+fs = 48000
+calibFactor = 20.
+# Integer codes of the PCM encodings, read from the sound files
+codes = {'int16': ('int16', 2**15 - 1, 0), 'int24': ('int32', 2**23 - 1, 8)}
+
+
+def signal(numSamples=10000, numChannels=2):
+    return np.random.default_rng(7).standard_normal((numSamples, numChannels)) * 3.
+
+
+def read_codes(fname, encoding):
+    dtype, _, shift = codes[encoding]
+    return sf.read(fname, dtype=dtype)[0] >> shift
+
+
+def expected_codes(data, encoding):
+    _, maxCode, _ = codes[encoding]
+    return np.clip(np.rint(data / calibFactor * maxCode), -maxCode, maxCode)
+
+
+def record(recorder, data, blockSize=1000):
+    for i in range(0, data.shape[0], blockSize):
+        recorder.add(data[i:i+blockSize])
+    recorder.close()
+    return recorder
+
+
+@pytest.mark.parametrize('format', ['WAV', 'W64', 'FLAC'])
+@pytest.mark.parametrize('encoding', ['int16', 'int24'])
+@pytest.mark.parametrize('threaded', [False, True])
+def test_soundstorage_pcm_is_sample_exact(tmp_path, format, encoding, threaded):
+    data = signal()
+    recorder = record(pyslm.soundstorage(buffer_size=3000, shape=(10000, 2), path=str(tmp_path), fs=fs,
+                                         encoding=encoding, calibFactor=calibFactor, format=format,
+                                         skipSamples=100, threaded=threaded), data)
+    info = sf.info(recorder.fname)
+    assert info.samplerate == fs
+    assert info.subtype == {'int16': 'PCM_16', 'int24': 'PCM_24'}[encoding]
+    # The settling of the filters is not written
+    np.testing.assert_array_equal(read_codes(recorder.fname, encoding), expected_codes(data[100:], encoding))
+
+
+@pytest.mark.parametrize('format', ['WAV', 'W64'])
+def test_soundstorage_float(tmp_path, format):
+    data = signal()
+    recorder = record(pyslm.soundstorage(buffer_size=3000, shape=(10000, 2), path=str(tmp_path), fs=fs,
+                                         encoding='float32', calibFactor=calibFactor, format=format), data)
+    np.testing.assert_array_equal(sf.read(recorder.fname, dtype='float32')[0],
+                                  (data / calibFactor).astype('float32'))
+
+
+def test_soundstorage_clipping_and_comment(tmp_path):
+    data = np.array([[0.5], [30.], [-25.], [1.]])
+    recorder = record(pyslm.soundstorage(buffer_size=4, shape=(4, 1), path=str(tmp_path), fs=fs,
+                                         encoding='int16', calibFactor=calibFactor), data)
+    assert recorder.summary()['clippedSamples'] == 2
+    np.testing.assert_array_equal(read_codes(recorder.fname, 'int16'), expected_codes(data, 'int16')[:, 0])
+    with sf.SoundFile(recorder.fname) as file:
+        assert file.comment == 'calibFactor=%r' % calibFactor
+
+
+def test_soundstorage_rejects_float_flac(tmp_path):
+    with pytest.raises(ValueError):
+        pyslm.soundstorage(buffer_size=10, shape=(10, 1), path=str(tmp_path), fs=fs, encoding='float32',
+                           format='FLAC')
+
+
+def record_hdf5(tmp_path, data, encoding):
+    return record(pyslm.storage(buffer_size=3000, shape=(data.shape[0], 2), path=str(tmp_path), fs=fs,
+                                encoding=encoding, calibFactor=calibFactor), data).fname
+
+
+@pytest.mark.parametrize('extension', ['.wav', '.w64', '.flac'])
+@pytest.mark.parametrize('encoding', ['int16', 'int24'])
+@pytest.mark.parametrize('prefetch', [False, True])
+def test_convert_pcm_is_sample_exact(tmp_path, extension, encoding, prefetch):
+    data = signal()
+    fname = record_hdf5(tmp_path, data, encoding)
+    audio = str(tmp_path / ('converted' + extension))
+    pyslm.convert(fname, audio, fs=fs, start=100, stop=9000, blockSize=777, prefetch=prefetch)
+    assert sf.info(audio).subtype == {'int16': 'PCM_16', 'int24': 'PCM_24'}[encoding]
+    np.testing.assert_array_equal(read_codes(audio, encoding), expected_codes(data[100:9000], encoding))
+
+
+@pytest.mark.parametrize('encoding', ['float32', 'float64'])
+@pytest.mark.parametrize('extension, subtype', [('.wav', 'FLOAT'), ('.flac', 'PCM_24')])
+def test_convert_float_subtypes(tmp_path, encoding, extension, subtype):
+    data = signal()
+    fname = record_hdf5(tmp_path, data, encoding)
+    audio = str(tmp_path / ('converted' + extension))
+    pyslm.convert(fname, audio, fs=fs)
+    assert sf.info(audio).subtype == subtype
+    tolerance = 1e-7 if subtype == 'FLOAT' else 1 / 2**23
+    np.testing.assert_allclose(sf.read(audio)[0], data / calibFactor, rtol=0, atol=tolerance)
+
+
+@pytest.mark.parametrize('encoding', ['int16', 'int24'])
+def test_convert_matches_soundstorage(tmp_path, encoding):
+    data = signal()
+    fname = record_hdf5(tmp_path, data, encoding)
+    audio = str(tmp_path / 'converted.wav')
+    pyslm.convert(fname, audio, fs=fs)
+    recorder = record(pyslm.soundstorage(buffer_size=3000, shape=(10000, 2), path=str(tmp_path / 'sound'), fs=fs,
+                                         encoding=encoding, calibFactor=calibFactor), data)
+    np.testing.assert_array_equal(read_codes(audio, encoding), read_codes(recorder.fname, encoding))
+    with sf.SoundFile(audio) as file:
+        assert file.comment == 'calibFactor=%r' % calibFactor
+
+
+def test_convert_explicit_subtype(tmp_path):
+    fname = record_hdf5(tmp_path, signal(), 'int24')
+    audio = str(tmp_path / 'converted.wav')
+    pyslm.convert(fname, audio, fs=fs, subtype='PCM_16')
+    assert sf.info(audio).subtype == 'PCM_16'
+    assert sf.info(audio).frames == 10000
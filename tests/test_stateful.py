@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import pyslm
+
+fs = 48000
+# Irregular block sizes, so the block edges fall anywhere
+blockSizes = [1000, 4096, 1, 777, 12000, 5126]
+
+
+def signal(numChannels=2):
+    return np.random.default_rng(1).standard_normal((sum(blockSizes), numChannels))
+
+
+def blocks(data):
+    edges = np.cumsum([0] + blockSizes)
+    return [data[edges[i]:edges[i+1]] for i in range(len(blockSizes))]
+
+
+@pytest.mark.parametrize('numChannels', [1, 2])
+def test_octfilter_blocks_equal_one_shot(numChannels):
+    data = signal(numChannels)[:, 0] if numChannels == 1 else signal(numChannels)
+    oneShot = pyslm.OctFilter(fstart=31.5, fend=16000, b=3, fs=fs).filter(data)
+    bank = pyslm.OctFilter(fstart=31.5, fend=16000, b=3, fs=fs, stateful=True)
+    blockWise = np.concatenate([bank.filter(block) for block in blocks(data)])
+    np.testing.assert_allclose(blockWise, oneShot, rtol=0, atol=1e-10)
+
+
+def test_octfilter_reset():
+    data = signal()
+    bank = pyslm.OctFilter(fstart=125, fend=4000, b=1, fs=fs, stateful=True)
+    first = bank.filter(data)
+    bank.reset()
+    np.testing.assert_array_equal(bank.filter(data), first)
+
+
+@pytest.mark.parametrize('kind', ['A', 'C', 'Z'])
+def test_frequency_weighting_blocks_equal_one_shot(kind):
+    data = signal()
+    oneShot = pyslm.weighting(fs=fs, kind=kind, stateful=True).frequency(data)
+    weight = pyslm.weighting(fs=fs, kind=kind, stateful=True)
+    blockWise = np.concatenate([weight.frequency(block) for block in blocks(data)])
+    np.testing.assert_allclose(blockWise, oneShot, rtol=0, atol=1e-10)
+
+
+def test_weighting_bank_blocks_equal_one_shot():
+    data = signal()
+    taus = (0.035, 0.125, 1.0)
+    oneShot = pyslm.weightingbank(fs=fs, taus=taus)
+    oneShot = oneShot.time(oneShot.frequency(data))
+    bank = pyslm.weightingbank(fs=fs, taus=taus)
+    blockWise = [bank.time(bank.frequency(block)) for block in blocks(data)]
+    assert set(oneShot) == {'L' + kind + letter for kind in 'ACZ' for letter in 'IFS'}
+    for name, square in oneShot.items():
+        np.testing.assert_allclose(np.concatenate([result[name] for result in blockWise]), square,
+                                   rtol=1e-9, atol=1e-15)
+
+
+def test_weighting_bank_rejects_non_standard_time_constants():
+    with pytest.raises(ValueError):
+        pyslm.weightingbank(fs=fs, taus=(0.125, 0.5))
+
+
+def test_float32_blocks_close_to_float64():
+    data = signal()
+    reference = pyslm.OctFilter(fstart=31.5, fend=16000, b=1, fs=fs).filter(data)
+    bank = pyslm.OctFilter(fstart=31.5, fend=16000, b=1, fs=fs, stateful=True, dtype='float32')
+    blockWise = np.concatenate([bank.filter(block.astype('float32')) for block in blocks(data)])
+    assert blockWise.dtype == np.float32
+    levels = 10*np.log10(np.mean(blockWise.astype('float64')**2, axis=0))
+    referenceLevels = 10*np.log10(np.mean(reference**2, axis=0))
+    np.testing.assert_allclose(levels, referenceLevels, atol=0.2)
+
+
+def test_filter_returns_new_arrays():
+    first, second = signal(), signal()[::-1]
+    bank = pyslm.OctFilter(fstart=125, fend=4000, b=1, fs=fs)
+    a = bank.filter(first)
+    b = bank.filter(second)
+    assert a is not b
+    np.testing.assert_array_equal(a, pyslm.OctFilter(fstart=125, fend=4000, b=1, fs=fs).filter(first))
+    # The output is only reused on request
+    reused = pyslm.OctFilter(fstart=125, fend=4000, b=1, fs=fs, reuseOutput=True)
+    assert reused.filter(first) is reused.filter(second)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import h5py
+import pyslm
+
+fs = 48000
+
+
+def signal(numSamples, numChannels=2, amplitude=0.3):
+    return np.random.default_rng(6).standard_normal((numSamples, numChannels)) * amplitude
+
+
+def read(fname):
+    with h5py.File(fname, 'r') as file:
+        return pyslm.storage.decode(file['recSignal']), dict(file['recSignal'].attrs)
+
+
+def record(path, data, blockSize=1000, **kwargs):
+    recorder = pyslm.storage(path=str(path), fs=fs, **kwargs)
+    for i in range(0, data.shape[0], blockSize):
+        recorder.add(data[i:i+blockSize])
+    recorder.close()
+    return recorder
+
+
+@pytest.mark.parametrize('threaded', [False, True])
+def test_trim_on_close(tmp_path, threaded):
+    data = signal(7000)
+    recorder = record(tmp_path, data, buffer_size=3000, shape=(10000, 2), threaded=threaded)
+    recorded, attrs = read(recorder.fname)
+    # The samples expected but never received are not kept
+    np.testing.assert_array_equal(recorded, data)
+    assert attrs['samplesWritten'] == 7000
+    assert attrs['fs'] == fs
+
+
+@pytest.mark.parametrize('shape', [(1000, 2), (None, 2)])
+def test_growth_beyond_the_expected_samples(tmp_path, shape):
+    data = signal(25000)
+    recorder = record(tmp_path, data, blockSize=777, buffer_size=4096, shape=shape, chunkBytes=2**14)
+    np.testing.assert_array_equal(read(recorder.fname)[0], data)
+
+
+def test_threaded_writer_accounting(tmp_path):
+    data = signal(50000, numChannels=1)[:, 0]
+    recorder = record(tmp_path, data, buffer_size=1000, shape=(None, 1), threaded=True, queueSize=2)
+    summary = recorder.summary()
+    assert summary['buffersWritten'] == 50
+    assert summary['samplesWritten'] == 50000
+    assert summary['pendingBuffers'] == 0
+    # The staging buffers are reused, at most queueSize + 1 are allocated
+    assert recorder.numBuffers <= 3
+    np.testing.assert_array_equal(read(recorder.fname)[0][:, 0], data)
+
+
+@pytest.mark.parametrize('encoding, tolerance', [('float64', 0.), ('float32', 1e-7), ('int24', 0.5 / (2**23 - 1)),
+                                                 ('int16', 0.5 / (2**15 - 1))])
+@pytest.mark.parametrize('compression', [None, 'lzf', 'gzip'])
+def test_encodings_round_trip(tmp_path, encoding, tolerance, compression):
+    calibFactor = 20.
+    data = signal(20000, amplitude=2.)
+    recorder = record(tmp_path, data, buffer_size=4096, shape=(20000, 2), encoding=encoding,
+                      calibFactor=calibFactor, compression=compression, shuffle=compression is not None)
+    recorded, attrs = read(recorder.fname)
+    assert attrs['encoding'] == encoding
+    assert attrs['calibFactor'] == calibFactor
+    # Half a code of the integer encodings, in the units of the signal
+    np.testing.assert_allclose(recorded, data, rtol=tolerance if encoding == 'float32' else 0,
+                               atol=tolerance * calibFactor if encoding.startswith('int') else 0)
+    assert attrs['clippedSamples'] == 0
+
+
+def test_integer_encodings_clip_at_full_scale(tmp_path):
+    data = np.array([[0.5], [1.5], [-2.0], [0.25]])
+    recorder = record(tmp_path, data, buffer_size=4, shape=(4, 1), encoding='int16', calibFactor=1.)
+    recorded, attrs = read(recorder.fname)
+    assert attrs['clippedSamples'] == 2
+    np.testing.assert_allclose(recorded[:, 0], [0.5, 1., -1., 0.25], atol=0.5 / (2**15 - 1))
+
+
+def test_unsupported_encoding(tmp_path):
+    with pytest.raises(ValueError):
+        pyslm.storage(buffer_size=10, shape=(10, 1), path=str(tmp_path), encoding='int8')
+
+
+def test_benchmark_ratio_to_float64(tmp_path):
+    results = pyslm.storage.benchmark(str(tmp_path), duration=2., encodings=('float32', 'int16'),
+                                      compressions=(None,))
+    # The baseline is measured but only reported when requested
+    assert set(results) == {'float32/None', 'int16/None'}
+    assert results['float32/None']['ratio'] == pytest.approx(2, rel=0.05)
+    assert results['int16/None']['ratio'] == pytest.approx(4, rel=0.05)
+    results = pyslm.storage.benchmark(str(tmp_path), duration=2., encodings=('float64',), compressions=(None,))
+    assert results['float64/None']['ratio'] == 1.
+    assert results['float64/None']['maxError'] == 0.